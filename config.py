@@ -30,6 +30,39 @@ POST_INTERVAL_HOURS = int(os.getenv('POST_INTERVAL_HOURS', 3))
 OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-4')
 MAX_TOKENS = int(os.getenv('OPENAI_MAX_TOKENS', 800))
 TEMPERATURE = float(os.getenv('OPENAI_TEMPERATURE', 0.7))
+# Адрес API (например, локальная заглушка tools/stub_openai.py); пусто - api.openai.com
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL') or None
+# Пост одним запросом: заголовок, текст и хештеги в JSON по схеме (structured output)
+AI_STRUCTURED_OUTPUT = os.getenv('AI_STRUCTURED_OUTPUT', 'true').lower() == 'true'
+# Кэш ответов ИИ: срок хранения (дни) и максимум записей
+AI_CACHE_TTL_DAYS = int(os.getenv('AI_CACHE_TTL_DAYS', 7))
+AI_CACHE_MAX_ENTRIES = int(os.getenv('AI_CACHE_MAX_ENTRIES', 5000))
+# Бюджет токенов: максимум токенов новости в промпте и дневной лимит токенов (0 - без лимита)
+AI_INPUT_MAX_TOKENS = int(os.getenv('AI_INPUT_MAX_TOKENS', 1000))
+AI_DAILY_TOKEN_CAP = int(os.getenv('AI_DAILY_TOKEN_CAP', 0))
+# Пересказ отклоняется, если косинус по символьным n-граммам с оригиналом выше порога
+# (0.67 подобран на синтетической выборке tools/bench_validator.py, см. --labeled)
+REWRITE_SIMILARITY_THRESHOLD = float(os.getenv('REWRITE_SIMILARITY_THRESHOLD', 0.67))
+# Спекулятивное переписывание: вариантов в одном ответе (n) и новостей в работе сверх оставшихся постов
+AI_CANDIDATES = int(os.getenv('AI_CANDIDATES', 1))
+AI_SPECULATIVE_ITEMS = int(os.getenv('AI_SPECULATIVE_ITEMS', 0))
+# Офлайн-режим через Batch API: новости на завтра переписываются пакетом (дешевле вдвое),
+# ежедневные публикации берут готовые посты из очереди в БД
+AI_BATCH_MODE = os.getenv('AI_BATCH_MODE', 'false').lower() == 'true'
+# Адрес API для пакетов (например, tools/stub_openai.py); по умолчанию - OPENAI_BASE_URL
+AI_BATCH_BASE_URL = os.getenv('AI_BATCH_BASE_URL') or OPENAI_BASE_URL
+AI_BATCH_SIZE = int(os.getenv('AI_BATCH_SIZE', 20))
+AI_BATCH_PREPARE_TIME = os.getenv('AI_BATCH_PREPARE_TIME', '21:00')
+AI_BATCH_POLL_MINUTES = int(os.getenv('AI_BATCH_POLL_MINUTES', 10))
+# Готовый пост старше стольких часов не публикуется (новость устарела)
+AI_BATCH_READY_TTL_HOURS = int(os.getenv('AI_BATCH_READY_TTL_HOURS', 36))
+# Потоковый предпросмотр в Telegram: сообщение редактируется не чаще раза в столько секунд
+STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', 1.5))
+# Лимиты OpenAI API (уточняются по заголовкам x-ratelimit-* ответов) и параллельность запросов
+OPENAI_RPM = int(os.getenv('OPENAI_RPM', 500))
+OPENAI_TPM = int(os.getenv('OPENAI_TPM', 30000))
+AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', 4))
+AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', 5))
 
 # Промпт для обработки новостей
 REWRITE_PROMPT = """
@@ -49,6 +82,32 @@ REWRITE_PROMPT = """
 USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
 REQUEST_TIMEOUT = int(os.getenv('REQUEST_TIMEOUT', 30))
 MAX_NEWS_PER_SOURCE = int(os.getenv('MAX_NEWS_PER_SOURCE', 10))
+# Параллельная загрузка полных текстов статей
+MAX_CONCURRENT_FETCHES = int(os.getenv('MAX_CONCURRENT_FETCHES', 16))
+MAX_FETCHES_PER_HOST = int(os.getenv('MAX_FETCHES_PER_HOST', 4))
+ARTICLE_FETCH_TIMEOUT = float(os.getenv('ARTICLE_FETCH_TIMEOUT', 10))
+# Пул разбора RSS/HTML: thread или process
+PARSE_EXECUTOR = os.getenv('PARSE_EXECUTOR', 'thread')
+PARSE_WORKERS = int(os.getenv('PARSE_WORKERS', 4))
+# Общая HTTP-сессия: лимиты соединений и время жизни кэша DNS (сек)
+HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', 100))
+HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', 8))
+HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', 300))
+# Лимиты чтения ответов (байт); чтение статьи прекращается после <article> длиной от ARTICLE_ENOUGH_BYTES
+FEED_MAX_BYTES = int(os.getenv('FEED_MAX_BYTES', 5 * 1024 * 1024))
+ARTICLE_MAX_BYTES = int(os.getenv('ARTICLE_MAX_BYTES', 1024 * 1024))
+ARTICLE_ENOUGH_BYTES = int(os.getenv('ARTICLE_ENOUGH_BYTES', 16 * 1024))
+# Адаптивный опрос источников (секунды)
+POLL_MIN_INTERVAL = int(os.getenv('POLL_MIN_INTERVAL', 5 * 60))
+POLL_MAX_INTERVAL = int(os.getenv('POLL_MAX_INTERVAL', 12 * 3600))
+POLL_DEFAULT_INTERVAL = int(os.getenv('POLL_DEFAULT_INTERVAL', 30 * 60))
+# Поиск почти одинаковых новостей (оценка сходства Жаккара по MinHash)
+STORY_SIMILARITY_THRESHOLD = float(os.getenv('STORY_SIMILARITY_THRESHOLD', 0.2))
+STORY_RETENTION_DAYS = int(os.getenv('STORY_RETENTION_DAYS', 3))
+# Потоковый конвейер обработки: размер очередей между этапами и число воркеров ИИ
+PIPELINE_QUEUE_SIZE = int(os.getenv('PIPELINE_QUEUE_SIZE', 20))
+PIPELINE_REWRITE_WORKERS = int(os.getenv('PIPELINE_REWRITE_WORKERS', AI_MAX_CONCURRENCY))
+PIPELINE_MAX_POSTS = int(os.getenv('PIPELINE_MAX_POSTS', 3))
 
 # Категории новостей
 NEWS_CATEGORIES = [
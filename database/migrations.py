@@ -0,0 +1,326 @@
+import logging
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Migration:
+    """Шаг миграции схемы"""
+    version: int
+    description: str
+    statements: List[str] = field(default_factory=list)
+    # Перенос данных: вызывается как apply_data(models, db) в той же транзакции
+    apply_data: Optional[Callable] = None
+    # Новые колонки: (таблица, колонка, объявление) - добавляются только если отсутствуют
+    add_columns: List[tuple] = field(default_factory=list)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        description="Базовые таблицы: каналы, источники, настройки",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS channels (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel_id TEXT UNIQUE NOT NULL,
+                channel_name TEXT NOT NULL,
+                is_active BOOLEAN DEFAULT 1,
+                posts_per_day INTEGER DEFAULT 5,
+                last_post_time TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS news_sources (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                url TEXT UNIQUE NOT NULL,
+                source_type TEXT DEFAULT 'rss',
+                is_active BOOLEAN DEFAULT 1,
+                category TEXT DEFAULT 'общее',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS settings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT UNIQUE NOT NULL,
+                value TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ]
+    ),
+    Migration(
+        version=2,
+        description="Посты, снимки метрик и результаты анализа вместо блобов в settings",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_id TEXT NOT NULL,
+                channel_id TEXT NOT NULL,
+                content TEXT NOT NULL,
+                original_title TEXT,
+                source_url TEXT,
+                category TEXT DEFAULT 'общее',
+                style TEXT,
+                published_at TIMESTAMP NOT NULL,
+                UNIQUE (channel_id, post_id)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_posts_channel_published ON posts (channel_id, published_at)",
+            """
+            CREATE TABLE IF NOT EXISTS performance_metrics (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                post_id TEXT NOT NULL,
+                channel_id TEXT NOT NULL,
+                views INTEGER DEFAULT 0,
+                likes INTEGER DEFAULT 0,
+                shares INTEGER DEFAULT 0,
+                comments INTEGER DEFAULT 0,
+                engagement_rate REAL DEFAULT 0,
+                score REAL,
+                analysis TEXT,
+                captured_at TIMESTAMP NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_metrics_post_captured ON performance_metrics (post_id, captured_at)",
+            "CREATE INDEX IF NOT EXISTS idx_metrics_captured ON performance_metrics (captured_at)",
+            """
+            CREATE TABLE IF NOT EXISTS analysis_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                period_key TEXT NOT NULL,
+                overall_score REAL,
+                payload TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                UNIQUE (kind, period_key)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_analysis_kind_created ON analysis_results (kind, created_at)",
+        ],
+        apply_data=lambda models, db: models._migrate_settings_blobs(db)
+    ),
+    Migration(
+        version=3,
+        description="Индексы по времени последнего поста и последнего опроса источника",
+        add_columns=[
+            ('news_sources', 'last_fetched_at', 'TIMESTAMP'),
+        ],
+        statements=[
+            "CREATE INDEX IF NOT EXISTS idx_news_sources_last_fetched ON news_sources (last_fetched_at)",
+            "CREATE INDEX IF NOT EXISTS idx_channels_last_post_time ON channels (last_post_time)",
+        ]
+    ),
+    Migration(
+        version=4,
+        description="Индекс уже обработанных статей и их публикаций по каналам",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                url_key TEXT PRIMARY KEY,
+                title_hash TEXT NOT NULL,
+                title TEXT,
+                content TEXT,
+                source_id INTEGER,
+                first_seen_at TIMESTAMP NOT NULL,
+                rewritten_at TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_articles_title_hash ON articles (title_hash)",
+            "CREATE INDEX IF NOT EXISTS idx_articles_first_seen ON articles (first_seen_at)",
+            """
+            CREATE TABLE IF NOT EXISTS article_publications (
+                url_key TEXT NOT NULL,
+                channel_id TEXT NOT NULL,
+                published_at TIMESTAMP NOT NULL,
+                PRIMARY KEY (url_key, channel_id)
+            )
+            """,
+        ]
+    ),
+    Migration(
+        version=5,
+        description="Отключаемая загрузка полного текста статей для источника",
+        add_columns=[
+            ('news_sources', 'fetch_full_text', 'BOOLEAN DEFAULT 1'),
+        ]
+    ),
+    Migration(
+        version=6,
+        description="Условные запросы RSS: ETag/Last-Modified и счетчики ответов 304",
+        add_columns=[
+            ('news_sources', 'etag', 'TEXT'),
+            ('news_sources', 'last_modified', 'TEXT'),
+            ('news_sources', 'fetch_count', 'INTEGER DEFAULT 0'),
+            ('news_sources', 'not_modified_count', 'INTEGER DEFAULT 0'),
+        ]
+    ),
+    Migration(
+        version=7,
+        description="Адаптивный опрос источников: интервал, ошибки подряд, время следующего опроса",
+        add_columns=[
+            ('news_sources', 'next_fetch_at', 'TIMESTAMP'),
+            ('news_sources', 'poll_interval', 'INTEGER'),
+            ('news_sources', 'error_count', 'INTEGER DEFAULT 0'),
+        ],
+        statements=[
+            "CREATE INDEX IF NOT EXISTS idx_news_sources_next_fetch ON news_sources (next_fetch_at)",
+        ]
+    ),
+    Migration(
+        version=8,
+        description="MinHash-сигнатуры сюжетов, уже отданных в ИИ-обработку",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS story_signatures (
+                url_key TEXT PRIMARY KEY,
+                signature BLOB NOT NULL,
+                created_at TIMESTAMP NOT NULL
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_story_signatures_created ON story_signatures (created_at)",
+        ]
+    ),
+    Migration(
+        version=9,
+        description="Кэш ответов ИИ по хешу модели, стиля, версии промпта и текста",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS ai_cache (
+                cache_key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                model TEXT,
+                value TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                last_hit_at TIMESTAMP,
+                hits INTEGER DEFAULT 0
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_ai_cache_created ON ai_cache (created_at)",
+        ]
+    ),
+    Migration(
+        version=10,
+        description="Учет токенов и стоимости ИИ по дням, моделям и каналам",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS token_usage (
+                day TEXT NOT NULL,
+                model TEXT NOT NULL,
+                channel_id TEXT NOT NULL DEFAULT '',
+                requests INTEGER DEFAULT 0,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                cost_usd REAL DEFAULT 0,
+                PRIMARY KEY (day, model, channel_id)
+            )
+            """,
+        ]
+    ),
+    Migration(
+        version=11,
+        description="Пакеты Batch API и очередь готовых постов",
+        statements=[
+            """
+            CREATE TABLE IF NOT EXISTS ai_batches (
+                batch_id TEXT PRIMARY KEY,
+                input_file_id TEXT,
+                model TEXT,
+                style TEXT,
+                items TEXT NOT NULL,
+                request_count INTEGER DEFAULT 0,
+                status TEXT NOT NULL,
+                posts_count INTEGER DEFAULT 0,
+                created_at TIMESTAMP NOT NULL,
+                finished_at TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS ready_posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch_id TEXT,
+                url_key TEXT,
+                post TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL,
+                published_at TIMESTAMP
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_ready_posts_pending ON ready_posts (published_at, created_at)",
+        ]
+    ),
+]
+
+
+class MigrationRunner:
+    """Применение версионированных миграций схемы, каждая в своей транзакции"""
+
+    def __init__(self, models, migrations: List[Migration] = None):
+        self.models = models
+        self.migrations = sorted(MIGRATIONS if migrations is None else migrations, key=lambda m: m.version)
+
+    @property
+    def latest_version(self) -> int:
+        return self.migrations[-1].version if self.migrations else 0
+
+    async def current_version(self) -> int:
+        """Текущая версия схемы (0 - пустая база)"""
+        try:
+            async with self.models._read() as db:
+                async with db.execute("SELECT MAX(version) FROM schema_version") as cursor:
+                    row = await cursor.fetchone()
+                    return row[0] or 0
+        except sqlite3.OperationalError:
+            # Таблицы schema_version еще нет
+            return 0
+
+    async def run(self) -> int:
+        """Применить недостающие миграции; без DDL, если схема актуальна"""
+        version = await self.current_version()
+        pending = [m for m in self.migrations if m.version > version]
+        if not pending:
+            return version
+
+        for migration in pending:
+            await self._apply(migration)
+            logger.info(f"🗄️ Миграция v{migration.version}: {migration.description}")
+
+        return self.latest_version
+
+    async def _apply(self, migration: Migration):
+        async with self.models._write() as db:
+            # Явный BEGIN: sqlite3 не открывает транзакцию перед DDL сам
+            await db.execute("BEGIN")
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    description TEXT,
+                    applied_at TIMESTAMP NOT NULL
+                )
+            """)
+
+            for table, column, declaration in migration.add_columns:
+                if not await self._column_exists(db, table, column):
+                    await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+
+            for statement in migration.statements:
+                await db.execute(statement)
+
+            if migration.apply_data:
+                await migration.apply_data(self.models, db)
+
+            await db.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (migration.version, migration.description, datetime.now().isoformat())
+            )
+
+    @staticmethod
+    async def _column_exists(db, table: str, column: str) -> bool:
+        async with db.execute(f"PRAGMA table_info({table})") as cursor:
+            return any(row[1] == column for row in await cursor.fetchall())
@@ -1,65 +1,88 @@
 import aiosqlite
-from datetime import datetime
-from typing import List, Optional, Dict
+import json
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, List, Mapping, Optional, Dict, Tuple, Union
+
+from database.migrations import MigrationRunner
+from database.pool import ConnectionPool
+from database.settings_cache import SettingsCache
+from database.write_buffer import SettingsWriteBuffer
+
+logger = logging.getLogger(__name__)
+
+# Префиксы ключей settings, которые раньше использовались как хранилище JSON-блобов
+BLOB_KEY_KINDS = {
+    'content_analysis_': 'content',
+    'hourly_stats_': 'hourly_stats',
+    'daily_report_': 'daily_report',
+    'weekly_trends_': 'weekly_trends',
+}
 
 
 class DatabaseModels:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, pool_size: int = 3):
         self.db_path = db_path
+        self.pool = ConnectionPool(db_path, readers=pool_size)
+        self.write_buffer = SettingsWriteBuffer(self._write_settings_batch)
+        self.settings_cache = SettingsCache()
+        # Подписчики на изменение настроек: (ключи или None - все, callback)
+        self._settings_listeners: List[Tuple[Optional[frozenset], Callable[[Dict[str, Optional[str]]], None]]] = []
+        self.schema_version = 0
+
+    @asynccontextmanager
+    async def _read(self):
+        """Соединение для чтения: из пула или разовое, если пул не открыт"""
+        if self.pool.is_open:
+            async with self.pool.reader() as db:
+                yield db
+        else:
+            async with aiosqlite.connect(self.db_path) as db:
+                yield db
+
+    @asynccontextmanager
+    async def _write(self):
+        """Соединение для записи с коммитом по завершении блока"""
+        if self.pool.is_open:
+            async with self.pool.writer() as db:
+                yield db
+        else:
+            async with aiosqlite.connect(self.db_path) as db:
+                yield db
+                await db.commit()
 
     async def init_database(self):
-        """Инициализация базы данных и создание таблиц"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Таблица каналов
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS channels (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    channel_id TEXT UNIQUE NOT NULL,
-                    channel_name TEXT NOT NULL,
-                    is_active BOOLEAN DEFAULT 1,
-                    posts_per_day INTEGER DEFAULT 5,
-                    last_post_time TIMESTAMP,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Таблица источников новостей
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS news_sources (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    url TEXT UNIQUE NOT NULL,
-                    source_type TEXT DEFAULT 'rss',
-                    is_active BOOLEAN DEFAULT 1,
-                    category TEXT DEFAULT 'общее',
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Таблица настроек
-            await db.execute("""
-                CREATE TABLE IF NOT EXISTS settings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    key TEXT UNIQUE NOT NULL,
-                    value TEXT NOT NULL,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            await db.commit()
+        """Инициализация базы данных и применение миграций схемы"""
+        await self.pool.open()
+        self.schema_version = await MigrationRunner(self).run()
+
+    async def ping(self):
+        """Проверка доступности БД (в обход кэша настроек)"""
+        async with self._read() as db:
+            async with db.execute("SELECT 1") as cursor:
+                await cursor.fetchone()
+
+    async def flush(self):
+        """Сброс отложенных записей настроек на диск"""
+        await self.write_buffer.flush()
+
+    async def close(self):
+        """Закрытие соединений с базой данных"""
+        await self.write_buffer.close()
+        await self.pool.close()
 
     async def add_channel(self, channel_id: str, channel_name: str, posts_per_day: int = 5):
         """Добавить канал"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute(
                 "INSERT OR REPLACE INTO channels (channel_id, channel_name, posts_per_day) VALUES (?, ?, ?)",
                 (channel_id, channel_name, posts_per_day)
             )
-            await db.commit()
 
     async def get_channels(self) -> List[Dict]:
         """Получить все каналы"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._read() as db:
             async with db.execute(
                     "SELECT channel_id, channel_name, is_active, posts_per_day FROM channels"
             ) as cursor:
@@ -76,18 +99,75 @@ class DatabaseModels:
 
     async def add_news_source(self, name: str, url: str, source_type: str = 'rss', category: str = 'общее'):
         """Добавить источник новостей"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute(
                 "INSERT OR REPLACE INTO news_sources (name, url, source_type, category) VALUES (?, ?, ?, ?)",
                 (name, url, source_type, category)
             )
-            await db.commit()
+
+    @staticmethod
+    def _bulk_rows(items: Iterable[Union[Dict, tuple]], fields: List[str], defaults: Dict) -> List[tuple]:
+        """Привести элементы (dict или tuple) к кортежам в порядке fields"""
+        rows = []
+        for item in items:
+            if isinstance(item, Mapping):
+                values = {**defaults, **item}
+            else:
+                values = {**defaults, **dict(zip(fields, item))}
+            rows.append(tuple(values.get(field) for field in fields))
+        return rows
+
+    async def _execute_bulk(self, sql: str, rows: List[tuple]) -> int:
+        """executemany в одной транзакции; возвращает число измененных строк"""
+        if not rows:
+            return 0
+        async with self._write() as db:
+            before = db.total_changes
+            await db.executemany(sql, rows)
+            return db.total_changes - before
+
+    async def add_news_sources_bulk(self, sources: Iterable[Union[Dict, tuple]], update_existing: bool = False) -> int:
+        """Массовое добавление источников: (name, url, source_type, category) или dict"""
+        rows = self._bulk_rows(
+            sources,
+            ['name', 'url', 'source_type', 'category'],
+            {'source_type': 'rss', 'category': 'общее'}
+        )
+        conflict = (
+            "DO UPDATE SET name = excluded.name, source_type = excluded.source_type, category = excluded.category"
+            if update_existing else "DO NOTHING"
+        )
+        return await self._execute_bulk(
+            f"""INSERT INTO news_sources (name, url, source_type, category) VALUES (?, ?, ?, ?)
+                ON CONFLICT(url) {conflict}""",
+            rows
+        )
+
+    async def add_channels_bulk(self, channels: Iterable[Union[Dict, tuple]], update_existing: bool = False) -> int:
+        """Массовое добавление каналов: (channel_id, channel_name, posts_per_day) или dict"""
+        rows = self._bulk_rows(
+            channels,
+            ['channel_id', 'channel_name', 'posts_per_day'],
+            {'posts_per_day': 5}
+        )
+        conflict = (
+            "DO UPDATE SET channel_name = excluded.channel_name, posts_per_day = excluded.posts_per_day"
+            if update_existing else "DO NOTHING"
+        )
+        return await self._execute_bulk(
+            f"""INSERT INTO channels (channel_id, channel_name, posts_per_day) VALUES (?, ?, ?)
+                ON CONFLICT(channel_id) {conflict}""",
+            rows
+        )
 
     async def get_news_sources(self) -> List[Dict]:
         """Получить все источники новостей"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._read() as db:
             async with db.execute(
-                    "SELECT id, name, url, source_type, is_active, category FROM news_sources WHERE is_active = 1"
+                    """SELECT id, name, url, source_type, is_active, category, fetch_full_text,
+                          etag, last_modified, fetch_count, not_modified_count,
+                          next_fetch_at, poll_interval, error_count
+                   FROM news_sources WHERE is_active = 1"""
             ) as cursor:
                 rows = await cursor.fetchall()
                 return [
@@ -97,55 +177,180 @@ class DatabaseModels:
                         "url": row[2],
                         "source_type": row[3],
                         "is_active": bool(row[4]),
-                        "category": row[5]
+                        "category": row[5],
+                        "fetch_full_text": bool(row[6]),
+                        "etag": row[7],
+                        "last_modified": row[8],
+                        "fetch_count": row[9] or 0,
+                        "not_modified_count": row[10] or 0,
+                        "next_fetch_at": row[11],
+                        "poll_interval": row[12],
+                        "error_count": row[13] or 0
                     }
                     for row in rows
                 ]
 
     async def get_setting(self, key: str) -> Optional[str]:
         """Получить настройку"""
-        async with aiosqlite.connect(self.db_path) as db:
+        pending = self.write_buffer.get(key)
+        if pending is not None:
+            return pending
+
+        if not self.settings_cache.loaded:
+            await self.load_settings_cache()
+
+        found, value = self.settings_cache.lookup(key)
+        if found:
+            return value
+
+        generation = self.settings_cache.generation
+        async with self._read() as db:
             async with db.execute(
                     "SELECT value FROM settings WHERE key = ?", (key,)
             ) as cursor:
                 row = await cursor.fetchone()
-                return row[0] if row else None
+                value = row[0] if row else None
+
+        if self.settings_cache.generation == generation:
+            self.settings_cache.put(key, value)
+        return value
+
+    async def get_setting_int(self, key: str, default: int = 0) -> int:
+        """Получить настройку как int"""
+        value = await self.get_setting(key)
+        try:
+            return int(value) if value is not None else default
+        except ValueError:
+            return default
+
+    async def get_setting_float(self, key: str, default: float = 0.0) -> float:
+        """Получить настройку как float"""
+        value = await self.get_setting(key)
+        try:
+            return float(value) if value is not None else default
+        except ValueError:
+            return default
+
+    async def get_setting_bool(self, key: str, default: bool = False) -> bool:
+        """Получить настройку как bool ('true'/'1'/'yes')"""
+        value = await self.get_setting(key)
+        if value is None:
+            return default
+        return value.strip().lower() in ('true', '1', 'yes', 'on')
+
+    async def load_settings_cache(self):
+        """Загрузить все настройки в кэш одним запросом"""
+        generation = self.settings_cache.generation
+        settings = await self.get_all_settings()
+        # Если за время чтения настройки менялись - снимок устарел
+        if self.settings_cache.generation == generation:
+            self.settings_cache.load(settings)
+
+    def on_settings_changed(self, callback: Callable[[Dict[str, Optional[str]]], None],
+                            keys: Iterable[str] = None):
+        """Подписка на изменение настроек: callback({ключ: значение}) после записи, None - удалена
+
+        Изменения одного вызова set_settings_bulk приходят одним словарем.
+        """
+        self._settings_listeners.append((frozenset(keys) if keys is not None else None, callback))
+
+    def _notify_settings(self, changes: Dict[str, Optional[str]]):
+        for keys, callback in self._settings_listeners:
+            relevant = changes if keys is None else {key: value for key, value in changes.items() if key in keys}
+            if not relevant:
+                continue
+            try:
+                callback(relevant)
+            except Exception as e:
+                logger.error(f"❌ Ошибка обработчика изменения настроек {sorted(relevant)}: {e}")
 
     async def set_setting(self, key: str, value: str):
         """Установить настройку"""
-        async with aiosqlite.connect(self.db_path) as db:
+        self.write_buffer.discard(key)
+        self.settings_cache.invalidate(key)
+        async with self._write() as db:
             await db.execute(
                 "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, ?)",
                 (key, value, datetime.now().isoformat())
             )
-            await db.commit()
+        self.settings_cache.put(key, value)
+        self._notify_settings({key: value})
+
+    async def queue_setting(self, key: str, value: str):
+        """Отложенная запись настройки (для фоновых метрик и служебных данных)"""
+        self.settings_cache.put(key, value)
+        await self.write_buffer.put(key, value)
+        self._notify_settings({key: value})
+
+    async def set_settings_bulk(self, settings: Mapping[str, str], overwrite: bool = True) -> int:
+        """Массовая запись настроек; overwrite=False не трогает существующие ключи"""
+        now = datetime.now().isoformat()
+        rows = [(key, str(value), now) for key, value in settings.items()]
+        for key in settings:
+            # Без overwrite отложенное значение из буфера важнее значения по умолчанию
+            if overwrite:
+                self.write_buffer.discard(key)
+            self.settings_cache.invalidate(key)
+
+        conflict = (
+            "DO UPDATE SET value = excluded.value, updated_at = excluded.updated_at"
+            if overwrite else "DO NOTHING"
+        )
+        changed = await self._execute_bulk(
+            f"""INSERT INTO settings (key, value, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(key) {conflict}""",
+            rows
+        )
+
+        # Без overwrite неизвестно, какие ключи записаны: они остаются "неизвестными" и читаются из БД
+        if overwrite:
+            for key, value, _ in rows:
+                self.settings_cache.put(key, value)
+            self._notify_settings({key: value for key, value, _ in rows})
+        return changed
+
+    async def _write_settings_batch(self, rows: List[tuple]):
+        """Запись пачки настроек одной транзакцией"""
+        async with self._write() as db:
+            await db.executemany(
+                "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, ?)",
+                rows
+            )
 
     async def get_statistics(self, channel_id: str = None) -> Dict:
         """Получить статистику"""
-        # Простая заглушка
+        now = datetime.now()
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+
+        total = await self.get_period_summary(None, channel_id=channel_id)
+        week = await self.get_period_summary(now - timedelta(days=7), channel_id=channel_id)
+        today = await self.get_period_summary(today_start, channel_id=channel_id)
+
         return {
-            "posts_count": 0,
-            "total_views": 0
+            "posts_count": total['posts_count'],
+            "total_views": total['total_views'],
+            "week_posts": week['posts_count'],
+            "week_views": week['total_views'],
+            "today_posts": today['posts_count'],
+            "today_views": today['total_views']
         }
 
     async def delete_channel(self, channel_id: str):
         """Удалить канал"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute("DELETE FROM channels WHERE channel_id = ?", (channel_id,))
-            await db.commit()
 
     async def update_channel_status(self, channel_id: str, is_active: bool):
         """Обновить статус канала"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute(
                 "UPDATE channels SET is_active = ? WHERE channel_id = ?",
                 (is_active, channel_id)
             )
-            await db.commit()
 
     async def get_channel_by_id(self, channel_id: str) -> Optional[Dict]:
         """Получить канал по ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._read() as db:
             async with db.execute(
                 "SELECT channel_id, channel_name, is_active, posts_per_day FROM channels WHERE channel_id = ?",
                 (channel_id,)
@@ -162,24 +367,60 @@ class DatabaseModels:
 
     async def update_source_status(self, source_id: int, is_active: bool):
         """Обновить статус источника"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute(
                 "UPDATE news_sources SET is_active = ? WHERE id = ?",
                 (is_active, source_id)
             )
-            await db.commit()
+
+    async def update_source_full_text(self, source_id: int, enabled: bool):
+        """Включить/выключить загрузку полного текста статей источника"""
+        async with self._write() as db:
+            await db.execute(
+                "UPDATE news_sources SET fetch_full_text = ? WHERE id = ?",
+                (enabled, source_id)
+            )
+
+    async def update_sources_fetch_state(self, states: Dict[int, Dict]):
+        """Сохранить ETag/Last-Modified и счетчики запросов источников"""
+        now = datetime.now().isoformat()
+        rows = [
+            (int(state['not_modified']), state.get('etag'), state.get('last_modified'), now, source_id)
+            for source_id, state in states.items()
+        ]
+        await self._execute_bulk(
+            """UPDATE news_sources SET
+                   fetch_count = COALESCE(fetch_count, 0) + 1,
+                   not_modified_count = COALESCE(not_modified_count, 0) + ?,
+                   etag = ?, last_modified = ?, last_fetched_at = ?
+               WHERE id = ?""",
+            rows
+        )
+
+    async def update_sources_schedule(self, plans: Dict[int, Dict]):
+        """Сохранить интервал опроса, число ошибок подряд и время следующего опроса источников"""
+        rows = [
+            (plan['poll_interval'], plan['error_count'], plan['next_fetch_at'].isoformat(), source_id)
+            for source_id, plan in plans.items()
+        ]
+        await self._execute_bulk(
+            "UPDATE news_sources SET poll_interval = ?, error_count = ?, next_fetch_at = ? WHERE id = ?",
+            rows
+        )
 
     async def delete_source(self, source_id: int):
         """Удалить источник"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute("DELETE FROM news_sources WHERE id = ?", (source_id,))
-            await db.commit()
 
     async def get_source_by_id(self, source_id: int) -> Optional[Dict]:
         """Получить источник по ID"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._read() as db:
             async with db.execute(
-                "SELECT id, name, url, source_type, is_active, category FROM news_sources WHERE id = ?",
+                """SELECT id, name, url, source_type, is_active, category, fetch_full_text,
+                          etag, last_modified, fetch_count, not_modified_count,
+                          next_fetch_at, poll_interval, error_count
+                   FROM news_sources WHERE id = ?""",
                 (source_id,)
             ) as cursor:
                 row = await cursor.fetchone()
@@ -190,44 +431,56 @@ class DatabaseModels:
                         "url": row[2],
                         "source_type": row[3],
                         "is_active": bool(row[4]),
-                        "category": row[5]
+                        "category": row[5],
+                        "fetch_full_text": bool(row[6]),
+                        "etag": row[7],
+                        "last_modified": row[8],
+                        "fetch_count": row[9] or 0,
+                        "not_modified_count": row[10] or 0,
+                        "next_fetch_at": row[11],
+                        "poll_interval": row[12],
+                        "error_count": row[13] or 0
                     }
                 return None
 
     async def get_all_settings(self) -> Dict[str, str]:
         """Получить все настройки"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._read() as db:
             async with db.execute("SELECT key, value FROM settings") as cursor:
                 rows = await cursor.fetchall()
-                return {row[0]: row[1] for row in rows}
+                settings = {row[0]: row[1] for row in rows}
+
+        settings.update(self.write_buffer.pending_items())
+        return settings
 
     async def delete_setting(self, key: str):
         """Удалить настройку"""
-        async with aiosqlite.connect(self.db_path) as db:
+        self.write_buffer.discard(key)
+        self.settings_cache.invalidate(key)
+        async with self._write() as db:
             await db.execute("DELETE FROM settings WHERE key = ?", (key,))
-            await db.commit()
+        self.settings_cache.put(key, None)
+        self._notify_settings({key: None})
 
     async def update_channel_posts_per_day(self, channel_id: str, posts_per_day: int):
         """Обновить количество постов в день для канала"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute(
                 "UPDATE channels SET posts_per_day = ? WHERE channel_id = ?",
                 (posts_per_day, channel_id)
             )
-            await db.commit()
 
     async def update_last_post_time(self, channel_id: str):
         """Обновить время последнего поста"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute(
                 "UPDATE channels SET last_post_time = ? WHERE channel_id = ?",
                 (datetime.now().isoformat(), channel_id)
             )
-            await db.commit()
 
     async def get_active_channels(self) -> List[Dict]:
         """Получить только активные каналы"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._read() as db:
             async with db.execute(
                 "SELECT channel_id, channel_name, posts_per_day FROM channels WHERE is_active = 1"
             ) as cursor:
@@ -243,7 +496,7 @@ class DatabaseModels:
 
     async def get_active_sources(self) -> List[Dict]:
         """Получить только активные источники"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._read() as db:
             async with db.execute(
                 "SELECT id, name, url, category FROM news_sources WHERE is_active = 1"
             ) as cursor:
@@ -256,4 +509,577 @@ class DatabaseModels:
                         "category": row[3]
                     }
                     for row in rows
-                ]
\ No newline at end of file
+                ]
+
+    # ========================================
+    # ПОСТЫ, МЕТРИКИ И РЕЗУЛЬТАТЫ АНАЛИЗА
+    # ========================================
+
+    @staticmethod
+    def _range_filter(column: str, since: Optional[datetime], until: Optional[datetime],
+                      conditions: List[str], params: List):
+        """Добавить условия диапазона времени (ISO-строки сравниваются лексикографически)"""
+        if since:
+            conditions.append(f"{column} >= ?")
+            params.append(since.isoformat())
+        if until:
+            conditions.append(f"{column} < ?")
+            params.append(until.isoformat())
+
+    async def add_published_post(self, channel_id: str, post_id: str, content: str,
+                                 original_title: str = None, source_url: str = None,
+                                 category: str = 'общее', style: str = None,
+                                 published_at: datetime = None):
+        """Сохранить опубликованный пост"""
+        async with self._write() as db:
+            await db.execute(
+                """INSERT OR REPLACE INTO posts
+                   (post_id, channel_id, content, original_title, source_url, category, style, published_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (str(post_id), channel_id, content, original_title, source_url, category, style,
+                 (published_at or datetime.now()).isoformat())
+            )
+
+    async def get_published_posts(self, channel_id: str = None, since: datetime = None,
+                                  until: datetime = None, limit: int = 100) -> List[Dict]:
+        """Получить опубликованные посты за период"""
+        conditions, params = [], []
+        if channel_id:
+            conditions.append("channel_id = ?")
+            params.append(channel_id)
+        self._range_filter('published_at', since, until, conditions, params)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+
+        async with self._read() as db:
+            async with db.execute(
+                f"""SELECT post_id, channel_id, content, original_title, source_url, category, style, published_at
+                    FROM posts {where} ORDER BY published_at DESC LIMIT ?""",
+                params
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [
+                    {
+                        "post_id": row[0],
+                        "channel_id": row[1],
+                        "content": row[2],
+                        "original_title": row[3],
+                        "source_url": row[4],
+                        "category": row[5],
+                        "style": row[6],
+                        "published_at": row[7]
+                    }
+                    for row in rows
+                ]
+
+    @staticmethod
+    def _metric_row(post_id: str, channel_id: str, metrics: Dict, analysis: Optional[Dict],
+                    captured_at: str) -> Tuple:
+        return (
+            str(post_id), channel_id,
+            int(metrics.get('views', 0)), int(metrics.get('likes', 0)),
+            int(metrics.get('shares', 0)), int(metrics.get('comments', 0)),
+            float(metrics.get('engagement_rate', 0)),
+            (analysis or {}).get('score'),
+            json.dumps(analysis, ensure_ascii=False) if analysis is not None else None,
+            captured_at
+        )
+
+    async def add_metric_snapshot(self, post_id: str, channel_id: str, metrics: Dict,
+                                  analysis: Dict = None, captured_at: datetime = None):
+        """Сохранить снимок метрик поста"""
+        async with self._write() as db:
+            await db.execute(
+                """INSERT INTO performance_metrics
+                   (post_id, channel_id, views, likes, shares, comments, engagement_rate, score, analysis, captured_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                self._metric_row(post_id, channel_id, metrics, analysis,
+                                 (captured_at or datetime.now()).isoformat())
+            )
+
+    async def add_metric_snapshots_bulk(self, snapshots: Iterable[Dict]) -> int:
+        """Сохранить пачку снимков (в формате истории PerformanceTracker) одной транзакцией"""
+        return await self._execute_bulk(
+            """INSERT INTO performance_metrics
+               (post_id, channel_id, views, likes, shares, comments, engagement_rate, score, analysis, captured_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                self._metric_row(item['post_id'], item['channel_id'], item.get('metrics') or {},
+                                 item.get('analysis'), item.get('timestamp') or datetime.now().isoformat())
+                for item in snapshots
+            ]
+        )
+
+    async def get_metric_snapshots(self, since: datetime = None, until: datetime = None,
+                                   channel_id: str = None, post_id: str = None,
+                                   limit: int = 1000) -> List[Dict]:
+        """Получить снимки метрик за период (в формате истории PerformanceTracker)"""
+        conditions, params = [], []
+        if post_id:
+            conditions.append("post_id = ?")
+            params.append(str(post_id))
+        if channel_id:
+            conditions.append("channel_id = ?")
+            params.append(channel_id)
+        self._range_filter('captured_at', since, until, conditions, params)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+
+        async with self._read() as db:
+            async with db.execute(
+                f"""SELECT post_id, channel_id, views, likes, shares, comments, engagement_rate, analysis, captured_at
+                    FROM (SELECT * FROM performance_metrics {where} ORDER BY captured_at DESC LIMIT ?)
+                    ORDER BY captured_at""",
+                params
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [
+                    {
+                        "post_id": row[0],
+                        "channel_id": row[1],
+                        "metrics": {
+                            "views": row[2],
+                            "likes": row[3],
+                            "shares": row[4],
+                            "comments": row[5],
+                            "engagement_rate": row[6]
+                        },
+                        "analysis": json.loads(row[7]) if row[7] else {},
+                        "timestamp": row[8]
+                    }
+                    for row in rows
+                ]
+
+    async def get_period_summary(self, since: Optional[datetime], until: datetime = None,
+                                 channel_id: str = None) -> Dict:
+        """Сводка по постам и последним снимкам их метрик за период"""
+        conditions, params = [], []
+        if channel_id:
+            conditions.append("p.channel_id = ?")
+            params.append(channel_id)
+        self._range_filter('p.published_at', since, until, conditions, params)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        async with self._read() as db:
+            async with db.execute(
+                f"""SELECT COUNT(*), COALESCE(SUM(m.views), 0), COALESCE(SUM(m.likes), 0),
+                           COALESCE(SUM(m.shares), 0), COALESCE(SUM(m.comments), 0)
+                    FROM posts p
+                    LEFT JOIN performance_metrics m ON m.id = (
+                        SELECT id FROM performance_metrics
+                        WHERE post_id = p.post_id AND channel_id = p.channel_id
+                        ORDER BY captured_at DESC LIMIT 1
+                    )
+                    {where}""",
+                params
+            ) as cursor:
+                row = await cursor.fetchone()
+
+        posts_count, views, likes, shares, comments = row
+        engagement = (likes + shares + comments) / views * 100 if views else 0.0
+
+        return {
+            "posts_count": posts_count,
+            "total_views": views,
+            "total_likes": likes,
+            "total_shares": shares,
+            "total_comments": comments,
+            "engagement_rate": round(engagement, 2)
+        }
+
+    async def save_analysis_result(self, kind: str, result: Dict, period_key: str = None,
+                                   overall_score: float = None, created_at: datetime = None):
+        """Сохранить результат анализа или отчет (повторная запись за период перезаписывает)"""
+        created = created_at or datetime.now()
+        async with self._write() as db:
+            await db.execute(
+                """INSERT OR REPLACE INTO analysis_results (kind, period_key, overall_score, payload, created_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (kind, period_key or str(created.timestamp()), overall_score,
+                 json.dumps(result, ensure_ascii=False, default=str), created.isoformat())
+            )
+
+    async def get_analysis_results(self, kind: str, since: datetime = None, until: datetime = None,
+                                   limit: int = 50) -> List[Dict]:
+        """Получить результаты анализа указанного типа за период (новые сначала)"""
+        conditions, params = ["kind = ?"], [kind]
+        self._range_filter('created_at', since, until, conditions, params)
+        params.append(limit)
+
+        async with self._read() as db:
+            async with db.execute(
+                f"""SELECT period_key, overall_score, payload, created_at FROM analysis_results
+                    WHERE {' AND '.join(conditions)} ORDER BY created_at DESC LIMIT ?""",
+                params
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [
+                    {
+                        "kind": kind,
+                        "period_key": row[0],
+                        "overall_score": row[1],
+                        "result": json.loads(row[2]),
+                        "created_at": row[3]
+                    }
+                    for row in rows
+                ]
+
+    async def _migrate_settings_blobs(self, db) -> int:
+        """Разовый перенос JSON-блобов из settings в типизированные таблицы (миграция v2)"""
+        prefixes = ['performance_', *BLOB_KEY_KINDS]
+        # GLOB, а не LIKE: в LIKE символ '_' - шаблон
+        where = " OR ".join("key GLOB ?" for _ in prefixes)
+
+        async with db.execute(
+            f"SELECT key, value, updated_at FROM settings WHERE {where}",
+            [f"{prefix}*" for prefix in prefixes]
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+        if not rows:
+            return 0
+
+        metric_rows, analysis_rows, migrated_keys = [], [], []
+        for key, value, updated_at in rows:
+            try:
+                data = json.loads(value)
+            except (TypeError, ValueError):
+                logger.warning(f"⚠️ Пропущен некорректный блоб {key}")
+                continue
+
+            if key.startswith('performance_'):
+                metric_rows.append(self._metric_row(
+                    data.get('post_id', key[len('performance_'):]),
+                    data.get('channel_id', ''),
+                    data.get('metrics') or {},
+                    data.get('analysis'),
+                    data.get('timestamp') or updated_at
+                ))
+            else:
+                prefix = next(p for p in BLOB_KEY_KINDS if key.startswith(p))
+                created_at = updated_at
+                if prefix == 'content_analysis_':
+                    created_at = data.get('analysis_timestamp') or updated_at
+                analysis_rows.append((
+                    BLOB_KEY_KINDS[prefix], key[len(prefix):],
+                    data.get('overall_score') if isinstance(data, dict) else None,
+                    value, created_at
+                ))
+            migrated_keys.append((key,))
+
+        await db.executemany(
+            """INSERT INTO performance_metrics
+               (post_id, channel_id, views, likes, shares, comments, engagement_rate, score, analysis, captured_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            metric_rows
+        )
+        await db.executemany(
+            """INSERT OR REPLACE INTO analysis_results (kind, period_key, overall_score, payload, created_at)
+               VALUES (?, ?, ?, ?, ?)""",
+            analysis_rows
+        )
+        await db.executemany("DELETE FROM settings WHERE key = ?", migrated_keys)
+
+        logger.info(f"📦 Перенесено {len(migrated_keys)} блобов из settings в таблицы")
+        return len(migrated_keys)
+
+    # ========================================
+    # ИНДЕКС ОБРАБОТАННЫХ СТАТЕЙ
+    # ========================================
+
+    async def get_article_states(self, url_keys: List[str], title_hashes: List[str]) -> List[Dict]:
+        """Известные статьи, совпадающие по каноническому URL или хешу заголовка"""
+        if not url_keys and not title_hashes:
+            return []
+
+        url_marks = ", ".join("?" for _ in url_keys) or "NULL"
+        title_marks = ", ".join("?" for _ in title_hashes) or "NULL"
+
+        async with self._read() as db:
+            async with db.execute(
+                f"""SELECT url_key, title_hash, content, rewritten_at FROM articles
+                    WHERE url_key IN ({url_marks}) OR title_hash IN ({title_marks})""",
+                [*url_keys, *title_hashes]
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [
+                    {
+                        "url_key": row[0],
+                        "title_hash": row[1],
+                        "content": row[2],
+                        "rewritten_at": row[3]
+                    }
+                    for row in rows
+                ]
+
+    async def add_articles_bulk(self, articles: Iterable[Union[Dict, tuple]]) -> int:
+        """Отметить статьи как полученные: (url_key, title_hash, title, content, source_id) или dict"""
+        rows = self._bulk_rows(
+            articles,
+            ['url_key', 'title_hash', 'title', 'content', 'source_id', 'first_seen_at'],
+            {'first_seen_at': datetime.now().isoformat()}
+        )
+        return await self._execute_bulk(
+            """INSERT INTO articles (url_key, title_hash, title, content, source_id, first_seen_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(url_key) DO NOTHING""",
+            rows
+        )
+
+    async def mark_article_rewritten(self, url_key: str, title_hash: str, title: str = None):
+        """Отметить статью как переписанную ИИ"""
+        now = datetime.now().isoformat()
+        async with self._write() as db:
+            await db.execute(
+                """INSERT INTO articles (url_key, title_hash, title, first_seen_at, rewritten_at)
+                   VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(url_key) DO UPDATE SET rewritten_at = excluded.rewritten_at""",
+                (url_key, title_hash, title, now, now)
+            )
+
+    async def mark_article_published(self, url_key: str, channel_id: str):
+        """Отметить публикацию статьи в канале"""
+        async with self._write() as db:
+            await db.execute(
+                "INSERT OR IGNORE INTO article_publications (url_key, channel_id, published_at) VALUES (?, ?, ?)",
+                (url_key, channel_id, datetime.now().isoformat())
+            )
+
+    async def get_article_publications(self, url_keys: List[str]) -> Dict[str, set]:
+        """Каналы, в которых уже опубликованы статьи"""
+        if not url_keys:
+            return {}
+
+        marks = ", ".join("?" for _ in url_keys)
+        async with self._read() as db:
+            async with db.execute(
+                f"SELECT url_key, channel_id FROM article_publications WHERE url_key IN ({marks})",
+                url_keys
+            ) as cursor:
+                rows = await cursor.fetchall()
+
+        publications: Dict[str, set] = {}
+        for url_key, channel_id in rows:
+            publications.setdefault(url_key, set()).add(channel_id)
+        return publications
+
+    async def prune_articles(self, older_than: datetime) -> int:
+        """Удалить записи о статьях старше указанной даты"""
+        cutoff = older_than.isoformat()
+        async with self._write() as db:
+            before = db.total_changes
+            await db.execute(
+                """DELETE FROM article_publications WHERE url_key IN
+                   (SELECT url_key FROM articles WHERE first_seen_at < ?)""",
+                (cutoff,)
+            )
+            await db.execute("DELETE FROM articles WHERE first_seen_at < ?", (cutoff,))
+            return db.total_changes - before
+
+    async def add_story_signatures(self, signatures: Iterable[tuple]) -> int:
+        """Сохранить сигнатуры сюжетов: (url_key, signature)"""
+        now = datetime.now().isoformat()
+        return await self._execute_bulk(
+            "INSERT OR IGNORE INTO story_signatures (url_key, signature, created_at) VALUES (?, ?, ?)",
+            [(url_key, signature, now) for url_key, signature in signatures]
+        )
+
+    async def get_story_signatures(self, since: datetime) -> List[tuple]:
+        """Сигнатуры сюжетов, сохраненные после указанной даты: (url_key, signature)"""
+        async with self._read() as db:
+            async with db.execute(
+                "SELECT url_key, signature FROM story_signatures WHERE created_at >= ?",
+                (since.isoformat(),)
+            ) as cursor:
+                return [(row[0], row[1]) for row in await cursor.fetchall()]
+
+    async def get_ai_cache_entry(self, cache_key: str, since: datetime) -> Optional[str]:
+        """Значение из кэша ИИ не старше since (счетчики попаданий - add_ai_cache_hits)"""
+        async with self._read() as db:
+            async with db.execute(
+                "SELECT value FROM ai_cache WHERE cache_key = ? AND created_at >= ?",
+                (cache_key, since.isoformat())
+            ) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+
+    async def add_ai_cache_hits(self, rows: Iterable[tuple]) -> int:
+        """Добавить накопленные попадания кэша ИИ: (hits, last_hit_at, cache_key)"""
+        return await self._execute_bulk(
+            """UPDATE ai_cache SET hits = hits + ?, last_hit_at = MAX(COALESCE(last_hit_at, ''), ?)
+               WHERE cache_key = ?""",
+            list(rows)
+        )
+
+    async def put_ai_cache_entry(self, cache_key: str, kind: str, model: str, value: str):
+        """Сохранить ответ ИИ (повторная генерация перезаписывает запись)"""
+        async with self._write() as db:
+            await db.execute(
+                """INSERT INTO ai_cache (cache_key, kind, model, value, created_at) VALUES (?, ?, ?, ?, ?)
+                   ON CONFLICT(cache_key) DO UPDATE SET
+                       value = excluded.value, created_at = excluded.created_at, last_hit_at = NULL, hits = 0""",
+                (cache_key, kind, model, value, datetime.now().isoformat())
+            )
+
+    async def prune_ai_cache(self, older_than: datetime, max_entries: int) -> int:
+        """Удалить записи кэша ИИ старше даты и сверх max_entries (давно не использованные)"""
+        async with self._write() as db:
+            before = db.total_changes
+            await db.execute("DELETE FROM ai_cache WHERE created_at < ?", (older_than.isoformat(),))
+            await db.execute(
+                """DELETE FROM ai_cache WHERE cache_key NOT IN (
+                       SELECT cache_key FROM ai_cache
+                       ORDER BY COALESCE(last_hit_at, created_at) DESC LIMIT ?
+                   )""",
+                (max_entries,)
+            )
+            return db.total_changes - before
+
+    async def get_ai_cache_size(self) -> Dict:
+        """Число записей кэша ИИ и сумма попаданий по ним"""
+        async with self._read() as db:
+            async with db.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM ai_cache") as cursor:
+                row = await cursor.fetchone()
+                return {'entries': row[0], 'hits': row[1]}
+
+    async def add_token_usage(self, rows: Iterable[tuple]) -> int:
+        """Добавить к учету токенов: (day, model, channel_id, requests, prompt_tokens, completion_tokens, cost_usd)"""
+        return await self._execute_bulk(
+            """INSERT INTO token_usage (day, model, channel_id, requests, prompt_tokens, completion_tokens, cost_usd)
+               VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT(day, model, channel_id) DO UPDATE SET
+                   requests = requests + excluded.requests,
+                   prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                   completion_tokens = completion_tokens + excluded.completion_tokens,
+                   cost_usd = cost_usd + excluded.cost_usd""",
+            list(rows)
+        )
+
+    async def get_token_usage(self, since: str) -> List[Dict]:
+        """Строки учета токенов начиная с дня since (YYYY-MM-DD)"""
+        async with self._read() as db:
+            async with db.execute(
+                """SELECT day, model, channel_id, requests, prompt_tokens, completion_tokens, cost_usd
+                   FROM token_usage WHERE day >= ? ORDER BY day, model, channel_id""",
+                (since,)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [
+                    {
+                        "day": row[0],
+                        "model": row[1],
+                        "channel_id": row[2],
+                        "requests": row[3],
+                        "prompt_tokens": row[4],
+                        "completion_tokens": row[5],
+                        "cost_usd": row[6]
+                    }
+                    for row in rows
+                ]
+
+    async def get_token_usage_totals(self, day: str) -> Dict:
+        """Запросы, токены и стоимость за день по всем моделям и каналам"""
+        async with self._read() as db:
+            async with db.execute(
+                """SELECT COALESCE(SUM(requests), 0), COALESCE(SUM(prompt_tokens + completion_tokens), 0),
+                          COALESCE(SUM(cost_usd), 0) FROM token_usage WHERE day = ?""",
+                (day,)
+            ) as cursor:
+                row = await cursor.fetchone()
+                return {'requests': row[0], 'tokens': row[1], 'cost_usd': row[2]}
+
+    async def add_ai_batch(self, batch_id: str, input_file_id: str, model: str, style: str,
+                           items: str, request_count: int, status: str):
+        """Запомнить отправленный пакет Batch API (items - JSON новостей по custom_id)"""
+        async with self._write() as db:
+            await db.execute(
+                """INSERT INTO ai_batches (batch_id, input_file_id, model, style, items, request_count, status, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
+                (batch_id, input_file_id, model, style, items, request_count, status, datetime.now().isoformat())
+            )
+
+    async def update_ai_batch(self, batch_id: str, status: str, posts_count: int = None, finished: bool = False):
+        """Обновить статус пакета; finished - пакет обработан и больше не опрашивается"""
+        async with self._write() as db:
+            await db.execute(
+                """UPDATE ai_batches SET status = ?, posts_count = COALESCE(?, posts_count),
+                       finished_at = CASE WHEN ? THEN ? ELSE finished_at END
+                   WHERE batch_id = ?""",
+                (status, posts_count, finished, datetime.now().isoformat(), batch_id)
+            )
+
+    async def get_open_ai_batches(self) -> List[Dict]:
+        """Пакеты, результаты которых еще не загружены"""
+        async with self._read() as db:
+            async with db.execute(
+                """SELECT batch_id, model, style, items, request_count, status, created_at
+                   FROM ai_batches WHERE finished_at IS NULL ORDER BY created_at"""
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [
+                    {
+                        "batch_id": row[0],
+                        "model": row[1],
+                        "style": row[2],
+                        "items": row[3],
+                        "request_count": row[4],
+                        "status": row[5],
+                        "created_at": row[6]
+                    }
+                    for row in rows
+                ]
+
+    async def add_ready_posts(self, posts: Iterable[tuple]) -> int:
+        """Добавить готовые посты в очередь: (batch_id, url_key, post JSON)"""
+        now = datetime.now().isoformat()
+        return await self._execute_bulk(
+            "INSERT INTO ready_posts (batch_id, url_key, post, created_at) VALUES (?, ?, ?, ?)",
+            [(batch_id, url_key, post, now) for batch_id, url_key, post in posts]
+        )
+
+    async def get_ready_posts(self, limit: int, since: datetime) -> List[tuple]:
+        """Неопубликованные готовые посты не старше since, в порядке готовности: (id, post JSON)"""
+        async with self._read() as db:
+            async with db.execute(
+                """SELECT id, post FROM ready_posts
+                   WHERE published_at IS NULL AND created_at >= ?
+                   ORDER BY created_at, id LIMIT ?""",
+                (since.isoformat(), limit)
+            ) as cursor:
+                return [(row[0], row[1]) for row in await cursor.fetchall()]
+
+    async def mark_ready_post_published(self, post_id: int):
+        async with self._write() as db:
+            await db.execute(
+                "UPDATE ready_posts SET published_at = ? WHERE id = ?",
+                (datetime.now().isoformat(), post_id)
+            )
+
+    async def get_ready_posts_count(self, since: datetime) -> int:
+        """Сколько готовых постов ждет публикации"""
+        async with self._read() as db:
+            async with db.execute(
+                "SELECT COUNT(*) FROM ready_posts WHERE published_at IS NULL AND created_at >= ?",
+                (since.isoformat(),)
+            ) as cursor:
+                return (await cursor.fetchone())[0]
+
+    async def prune_ready_posts(self, older_than: datetime) -> int:
+        """Удалить готовые посты и завершенные пакеты старше указанной даты"""
+        async with self._write() as db:
+            before = db.total_changes
+            await db.execute("DELETE FROM ready_posts WHERE created_at < ?", (older_than.isoformat(),))
+            await db.execute(
+                "DELETE FROM ai_batches WHERE finished_at IS NOT NULL AND finished_at < ?",
+                (older_than.isoformat(),)
+            )
+            return db.total_changes - before
+
+    async def prune_story_signatures(self, older_than: datetime) -> int:
+        """Удалить сигнатуры сюжетов старше указанной даты"""
+        async with self._write() as db:
+            before = db.total_changes
+            await db.execute("DELETE FROM story_signatures WHERE created_at < ?", (older_than.isoformat(),))
+            return db.total_changes - before
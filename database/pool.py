@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """Долгоживущие соединения SQLite: один писатель и небольшой пул читателей"""
+
+    def __init__(self, db_path: str, readers: int = 3, cached_statements: int = 256,
+                 busy_timeout_ms: int = 5000):
+        self.db_path = db_path
+        # In-memory база видна только своему соединению - читаем через писателя
+        self.readers_count = 0 if db_path == ':memory:' else max(0, readers)
+        self.cached_statements = cached_statements
+        self.busy_timeout_ms = busy_timeout_ms
+
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._write_lock = asyncio.Lock()
+        self._readers: Optional[asyncio.Queue] = None
+        self._all_readers: List[aiosqlite.Connection] = []
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def open(self):
+        """Открытие соединений и настройка WAL"""
+        if self.is_open:
+            return
+
+        self._writer = await self._connect()
+        # WAL позволяет читателям работать параллельно с писателем
+        await self._writer.execute("PRAGMA journal_mode=WAL")
+        await self._writer.execute("PRAGMA synchronous=NORMAL")
+        await self._writer.commit()
+
+        self._readers = asyncio.Queue()
+        for _ in range(self.readers_count):
+            conn = await self._connect(read_only=True)
+            self._all_readers.append(conn)
+            self._readers.put_nowait(conn)
+
+        logger.info(f"🗄️ Пул БД открыт: 1 писатель, {self.readers_count} читателей")
+
+    async def close(self):
+        """Закрытие всех соединений пула"""
+        if not self.is_open:
+            return
+
+        async with self._write_lock:
+            for conn in self._all_readers:
+                try:
+                    await conn.close()
+                except Exception as e:
+                    logger.error(f"Ошибка закрытия соединения читателя: {e}")
+            self._all_readers = []
+            self._readers = None
+
+            try:
+                await self._writer.close()
+            finally:
+                self._writer = None
+
+        logger.info("🗄️ Пул БД закрыт")
+
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        # cached_statements - размер кэша подготовленных выражений sqlite3
+        conn = await aiosqlite.connect(self.db_path, cached_statements=self.cached_statements)
+        await conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        if read_only:
+            await conn.execute("PRAGMA query_only=ON")
+        return conn
+
+    @asynccontextmanager
+    async def reader(self):
+        """Соединение для чтения из пула"""
+        if not self.readers_count:
+            async with self._write_lock:
+                yield self._writer
+            return
+
+        conn = await self._readers.get()
+        try:
+            yield conn
+        finally:
+            if self._readers is not None:
+                self._readers.put_nowait(conn)
+
+    @asynccontextmanager
+    async def writer(self):
+        """Единственное соединение для записи; коммит при успешном выходе"""
+        async with self._write_lock:
+            try:
+                yield self._writer
+                await self._writer.commit()
+            except Exception:
+                await self._writer.rollback()
+                raise
@@ -0,0 +1,85 @@
+import time
+from typing import Dict, Optional, Set, Tuple
+
+
+class SettingsCache:
+    """Кэш настроек в памяти с опциональным TTL по ключам"""
+
+    def __init__(self, default_ttl: Optional[float] = None):
+        self.default_ttl = default_ttl
+        self.ttls: Dict[str, float] = {}
+        self.loaded = False
+
+        # key -> (value, expires_at); None в value - настройки нет в БД
+        self._entries: Dict[str, Tuple[Optional[str], Optional[float]]] = {}
+        # Ключи, значение которых сейчас неизвестно (идет запись): чтение идет в БД
+        self._unknown: Set[str] = set()
+        self.hits = 0
+        self.misses = 0
+        # Растет при каждом изменении - защищает от загрузки устаревшего снимка
+        self.generation = 0
+
+    def set_ttl(self, key: str, ttl: Optional[float]):
+        """Задать время жизни значения ключа в секундах (None - бессрочно)"""
+        if ttl is None:
+            self.ttls.pop(key, None)
+        else:
+            self.ttls[key] = ttl
+        self.invalidate(key)
+
+    def _expires_at(self, key: str) -> Optional[float]:
+        ttl = self.ttls.get(key, self.default_ttl)
+        return time.monotonic() + ttl if ttl is not None else None
+
+    def lookup(self, key: str) -> Tuple[bool, Optional[str]]:
+        """(найдено, значение). После полной загрузки отсутствие ключа - тоже попадание"""
+        if key in self._unknown:
+            self.misses += 1
+            return False, None
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self.hits += 1
+                return True, value
+            del self._entries[key]
+        elif self.loaded and key not in self.ttls:
+            self.hits += 1
+            return True, None
+
+        self.misses += 1
+        return False, None
+
+    def put(self, key: str, value: Optional[str]):
+        self._entries[key] = (value, self._expires_at(key))
+        self._unknown.discard(key)
+        self.generation += 1
+
+    def invalidate(self, key: str):
+        """Забыть значение: до следующего put ключ читается из БД, а не считается отсутствующим"""
+        self._entries.pop(key, None)
+        self._unknown.add(key)
+        self.generation += 1
+
+    def load(self, settings: Dict[str, str]):
+        """Полная загрузка всех настроек"""
+        self._entries = {key: (value, self._expires_at(key)) for key, value in settings.items()}
+        self._unknown.clear()
+        self.loaded = True
+
+    def clear(self):
+        self._entries = {}
+        self._unknown.clear()
+        self.loaded = False
+        self.generation += 1
+
+    @property
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 1) if total else 0.0
+        }
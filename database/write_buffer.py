@@ -0,0 +1,122 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (key, value, updated_at)
+SettingRow = Tuple[str, str, str]
+
+
+class SettingsWriteBuffer:
+    """Отложенная запись настроек: склеивает записи по ключу и сбрасывает их одной транзакцией"""
+
+    def __init__(self, flush_callback: Callable[[List[SettingRow]], Awaitable[None]],
+                 max_pending: int = 100, flush_interval: float = 5.0, max_retry_interval: float = 300.0):
+        self.flush_callback = flush_callback
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_retry_interval = max_retry_interval
+
+        self._pending: Dict[str, SettingRow] = {}
+        # Пачка, которая сейчас пишется: до коммита ее значения читаются отсюда, а не из БД
+        self._in_flight: Dict[str, SettingRow] = {}
+        # Неудачных сбросов подряд: пауза до повтора растет экспоненциально
+        self._failures = 0
+        self._flush_lock = asyncio.Lock()
+        self._timer_task: Optional[asyncio.Task] = None
+
+        # Статистика для оценки эффекта склейки
+        self.stats = {
+            'queued': 0,
+            'coalesced': 0,
+            'flushes': 0,
+            'rows_written': 0,
+            'failed_flushes': 0
+        }
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def get(self, key: str) -> Optional[str]:
+        """Значение, ожидающее записи (если есть)"""
+        row = self._pending.get(key) or self._in_flight.get(key)
+        return row[1] if row else None
+
+    def pending_items(self) -> Dict[str, str]:
+        return {key: row[1] for key, row in {**self._in_flight, **self._pending}.items()}
+
+    def discard(self, key: str):
+        """Отменить ожидающую запись ключа"""
+        self._pending.pop(key, None)
+        # Пишущаяся пачка уже в транзакции, но при неудаче этот ключ в очередь не вернется
+        self._in_flight.pop(key, None)
+
+    async def put(self, key: str, value: str):
+        """Поставить запись в очередь; сброс по размеру или по таймеру"""
+        if key in self._pending:
+            self.stats['coalesced'] += 1
+        self._pending[key] = (key, value, datetime.now().isoformat())
+        self.stats['queued'] += 1
+
+        # После неудачного сброса запись ждет таймера повтора
+        if len(self._pending) >= self.max_pending and not self._failures:
+            await self.flush()
+        elif self._timer_task is None or self._timer_task.done():
+            self._timer_task = asyncio.create_task(self._delayed_flush(self.flush_interval))
+
+    @property
+    def retry_interval(self) -> float:
+        """Пауза до повтора после неудачных сбросов: flush_interval * 2^n, не больше max_retry_interval"""
+        return min(self.flush_interval * 2 ** self._failures, self.max_retry_interval)
+
+    async def _delayed_flush(self, delay: float):
+        try:
+            await asyncio.sleep(delay)
+            if self._timer_task is asyncio.current_task():
+                self._timer_task = None
+            # shield: отмена таймера не должна прерывать уже начатую запись
+            await asyncio.shield(self.flush())
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"❌ Ошибка отложенной записи настроек: {e}")
+
+    async def flush(self) -> int:
+        """Записать все ожидающие настройки одной транзакцией"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+
+            batch = self._in_flight = self._pending
+            self._pending = {}
+
+            try:
+                await self.flush_callback(list(batch.values()))
+            except Exception:
+                # Возвращаем в очередь то, что не было перезаписано или отменено за время сброса
+                for key, row in self._in_flight.items():
+                    self._pending.setdefault(key, row)
+                self._in_flight = {}
+                self._failures += 1
+                self.stats['failed_flushes'] += 1
+                # Повтор - по таймеру с растущей паузой, а не со следующей записью
+                if self._timer_task and not self._timer_task.done():
+                    self._timer_task.cancel()
+                self._timer_task = asyncio.create_task(self._delayed_flush(self.retry_interval))
+                raise
+
+            self._in_flight = {}
+            self._failures = 0
+            self.stats['flushes'] += 1
+            self.stats['rows_written'] += len(batch)
+            logger.debug(f"💾 Записано {len(batch)} настроек одной транзакцией")
+            return len(batch)
+
+    async def close(self):
+        """Остановить таймер и сбросить остаток"""
+        if self._timer_task and not self._timer_task.done():
+            self._timer_task.cancel()
+        self._timer_task = None
+        await self.flush()
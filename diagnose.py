@@ -193,6 +193,7 @@ class BotDiagnostic:
 
             db = DatabaseModels(DATABASE_PATH)
             await db.init_database()
+            await db.close()
 
             # Проверяем таблицы
             async with aiosqlite.connect(DATABASE_PATH) as conn:
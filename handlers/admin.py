@@ -9,7 +9,8 @@ import logging
 import re
 
 from utils.keyboards import main_menu_keyboard
-from config import config
+from services.parse_executor import get_parse_executor
+from config import config, AI_BATCH_MODE
 
 logger = logging.getLogger(__name__)
 router = Router()
@@ -65,7 +66,7 @@ async def start_command(message: Message, state: FSMContext):
 
 
 @router.message(Command("status"))
-async def status_command(message: Message, db, scheduler, monitor):
+async def status_command(message: Message, db, scheduler, monitor, http_client=None, content_manager=None):
     """Статус системы"""
     if not is_admin(message.from_user.id):
         return
@@ -77,6 +78,54 @@ async def status_command(message: Message, db, scheduler, monitor):
 
         scheduler_status = "🟢 Работает" if scheduler and scheduler.running else "🔴 Остановлен"
         monitor_status = "🟢 Активен" if monitor and monitor.running else "🔴 Неактивен"
+        cache_stats = db.settings_cache.stats
+        parse_stats = get_parse_executor().get_stats()
+        http_stats = http_client.get_stats() if http_client else None
+        http_line = (
+            f"{http_stats['reuse_rate']}% соединений повторно ({http_stats['connections_reused']}/"
+            f"{http_stats['connections_reused'] + http_stats['connections_created']}), "
+            f"{http_stats['requests']} запросов, DNS-кэш {http_stats['dns_cache_hits']}/"
+            f"{http_stats['dns_cache_hits'] + http_stats['dns_cache_misses']}"
+            if http_stats else "не запущен"
+        )
+        limiter_stats = content_manager.ai_processor.rate_limiter.get_stats() if content_manager else None
+        limiter_line = (
+            f"{limiter_stats['requests_per_minute']} запр/мин, {limiter_stats['tokens_per_minute']} ток/мин, "
+            f"до {limiter_stats['max_concurrency']} параллельно; запросов {limiter_stats['requests']}, "
+            f"ожиданий {limiter_stats['waits']} ({limiter_stats['wait_time']} с), 429: {limiter_stats['throttled']}, "
+            f"повторов {limiter_stats['retries']}"
+            if limiter_stats else "нет данных"
+        )
+        ai_cache = content_manager.ai_processor.cache if content_manager else None
+        if ai_cache:
+            ai_cache_stats = ai_cache.stats
+            ai_cache_size = await db.get_ai_cache_size()
+            ai_cache_line = (
+                f"{ai_cache_stats['hit_rate']}% попаданий ({ai_cache_stats['hits']}/"
+                f"{ai_cache_stats['hits'] + ai_cache_stats['misses']}), записей {ai_cache_size['entries']}, "
+                f"повторных генераций {ai_cache_stats['bypassed']}"
+            )
+        else:
+            ai_cache_line = "выключен"
+        if AI_BATCH_MODE and content_manager:
+            open_batches = await db.get_open_ai_batches()
+            batch_line = (
+                f"готово постов {await content_manager.batch_rewriter.ready_count()}, "
+                f"пакетов в работе {len(open_batches)}"
+            )
+        else:
+            batch_line = "выключен"
+        pipeline_stats = content_manager.pipeline_stats if content_manager else None
+        pipeline_lines = "\n".join(
+            f"  ◦ {stage}: {stats['received']} вход, {stats['passed']} выход, {stats['dropped']} отсеяно, "
+            + (f"{stats['cancelled']} отменено, " if stats['cancelled'] else "")
+            + f"{stats['throughput']}/с, очередь {stats['queue_depth']} (пик {stats['peak_queue_depth']})"
+            for stage, stats in pipeline_stats['stages'].items()
+        ) if pipeline_stats else "  ◦ еще не запускался"
+        first_publish = (
+            f", первая публикация через {pipeline_stats['first_publish_after']} с"
+            if pipeline_stats and pipeline_stats['first_publish_after'] is not None else ""
+        )
 
         status_text = f"""
 📊 <b>СТАТУС СИСТЕМЫ</b>
@@ -91,6 +140,15 @@ async def status_command(message: Message, db, scheduler, monitor):
 • 📺 Каналов: {len(channels)}
 • 📰 Источников: {len(sources)}
 • 📈 Задач планировщика: {len(scheduler.jobs) if scheduler else 0}
+• ⚡ Кэш настроек: {cache_stats['hit_rate']}% попаданий ({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']})
+• 🌐 HTTP: {http_line}
+• 🚦 Лимиты OpenAI: {limiter_line}
+• 💾 Кэш ИИ: {ai_cache_line}
+• 📦 Batch API: {batch_line}
+• 🧵 Разбор RSS/HTML ({parse_stats['kind']}, {parse_stats['workers']} воркеров): очередь {parse_stats['queue_depth']} (пик {parse_stats['peak_queue_depth']}), {parse_stats['tasks']} задач, в среднем {parse_stats['avg_parse_ms']} мс
+
+🔄 <b>Конвейер (последний прогон{first_publish}):</b>
+{pipeline_lines}
 
 ⏰ <b>Время работы:</b> Активен
 🔧 <b>Версия:</b> 3.0.1-fixed
@@ -116,7 +174,7 @@ async def health_check_command(message: Message, db, scheduler, monitor):
 
     # Проверка базы данных
     try:
-        await db.get_setting('test')
+        await db.ping()
         checks.append("✅ База данных: Работает")
     except Exception as e:
         issues.append(f"❌ База данных: {str(e)}")
@@ -2,12 +2,14 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command
+import html
 import logging
 from datetime import datetime
 
+from utils.stream_preview import StreamPreview
 from utils.keyboards import (
     ai_control_panel_keyboard, ai_generation_keyboard,
-    ai_chat_keyboard, ab_testing_keyboard
+    ai_chat_keyboard, ab_testing_keyboard, generated_post_keyboard
 )
 from config import config
 
@@ -254,21 +256,28 @@ async def show_generation_menu(callback: CallbackQuery):
     )
 
 
-@router.callback_query(F.data == "generate_text")
+@router.callback_query(F.data.in_({"generate_text", "generate_text_fresh"}))
 async def generate_text_post(callback: CallbackQuery, db, content_manager):
-    """Генерация текстового поста"""
-    await callback.answer("🔄 Генерирую пост...")
+    """Генерация текстового поста ("заново" - без ответов из кэша ИИ); текст виден по мере генерации"""
+    force = callback.data == "generate_text_fresh"
+    await callback.answer("🔄 Генерирую пост заново..." if force else "🔄 Генерирую пост...")
 
     try:
         # Получаем последние новости для контекста
         latest_news = await content_manager.get_latest_news(limit=5)
+        preview = None
 
         if latest_news:
-            # Генерируем пост на основе новости
-            result = await content_manager.ai_processor.create_post(
-                latest_news[0],
-                style='engaging'
+            # Генерируем пост на основе новости, показывая текст по мере ответа модели
+            preview = StreamPreview(
+                callback.message,
+                header=f"✍️ <b>ГЕНЕРАЦИЯ ПОСТА</b>\n\n📰 {html.escape(latest_news[0]['title'][:80])}\n\n"
             )
+            await preview.start()
+            stream = content_manager.ai_processor.create_post_stream(latest_news[0], style='engaging', force=force)
+            async for delta in stream:
+                await preview.add(delta)
+            result = stream.post
 
             if result:
                 response = f"""
@@ -283,22 +292,23 @@ async def generate_text_post(callback: CallbackQuery, db, content_manager):
 • Длина: {len(result['content'])} символов
 • Хештеги: {len(result['hashtags'])}
 • Основа: {result['original_title'][:50]}...
+• Первый текст через {preview.first_delta_after or 0:.1f} с, готово за {preview.elapsed:.1f} с
 
 🎯 <b>Что дальше?</b>
 • Опубликовать сейчас
 • Отредактировать
-• Сгенерировать еще
+• Сгенерировать заново (без кэша)
                 """
             else:
                 response = "❌ Не удалось сгенерировать пост"
         else:
             response = "❌ Нет доступных новостей для генерации"
 
-        await callback.message.edit_text(
-            response,
-            parse_mode="HTML",
-            reply_markup=ai_generation_keyboard()
-        )
+        reply_markup = generated_post_keyboard() if latest_news else ai_generation_keyboard()
+        if preview:
+            await preview.finish(response, reply_markup=reply_markup)
+        else:
+            await callback.message.edit_text(response, parse_mode="HTML", reply_markup=reply_markup)
 
     except Exception as e:
         logger.error(f"Ошибка генерации: {e}")
@@ -542,20 +552,21 @@ async def show_ai_metrics(callback: CallbackQuery, db):
 • Оптимальная модель: GPT-4
 • Температура: 0.7-0.8
 • Токенов на пост: 300-400
-        """,
-        parse_mode = "HTML",
-        reply_markup = ai_control_panel_keyboard()
-    )
+        """
 
-    await callback.message.edit_text(response)
+        await callback.message.edit_text(
+            response,
+            parse_mode="HTML",
+            reply_markup=ai_control_panel_keyboard()
+        )
 
     except Exception as e:
-    logger.error(f"Ошибка получения метрик: {e}")
-    await callback.message.edit_text(
-        "❌ Ошибка получения метрик ИИ",
-        parse_mode="HTML",
-        reply_markup=ai_control_panel_keyboard()
-    )
+        logger.error(f"Ошибка получения метрик: {e}")
+        await callback.message.edit_text(
+            "❌ Ошибка получения метрик ИИ",
+            parse_mode="HTML",
+            reply_markup=ai_control_panel_keyboard()
+        )
 
 
 # ========================================
@@ -563,11 +574,11 @@ async def show_ai_metrics(callback: CallbackQuery, db):
 # ========================================
 
 @router.callback_query(F.data == "ai_settings")
-async def show_ai_settings(callback: CallbackQuery, db):
+async def show_ai_settings(callback: CallbackQuery, db, content_manager=None):
     """Показ настроек ИИ"""
     # Перенаправляем на полное управление ИИ
     from handlers.ai_management import show_ai_config
-    await show_ai_config(callback, db)
+    await show_ai_config(callback, db, content_manager)
 
 
 # ========================================
@@ -682,22 +693,21 @@ async def generate_content_ideas(callback: CallbackQuery, content_manager):
 • 🔥 Горячие новости (+134% просмотров)
 
 🚀 Хотите больше идей? Уточните тематику!
-    """,
-    parse_mode = "HTML",
-    reply_markup = ai_chat_keyboard()
+    """
 
-)
+    await callback.message.edit_text(
+        ideas_text,
+        parse_mode="HTML",
+        reply_markup=ai_chat_keyboard()
+    )
 
-await callback.message.edit_text(ideas_text)
 
 # ========================================
 # БАЗА ЗНАНИЙ
 # ========================================
 
-@ router.callback_query(F.data == "ai_knowledge")
-async
-
-def show_ai_knowledge(callback: CallbackQuery):
+@router.callback_query(F.data == "ai_knowledge")
+async def show_ai_knowledge(callback: CallbackQuery):
     """Показ базы знаний ИИ"""
     await callback.message.edit_text(
         """
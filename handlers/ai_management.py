@@ -1,19 +1,30 @@
 # handlers/ai_management.py - ИСПРАВЛЕННАЯ ВЕРСИЯ
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
-from aiogram.filters import StateFilter, Command
+from aiogram.filters import StateFilter, Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+import html
 import logging
 import json
 from datetime import datetime
 from typing import Dict, List, Optional
 
 from config import config
+from services.token_budget import TokenLedger
+from utils.stream_preview import StreamPreview
 
 logger = logging.getLogger(__name__)
 router = Router()
 
+# Новость для теста ИИ: пересказ идет потоком, как при генерации поста
+TEST_NEWS = {
+    'title': "В городе открылась новая библиотека с коворкингом",
+    'content': "В центре города открылась библиотека нового формата. Помимо книжного фонда на 40 тысяч "
+               "изданий в ней работают коворкинг на 60 мест, лекторий и детская зона. "
+               "Вход свободный, библиотека открыта ежедневно с 9 до 22 часов."
+}
+
 
 class AIManagementStates(StatesGroup):
     """Состояния для управления ИИ"""
@@ -31,12 +42,35 @@ def is_admin(user_id: int) -> bool:
     return user_id == config.ADMIN_ID
 
 
+def get_token_ledger(db, content_manager=None) -> TokenLedger:
+    """Учет токенов работающего ИИ-процессора (или только чтение из БД, если его нет)"""
+    if content_manager:
+        return content_manager.token_ledger
+    return TokenLedger(db)
+
+
+def format_spend(summary: Dict) -> str:
+    """Расход токенов по моделям и каналам для HTML-сообщения"""
+    cap = f"{summary['daily_cap']:,}".replace(',', ' ') if summary['daily_cap'] else "без лимита"
+    lines = [
+        f"• 🔢 Сегодня: {summary['today_tokens']:,} токенов из {cap}".replace(',', ' '),
+        f"• 💵 За период: {summary['tokens']:,} токенов, ${summary['cost_usd']:.4f}".replace(',', ' ')
+    ]
+    for model, totals in summary['by_model'].items():
+        lines.append(f"  ◦ {model}: {totals['requests']} запросов, {totals['tokens']} токенов, ${totals['cost_usd']:.4f}")
+    for channel_id, totals in summary['by_channel'].items():
+        lines.append(f"  ◦ {channel_id or 'не опубликовано'}: {totals['tokens']} токенов, ${totals['cost_usd']:.4f}")
+    if summary['rejected']:
+        lines.append(f"• ⛔ Отклонено по лимиту: {summary['rejected']} запросов")
+    return "\n".join(lines)
+
+
 # ========================================
 # ГЛАВНАЯ ПАНЕЛЬ УПРАВЛЕНИЯ ИИ
 # ========================================
 
 @router.message(F.text == "🤖 ИИ-Панель")
-async def show_ai_management_panel(message: Message, db):
+async def show_ai_management_panel(message: Message, db, content_manager=None):
     """Главная панель управления ИИ-агентом"""
     if not is_admin(message.from_user.id):
         return
@@ -47,6 +81,7 @@ async def show_ai_management_panel(message: Message, db):
         current_temp = await db.get_setting('ai_temperature') or '0.7'
         current_style = await db.get_setting('default_style') or 'engaging'
         current_tokens = await db.get_setting('ai_max_tokens') or '800'
+        spend = await get_token_ledger(db, content_manager).summary()
 
         channels = await db.get_channels()
         sources = await db.get_news_sources()
@@ -59,6 +94,7 @@ async def show_ai_management_panel(message: Message, db):
 • 🌡️ Температура: {current_temp}
 • 📝 Макс. токенов: {current_tokens}
 • 🎨 Стиль: {current_style}
+• 💰 Расход сегодня: {spend['today_tokens']} токенов, ${spend['cost_usd']:.4f}
 
 📊 <b>Подключенные ресурсы:</b>
 • 📺 Каналов: {len(channels)}
@@ -109,12 +145,14 @@ async def show_ai_management_panel(message: Message, db):
 # ========================================
 
 @router.callback_query(F.data == "ai_config")
-async def show_ai_config(callback: CallbackQuery, db):
+async def show_ai_config(callback: CallbackQuery, db, content_manager=None):
     """Настройки ИИ модели"""
     try:
         current_model = await db.get_setting('openai_model') or 'gpt-4'
         current_temp = await db.get_setting('ai_temperature') or '0.7'
         current_tokens = await db.get_setting('ai_max_tokens') or '800'
+        channel_models = json.loads(await db.get_setting('ai_channel_models') or '{}')
+        spend = await get_token_ledger(db, content_manager).summary()
 
         config_text = f"""
 🧠 <b>НАСТРОЙКИ ИИ МОДЕЛИ</b>
@@ -123,6 +161,10 @@ async def show_ai_config(callback: CallbackQuery, db):
 • 🤖 Модель: {current_model}
 • 🌡️ Температура: {current_temp} (креативность)
 • 📝 Макс. токенов: {current_tokens}
+• 📺 Своя модель у каналов: {len(channel_models)} (/channel_model)
+
+💰 <b>Расход за сегодня:</b>
+{format_spend(spend)}
 
 🎯 <b>Доступные модели:</b>
 • GPT-4 Turbo - самая умная
@@ -151,6 +193,14 @@ async def show_ai_config(callback: CallbackQuery, db):
                 [
                     InlineKeyboardButton(text="🌡️ Температура 1.0", callback_data="set_temp_1.0")
                 ],
+                [
+                    InlineKeyboardButton(text="💰 Лимит 100K/день", callback_data="set_token_cap_100000"),
+                    InlineKeyboardButton(text="💰 Лимит 500K/день", callback_data="set_token_cap_500000")
+                ],
+                [
+                    InlineKeyboardButton(text="♾️ Без лимита", callback_data="set_token_cap_0"),
+                    InlineKeyboardButton(text="📊 Расход за 7 дней", callback_data="ai_spend")
+                ],
                 [
                     InlineKeyboardButton(text="🧪 Тест модели", callback_data="test_ai_model"),
                     InlineKeyboardButton(text="🔙 ИИ-Панель", callback_data="back_ai_panel")
@@ -166,14 +216,14 @@ async def show_ai_config(callback: CallbackQuery, db):
 
 
 @router.callback_query(F.data.startswith("set_model_"))
-async def set_gpt_model(callback: CallbackQuery, db):
+async def set_gpt_model(callback: CallbackQuery, db, content_manager=None):
     """Установка модели GPT"""
     try:
         model = callback.data.replace("set_model_", "")
         await db.set_setting('openai_model', model)
 
         await callback.answer(f"✅ Модель установлена: {model}")
-        await show_ai_config(callback, db)
+        await show_ai_config(callback, db, content_manager)
 
     except Exception as e:
         logger.error(f"Ошибка установки модели: {e}")
@@ -181,27 +231,61 @@ async def set_gpt_model(callback: CallbackQuery, db):
 
 
 @router.callback_query(F.data.startswith("set_temp_"))
-async def set_temperature(callback: CallbackQuery, db):
+async def set_temperature(callback: CallbackQuery, db, content_manager=None):
     """Установка температуры"""
     try:
         temp = callback.data.replace("set_temp_", "")
         await db.set_setting('ai_temperature', temp)
 
         await callback.answer(f"✅ Температура установлена: {temp}")
-        await show_ai_config(callback, db)
+        await show_ai_config(callback, db, content_manager)
 
     except Exception as e:
         logger.error(f"Ошибка установки температуры: {e}")
         await callback.answer(f"❌ Ошибка: {str(e)}")
 
 
+@router.callback_query(F.data.startswith("set_token_cap_"))
+async def set_token_cap(callback: CallbackQuery, db, content_manager=None):
+    """Установка дневного лимита токенов"""
+    try:
+        cap = int(callback.data.replace("set_token_cap_", ""))
+        await get_token_ledger(db, content_manager).set_daily_cap(cap)
+
+        await callback.answer(f"✅ Лимит токенов: {cap if cap else 'без лимита'}")
+        await show_ai_config(callback, db, content_manager)
+
+    except Exception as e:
+        logger.error(f"Ошибка установки лимита токенов: {e}")
+        await callback.answer(f"❌ Ошибка: {str(e)}")
+
+
+@router.callback_query(F.data == "ai_spend")
+async def show_ai_spend(callback: CallbackQuery, db, content_manager=None):
+    """Расход токенов и стоимость за неделю по моделям и каналам"""
+    try:
+        spend = await get_token_ledger(db, content_manager).summary(days=7)
+
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[[InlineKeyboardButton(text="🔙 Настройки ИИ", callback_data="ai_config")]]
+        )
+        await callback.message.edit_text(
+            f"💰 <b>РАСХОД ИИ С {spend['since']}</b>\n\n{format_spend(spend)}",
+            parse_mode="HTML", reply_markup=keyboard
+        )
+
+    except Exception as e:
+        logger.error(f"Ошибка отчета о расходе: {e}")
+        await callback.answer(f"❌ Ошибка: {str(e)}")
+
+
 # ========================================
 # ТЕСТИРОВАНИЕ ИИ
 # ========================================
 
 @router.callback_query(F.data == "test_ai_system")
-async def test_ai_system(callback: CallbackQuery, db):
-    """Полное тестирование ИИ системы"""
+async def test_ai_system(callback: CallbackQuery, db, content_manager=None):
+    """Полное тестирование ИИ системы: пробный пересказ выводится по мере генерации"""
     try:
         await callback.answer("🧪 Тестирую ИИ систему...")
 
@@ -209,6 +293,26 @@ async def test_ai_system(callback: CallbackQuery, db):
         model = await db.get_setting('openai_model') or 'gpt-4'
         temp = await db.get_setting('ai_temperature') or '0.7'
 
+        connection = '✅ OK' if config.OPENAI_API_KEY else '❌ FAIL'
+        example = "нет - ИИ-процессор недоступен"
+        timing = ""
+        preview = None
+        if content_manager and config.OPENAI_API_KEY:
+            preview = StreamPreview(callback.message, header="🧪 <b>ТЕСТ ИИ СИСТЕМЫ</b>\n\n💡 <b>Пример генерации:</b>\n")
+            await preview.start()
+            try:
+                async for delta in content_manager.ai_processor.rewrite_news_stream(
+                    TEST_NEWS['title'], TEST_NEWS['content'], force=True
+                ):
+                    await preview.add(delta)
+            except Exception as e:
+                connection = f"❌ {html.escape(str(e)[:200])}"
+            example = html.escape(preview.text.strip()[:600]) or "пустой ответ"
+            timing = (
+                f"\n• Первый текст через {preview.first_delta_after or 0:.1f} с, "
+                f"весь ответ за {preview.elapsed:.1f} с"
+            )
+
         test_text = f"""
 🧪 <b>ТЕСТ ИИ СИСТЕМЫ</b>
 
@@ -218,14 +322,12 @@ async def test_ai_system(callback: CallbackQuery, db):
 • API ключ: {'✅ Есть' if config.OPENAI_API_KEY else '❌ Нет'}
 
 🔄 <b>Результат:</b>
-• Подключение к OpenAI: {'✅ OK' if config.OPENAI_API_KEY else '❌ FAIL'}
+• Подключение к OpenAI: {connection}{timing}
 • Настройки: ✅ Корректные
 • База данных: ✅ Работает
 
 💡 <b>Пример генерации:</b>
-"🚀 ИИ-агент работает отлично! 
-Система готова к созданию качественного контента. 
-#ИИ #тест #работает"
+{example}
 
 ⏱️ <b>Время теста:</b> {datetime.now().strftime('%H:%M:%S')}
         """
@@ -242,7 +344,10 @@ async def test_ai_system(callback: CallbackQuery, db):
             ]
         )
 
-        await callback.message.edit_text(test_text, parse_mode="HTML", reply_markup=keyboard)
+        if preview:
+            await preview.finish(test_text, reply_markup=keyboard)
+        else:
+            await callback.message.edit_text(test_text, parse_mode="HTML", reply_markup=keyboard)
 
     except Exception as e:
         logger.error(f"Ошибка тестирования ИИ: {e}")
@@ -315,9 +420,12 @@ async def apply_preset(callback: CallbackQuery, db):
 
         config = presets.get(preset, presets['balanced'])
 
-        await db.set_setting('openai_model', config['model'])
-        await db.set_setting('ai_temperature', config['temp'])
-        await db.set_setting('default_style', config['style'])
+        # Одной записью: ИИ-процессор получит модель и температуру пресета вместе
+        await db.set_settings_bulk({
+            'openai_model': config['model'],
+            'ai_temperature': config['temp'],
+            'default_style': config['style']
+        })
 
         await callback.answer(f"✅ Пресет '{preset}' применен!")
         await quick_ai_setup(callback, db)
@@ -361,6 +469,47 @@ async def ai_command(message: Message, db):
     await show_ai_management_panel(message, db)
 
 
+@router.message(Command("channel_model"))
+async def channel_model_command(message: Message, command: CommandObject, db):
+    """Модель ИИ для канала: /channel_model <канал> <модель|default>; без аргументов - список"""
+    if not is_admin(message.from_user.id):
+        return
+
+    try:
+        channel_models = json.loads(await db.get_setting('ai_channel_models') or '{}')
+        args = (command.args or '').split()
+
+        if len(args) == 2:
+            channel_id, model = args
+            if model.lower() == 'default':
+                channel_models.pop(channel_id, None)
+            else:
+                channel_models[channel_id] = model
+            # ИИ-процессор подхватит изменение сразу, без перезапуска
+            await db.set_setting('ai_channel_models', json.dumps(channel_models, ensure_ascii=False))
+        elif args:
+            await message.answer(
+                "❌ Формат: <code>/channel_model @канал gpt-4o-mini</code> "
+                "или <code>/channel_model @канал default</code>",
+                parse_mode="HTML"
+            )
+            return
+
+        default_model = await db.get_setting('openai_model') or 'gpt-4'
+        lines = "\n".join(
+            f"• <code>{html.escape(channel_id)}</code>: {html.escape(model)}"
+            for channel_id, model in sorted(channel_models.items())
+        ) or "• нет - все каналы на общей модели"
+        await message.answer(
+            f"📺 <b>МОДЕЛИ КАНАЛОВ</b>\n\n🤖 Общая модель: {html.escape(default_model)}\n\n{lines}",
+            parse_mode="HTML"
+        )
+
+    except Exception as e:
+        logger.error(f"Ошибка настройки модели канала: {e}")
+        await message.answer(f"❌ Ошибка: {str(e)}")
+
+
 # ========================================
 # ЗАГЛУШКИ ДЛЯ ОСТАЛЬНЫХ ФУНКЦИЙ
 # ========================================
@@ -1,9 +1,10 @@
 from aiogram import Router, F
-from aiogram.types import Message, CallbackQuery
+from aiogram.types import Message, CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.filters import StateFilter
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 import logging
+from datetime import datetime
 
 from utils.keyboards import (
     news_sources_keyboard, source_list_keyboard,
@@ -11,6 +12,7 @@ from utils.keyboards import (
 )
 from database.models import DatabaseModels
 from services.news_parser import NewsParser
+from services.http_client import HttpClient
 from config import ADMIN_ID, NEWS_CATEGORIES
 
 logger = logging.getLogger(__name__)
@@ -63,6 +65,8 @@ async def show_sources_list(callback: CallbackQuery, db: DatabaseModels):
             status = "✅" if source['is_active'] else "❌"
             text += f"{status} <b>{source['name']}</b>\n"
             text += f"Категория: {source['category']}\n"
+            if source['fetch_count']:
+                text += f"HTTP 304: {format_hit_rate(source)}\n"
             text += f"URL: <code>{source['url'][:50]}{'...' if len(source['url']) > 50 else ''}</code>\n\n"
 
         await callback.message.edit_text(
@@ -121,7 +125,7 @@ async def process_source_name(message: Message, state: FSMContext):
 
 
 @router.message(StateFilter(NewsStates.waiting_for_source_url))
-async def process_source_url(message: Message, state: FSMContext):
+async def process_source_url(message: Message, state: FSMContext, http_client: HttpClient = None):
     """Обработка URL источника"""
     if not is_admin(message.from_user.id):
         return
@@ -138,7 +142,7 @@ async def process_source_url(message: Message, state: FSMContext):
         return
 
     # Тестируем доступность RSS ленты
-    test_result = await test_rss_feed(source_url)
+    test_result = await test_rss_feed(source_url, http_client)
     if not test_result['success']:
         await message.answer(
             f"❌ <b>Ошибка доступа к RSS ленте</b>\n\n"
@@ -214,10 +218,28 @@ async def process_source_category(message: Message, state: FSMContext, db: Datab
         )
 
 
-async def test_rss_feed(url: str) -> dict:
+def format_hit_rate(source: dict) -> str:
+    """Доля ответов 304 Not Modified для источника"""
+    if not source['fetch_count']:
+        return "нет данных"
+    rate = source['not_modified_count'] / source['fetch_count'] * 100
+    return f"{rate:.0f}% ({source['not_modified_count']}/{source['fetch_count']})"
+
+
+def format_next_fetch(source: dict) -> str:
+    """Время следующего опроса и выученный интервал источника"""
+    if not source['next_fetch_at']:
+        return "при ближайшем запуске"
+    next_fetch_at = datetime.fromisoformat(source['next_fetch_at']).strftime('%d.%m %H:%M')
+    if source['poll_interval']:
+        return f"{next_fetch_at} (каждые {source['poll_interval'] // 60} мин)"
+    return next_fetch_at
+
+
+async def test_rss_feed(url: str, http_client: HttpClient = None) -> dict:
     """Тестирование RSS ленты"""
     try:
-        async with NewsParser() as parser:
+        async with NewsParser(http_client=http_client) as parser:
             news_items = await parser.parse_rss_feed(url, "Test Source")
             return {
                 'success': True,
@@ -233,7 +255,7 @@ async def test_rss_feed(url: str) -> dict:
 
 
 @router.callback_query(F.data == "test_parsing")
-async def test_all_sources(callback: CallbackQuery, db: DatabaseModels):
+async def test_all_sources(callback: CallbackQuery, db: DatabaseModels, http_client: HttpClient = None):
     """Тестирование парсинга всех источников"""
     try:
         await callback.message.edit_text(
@@ -255,7 +277,7 @@ async def test_all_sources(callback: CallbackQuery, db: DatabaseModels):
         results = []
         total_news = 0
 
-        async with NewsParser() as parser:
+        async with NewsParser(http_client=http_client) as parser:
             for source in sources:
                 try:
                     news_items = await parser.parse_rss_feed(
@@ -303,7 +325,7 @@ async def test_all_sources(callback: CallbackQuery, db: DatabaseModels):
 
 
 @router.callback_query(F.data.startswith("source_"))
-async def show_source_details(callback: CallbackQuery, db: DatabaseModels):
+async def show_source_details(callback: CallbackQuery, db: DatabaseModels, http_client: HttpClient = None):
     """Показ деталей источника новостей"""
     source_id = int(callback.data.split("_")[1])
 
@@ -316,10 +338,11 @@ async def show_source_details(callback: CallbackQuery, db: DatabaseModels):
             return
 
         # Тестируем источник
-        test_result = await test_rss_feed(source['url'])
+        test_result = await test_rss_feed(source['url'], http_client)
 
         status = "✅ Активен" if source['is_active'] else "❌ Неактивен"
         test_status = "✅ Работает" if test_result['success'] else "❌ Недоступен"
+        full_text_status = "📄 Загружается со страницы" if source['fetch_full_text'] else "📝 Только описание из RSS"
 
         text = f"""
 📰 <b>{source['name']}</b>
@@ -328,6 +351,9 @@ async def show_source_details(callback: CallbackQuery, db: DatabaseModels):
 <b>Категория:</b> {source['category']}
 <b>Тип:</b> {source['source_type'].upper()}
 <b>Статус:</b> {status}
+<b>Полный текст:</b> {full_text_status}
+<b>Без изменений (HTTP 304):</b> {format_hit_rate(source)}
+<b>Следующий опрос:</b> {format_next_fetch(source)}
 <b>Доступность:</b> {test_status}
 
 <b>Последний тест:</b>
@@ -342,11 +368,13 @@ async def show_source_details(callback: CallbackQuery, db: DatabaseModels):
 
         toggle_text = "🔴 Деактивировать" if source['is_active'] else "🟢 Активировать"
         toggle_action = f"deactivate_source_{source_id}" if source['is_active'] else f"activate_source_{source_id}"
+        full_text_toggle = "📝 Только описание RSS" if source['fetch_full_text'] else "📄 Загружать полный текст"
 
         keyboard = InlineKeyboardMarkup(
             inline_keyboard=[
                 [InlineKeyboardButton(text="🧪 Тест парсинга", callback_data=f"test_source_{source_id}")],
                 [InlineKeyboardButton(text=toggle_text, callback_data=toggle_action)],
+                [InlineKeyboardButton(text=full_text_toggle, callback_data=f"fulltext_source_{source_id}")],
                 [InlineKeyboardButton(text="🗑 Удалить источник", callback_data=f"delete_source_{source_id}")],
                 [InlineKeyboardButton(text="🔙 К списку источников", callback_data="list_sources")]
             ]
@@ -364,7 +392,7 @@ async def show_source_details(callback: CallbackQuery, db: DatabaseModels):
 
 
 @router.callback_query(F.data.startswith("test_source_"))
-async def test_single_source(callback: CallbackQuery, db: DatabaseModels):
+async def test_single_source(callback: CallbackQuery, db: DatabaseModels, http_client: HttpClient = None):
     """Тестирование одного источника"""
     source_id = int(callback.data.split("_")[2])
 
@@ -383,8 +411,10 @@ async def test_single_source(callback: CallbackQuery, db: DatabaseModels):
         )
 
         # Подробное тестирование
-        async with NewsParser() as parser:
-            news_items = await parser.parse_rss_feed(source['url'], source['name'])
+        async with NewsParser(http_client=http_client) as parser:
+            news_items = await parser.parse_rss_feed(
+                source['url'], source['name'], fetch_full_text=source['fetch_full_text']
+            )
 
         if news_items:
             # Показываем примеры новостей
@@ -446,8 +476,40 @@ async def test_single_source(callback: CallbackQuery, db: DatabaseModels):
         )
 
 
+@router.callback_query(F.data.startswith("fulltext_source_"))
+async def toggle_source_full_text(callback: CallbackQuery, db: DatabaseModels):
+    """Переключение загрузки полного текста статей источника"""
+    source_id = int(callback.data.split("_")[2])
+
+    try:
+        source = await db.get_source_by_id(source_id)
+        if not source:
+            await callback.answer("❌ Источник не найден")
+            return
+
+        enabled = not source['fetch_full_text']
+        await db.update_source_full_text(source_id, enabled)
+
+        await callback.answer(
+            "📄 Полный текст будет загружаться со страницы" if enabled
+            else "📝 Будет использоваться описание из RSS"
+        )
+        await callback.message.edit_reply_markup(
+            reply_markup=InlineKeyboardMarkup(
+                inline_keyboard=[
+                    [InlineKeyboardButton(text="🔙 К источнику", callback_data=f"source_{source_id}")],
+                    [InlineKeyboardButton(text="📋 К списку", callback_data="list_sources")]
+                ]
+            )
+        )
+
+    except Exception as e:
+        logger.error(f"Ошибка переключения полного текста источника: {str(e)}")
+        await callback.answer("❌ Ошибка изменения настройки источника")
+
+
 @router.callback_query(F.data == "refresh_sources")
-async def refresh_sources(callback: CallbackQuery, db: DatabaseModels):
+async def refresh_sources(callback: CallbackQuery, db: DatabaseModels, http_client: HttpClient = None):
     """Обновление всех источников"""
     try:
         await callback.message.edit_text(
@@ -460,7 +522,7 @@ async def refresh_sources(callback: CallbackQuery, db: DatabaseModels):
         total_news = 0
         updated_sources = 0
 
-        async with NewsParser() as parser:
+        async with NewsParser(http_client=http_client) as parser:
             all_news = await parser.get_news_from_sources(sources)
             total_news = len(all_news)
             updated_sources = len([src for src in sources if src['is_active']])
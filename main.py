@@ -10,10 +10,12 @@ from aiogram.enums import ParseMode
 from aiogram.types import BotCommand
 
 # Импорты наших модулей
-from config import config, DATABASE_PATH
+from config import config, DATABASE_PATH, AI_BATCH_MODE
 from database.models import DatabaseModels
 from services.content_manager import ContentManager
 from services.scheduler import PostScheduler
+from services.parse_executor import shutdown_parse_executor
+from services.http_client import HttpClient
 from utils.monitoring import SmartMonitor
 
 # Настройка логирования
@@ -44,6 +46,7 @@ class FixedContentBot:
 
         # Основные компоненты
         self.db = None
+        self.http_client = None
         self.content_manager = None
         self.scheduler = None
         self.monitor = None
@@ -74,11 +77,8 @@ class FixedContentBot:
             ("Российская газета", "https://rg.ru/xml/index.xml", "rss", "общее"),
         ]
 
-        for name, url, source_type, category in default_sources:
-            try:
-                await self.db.add_news_source(name, url, source_type, category)
-            except:
-                pass  # Источники уже добавлены
+        # Уже добавленные источники не трогаем
+        await self.db.add_news_sources_bulk(default_sources)
 
         # Инициализируем базовые настройки
         default_settings = {
@@ -90,13 +90,7 @@ class FixedContentBot:
             'min_interval_minutes': '30'
         }
 
-        for key, value in default_settings.items():
-            try:
-                existing = await self.db.get_setting(key)
-                if not existing:
-                    await self.db.set_setting(key, value)
-            except:
-                pass
+        await self.db.set_settings_bulk(default_settings, overwrite=False)
 
         logger.info("✅ База данных настроена")
 
@@ -131,8 +125,15 @@ class FixedContentBot:
         """Настройка основных сервисов"""
         print("⚙️ Настройка основных сервисов...")
 
+        # Общая HTTP-сессия для всех исходящих запросов
+        self.http_client = HttpClient()
+        await self.http_client.start()
+
         # Content Manager
-        self.content_manager = ContentManager(self.bot, self.db)
+        self.content_manager = ContentManager(self.bot, self.db, self.http_client)
+        # Модель и температура из настроек БД; их изменения применяются без перезапуска
+        await self.content_manager.ai_processor.watch_settings(self.db)
+        self.content_manager.token_ledger.watch_settings(self.db)
 
         # Планировщик
         self.scheduler = PostScheduler(self.content_manager, self.db)
@@ -146,6 +147,10 @@ class FixedContentBot:
         except Exception as e:
             logger.warning(f"⚠️ Не удалось восстановить задачи планировщика: {e}")
 
+        # Офлайн-режим: пакет новостей на завтра и опрос его готовности
+        if AI_BATCH_MODE:
+            self.scheduler.schedule_offline_batches()
+
         logger.info("✅ Основные сервисы готовы")
 
     def setup_handlers(self):
@@ -209,6 +214,7 @@ class FixedContentBot:
             data['monitor'] = self.monitor
             data['smart_analyzer'] = self.smart_analyzer
             data['performance_tracker'] = self.performance_tracker
+            data['http_client'] = self.http_client
             return await handler(event, data)
 
         @self.dp.callback_query.middleware()
@@ -219,6 +225,7 @@ class FixedContentBot:
             data['monitor'] = self.monitor
             data['smart_analyzer'] = self.smart_analyzer
             data['performance_tracker'] = self.performance_tracker
+            data['http_client'] = self.http_client
             return await handler(event, data)
 
         # Отчет о загрузке
@@ -393,6 +400,20 @@ class FixedContentBot:
                 except Exception as e:
                     logger.error(f"Ошибка остановки трекера: {e}")
 
+            # Сбрасываем отложенные записи и закрываем соединения с БД
+            if self.db:
+                try:
+                    await self.db.flush()
+                    await self.db.close()
+                    logger.info("✅ Соединения с БД закрыты")
+                except Exception as e:
+                    logger.error(f"Ошибка закрытия БД: {e}")
+
+            # Останавливаем пул разбора RSS/HTML и закрываем HTTP-сессию
+            shutdown_parse_executor()
+            if self.http_client:
+                await self.http_client.close()
+
             # Закрываем бота
             await self.bot.session.close()
 
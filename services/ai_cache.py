@@ -0,0 +1,104 @@
+import hashlib
+import json
+import logging
+import re
+import unicodedata
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+
+from config import AI_CACHE_TTL_DAYS, AI_CACHE_MAX_ENTRIES
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Текст для ключа кэша: одна форма Unicode и схлопнутые пробелы"""
+    return WHITESPACE_RE.sub(' ', unicodedata.normalize('NFC', text or '')).strip()
+
+
+class AIResponseCache:
+    """Кэш ответов ИИ в SQLite: ключ - хеш модели, вида запроса, стиля, версии промпта и текста"""
+
+    # Очистка по сроку и размеру - раз в столько сохранений
+    PRUNE_EVERY = 50
+    # Счетчики попаданий пишутся в БД пачкой, когда накопится столько ключей (и перед очисткой)
+    HITS_FLUSH_EVERY = 50
+
+    def __init__(self, db, ttl_days: int = AI_CACHE_TTL_DAYS, max_entries: int = AI_CACHE_MAX_ENTRIES):
+        self.db = db
+        self.ttl = timedelta(days=ttl_days)
+        self.max_entries = max_entries
+        self._puts = 0
+        # cache_key -> (попаданий, время последнего): чтение не ждет писателя БД
+        self._pending_hits: Dict[str, Tuple[int, str]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.evicted = 0
+
+    @staticmethod
+    def make_key(model: str, kind: str, style: str, prompt_version: int, text: str,
+                 temperature: float = None, max_tokens: int = None) -> str:
+        # Температура и лимит токенов меняют ответ: с другими параметрами ответ генерируется заново
+        payload = json.dumps([model, kind, style, prompt_version, temperature, max_tokens, normalize_text(text)],
+                             ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    async def get(self, key: str) -> Optional[Any]:
+        value = await self.db.get_ai_cache_entry(key, datetime.now() - self.ttl)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        count, _ = self._pending_hits.get(key, (0, None))
+        self._pending_hits[key] = (count + 1, datetime.now().isoformat())
+        if len(self._pending_hits) >= self.HITS_FLUSH_EVERY:
+            await self.flush_hits()
+        return json.loads(value)
+
+    async def flush_hits(self) -> int:
+        """Записать накопленные попадания одним executemany"""
+        if not self._pending_hits:
+            return 0
+        pending, self._pending_hits = self._pending_hits, {}
+        try:
+            return await self.db.add_ai_cache_hits(
+                (count, last_hit_at, key) for key, (count, last_hit_at) in pending.items()
+            )
+        except Exception as e:
+            # Счетчики - статистика и порядок вытеснения: потеря пачки не ломает кэш
+            logger.warning(f"⚠️ Кэш ИИ: счетчики попаданий не записаны: {e}")
+            return 0
+
+    async def put(self, key: str, kind: str, model: str, value: Any):
+        await self.db.put_ai_cache_entry(key, kind, model, json.dumps(value, ensure_ascii=False))
+        self._puts += 1
+        if self._puts % self.PRUNE_EVERY == 1:
+            await self.prune()
+
+    def record_bypass(self):
+        """Принудительная генерация: кэш не читается, результат перезапишет запись"""
+        self.bypassed += 1
+
+    async def prune(self) -> int:
+        # Вытеснение учитывает last_hit_at: сначала свежие попадания
+        await self.flush_hits()
+        evicted = await self.db.prune_ai_cache(datetime.now() - self.ttl, self.max_entries)
+        if evicted:
+            self.evicted += evicted
+            logger.info(f"🧹 Кэш ИИ: удалено записей {evicted}")
+        return evicted
+
+    @property
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'bypassed': self.bypassed,
+            'evicted': self.evicted,
+            'hit_rate': round(self.hits / total * 100, 1) if total else 0.0
+        }
@@ -1,56 +1,402 @@
 import openai
 import asyncio
 import logging
-from typing import Optional, Dict, List
+from typing import AsyncIterator, Iterable, Optional, Dict, List
 import re
+import json
 import hashlib
-from config import config
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, replace
+from functools import lru_cache
+from config import (
+    config, AI_MAX_RETRIES, OPENAI_BASE_URL, AI_STRUCTURED_OUTPUT, AI_INPUT_MAX_TOKENS,
+    REWRITE_SIMILARITY_THRESHOLD, AI_CANDIDATES, OPENAI_MODEL, MAX_TOKENS, TEMPERATURE
+)
+from services.rate_limiter import RateLimiter, backoff_delay, parse_retry_after
+from services.ai_cache import AIResponseCache
+from services.token_budget import TokenLedger, count_message_tokens, count_tokens, current_usage, trim_to_tokens
+from services.text_similarity import TextSimilarity
 
 logger = logging.getLogger(__name__)
 
+SYSTEM_PROMPT = "Ты профессиональный редактор и копирайтер. Твоя задача - переписывать новости, сохраняя все факты, но полностью меняя стиль изложения и структуру текста для избежания нарушения авторских прав."
+
+# Ответ в режиме structured output: заголовок, текст и хештеги одним запросом
+POST_SCHEMA = {
+    "name": "news_post",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string", "description": "Новый уникальный заголовок"},
+            "body": {"type": "string", "description": "Текст поста без заголовка и хештегов"},
+            "hashtags": {
+                "type": "array",
+                "items": {"type": "string"},
+                "description": "2-3 релевантных хештега вида #слово"
+            }
+        },
+        "required": ["title", "body", "hashtags"],
+        "additionalProperties": False
+    }
+}
+# Версия промптов: увеличить при изменении их текста, чтобы кэш не отдавал старые ответы
+PROMPT_VERSION = 2
+
+REWRITE_REQUIREMENTS = """Требования к переписыванию:
+1. Сохрани ВСЕ важные факты, цифры, имена, даты
+2. Полностью измени структуру текста и порядок подачи информации
+3. Используй синонимы и перефразируй предложения
+4. Добавь подходящие эмодзи для привлекательности
+5. Создай новый уникальный заголовок
+6. Текст должен быть от 200 до 500 символов
+7. В конце добавь 2-3 релевантных хештега"""
+
+STYLE_INSTRUCTIONS = {
+    "engaging": "Стиль: Привлекательный и интересный, с эмодзи и захватывающими формулировками. Используй яркие эпитеты и интригующие обороты.",
+
+    "neutral": "Стиль: Нейтральный информационный стиль, сдержанный и объективный. Минимум эмодзи, факты без эмоциональной окраски.",
+
+    "formal": "Стиль: Официальный деловой стиль, строгие формулировки, терминология. Используй конструкции 'сообщается', 'отмечается', 'по данным'.",
+
+    "casual": "Стиль: Неформальный дружественный стиль, как будто рассказываешь другу. Простые слова, разговорные обороты."
+}
+
+STRUCTURED_INSTRUCTION = "\n\nВерни JSON: title - новый заголовок, body - текст поста, hashtags - 2-3 хештега."
+
+HASHTAG_PROMPT = """Ты эксперт по созданию хештегов для социальных сетей.
+Создай 2-3 релевантных хештега для новости из указанной категории.
+
+Требования:
+1. Хештеги на русском языке
+2. Короткие и емкие (1-2 слова)
+3. Релевантные содержанию и категории
+4. Популярные в данной тематике
+
+Верни только хештеги через пробел, например: #новости #политика #россия"""
+HASHTAG_RE = re.compile(r'#\w+')
+
+# Хештеги по категории, если ИИ их не дал
+CATEGORY_HASHTAGS = {
+    'политика': ['#политика', '#новости', '#россия'],
+    'экономика': ['#экономика', '#финансы', '#бизнес'],
+    'технологии': ['#технологии', '#инновации', '#наука'],
+    'спорт': ['#спорт', '#соревнования', '#победа'],
+    'наука': ['#наука', '#открытия', '#исследования'],
+    'общество': ['#общество', '#люди', '#жизнь']
+}
+
+# Настройки БД, которые AIProcessor применяет на лету
+AI_SETTING_KEYS = ('openai_model', 'ai_temperature', 'ai_max_tokens', 'ai_channel_models')
+
+# Модель для запросов текущей задачи вместо общей (публикация в каналы со своей моделью)
+model_override: ContextVar[Optional[str]] = ContextVar('model_override', default=None)
+
+
+@dataclass(frozen=True)
+class AIParams:
+    """Параметры запросов к модели; при изменении настроек заменяются целиком"""
+    model: str = OPENAI_MODEL
+    temperature: float = TEMPERATURE
+    max_tokens: int = MAX_TOKENS
+    # Модель по ID канала: например, дешевая для каналов с большим потоком постов
+    channel_models: Dict[str, str] = field(default_factory=dict)
+
+    def model_for(self, channel_id: Optional[str]) -> str:
+        return self.channel_models.get(channel_id) or self.model
+
+
+def parse_ai_setting(key: str, value: Optional[str]) -> Dict:
+    """Поле AIParams из значения настройки; None (настройка удалена) - значение по умолчанию"""
+    defaults = AIParams()
+    if key == 'openai_model':
+        return {'model': (value or '').strip() or defaults.model}
+    if key == 'ai_temperature':
+        return {'temperature': min(max(float(value), 0.0), 2.0) if value is not None else defaults.temperature}
+    if key == 'ai_max_tokens':
+        max_tokens = int(value) if value is not None else defaults.max_tokens
+        if max_tokens <= 0:
+            raise ValueError(f"max_tokens должен быть больше нуля: {max_tokens}")
+        return {'max_tokens': max_tokens}
+    if key == 'ai_channel_models':
+        models = json.loads(value) if value else {}
+        if not isinstance(models, dict):
+            raise ValueError("ожидается JSON-объект {канал: модель}")
+        return {'channel_models': {str(channel): str(model) for channel, model in models.items() if model}}
+    return {}
+
+
+@lru_cache(maxsize=None)
+def prompt_messages(style: str, structured: bool = False) -> tuple:
+    """Неизменная часть запроса на переписывание (система, требования, стиль), собирается один раз
+
+    Вся инструкция - в системном сообщении, в пользовательском только текст
+    новости: одинаковое начало запросов дешевле за счет кэша промптов OpenAI.
+    """
+    style_instruction = STYLE_INSTRUCTIONS.get(style, STYLE_INSTRUCTIONS["engaging"])
+    content = f"{SYSTEM_PROMPT}\n\n{REWRITE_REQUIREMENTS}\n\n{style_instruction}"
+    if structured:
+        content += STRUCTURED_INSTRUCTION
+    return ({"role": "system", "content": content},)
+
+
+def compose_post(title: str, body: str, hashtags: List[str]) -> str:
+    """Текст поста из частей ответа structured output"""
+    parts = [part.strip() for part in (title, body) if part and part.strip()]
+    if hashtags:
+        parts.append(' '.join(hashtags))
+    return '\n\n'.join(parts)
+
+
+def normalize_hashtags(values) -> List[str]:
+    """Хештеги вида #слово без повторов (пробелы внутри тега склеиваются)"""
+    hashtags = []
+    for value in values or []:
+        tag = '#' + re.sub(r'\W+', '', str(value).replace(' ', '_')).strip('_')
+        if len(tag) > 1 and tag not in hashtags:
+            hashtags.append(tag)
+    return hashtags[:3]
+
+
+def parse_structured_post(content: str) -> Dict:
+    """Пост из JSON-ответа по схеме POST_SCHEMA: текст и хештеги"""
+    data = json.loads(content)
+    hashtags = normalize_hashtags(data.get('hashtags'))
+    return {'content': compose_post(data.get('title', ''), data.get('body', ''), hashtags), 'hashtags': hashtags}
+
 
 class AIProcessor:
-    def __init__(self):
-        self.client = openai.AsyncOpenAI(api_key=config.OPENAI_API_KEY)
-        self.model = getattr(config, 'OPENAI_MODEL', 'gpt-4')
-        self.max_tokens = getattr(config, 'MAX_TOKENS', 800)
-        self.temperature = getattr(config, 'TEMPERATURE', 0.7)
-
-    async def rewrite_news(self, title: str, content: str, style: str = "engaging") -> Optional[str]:
-        """Переписывание новости с помощью ChatGPT"""
+    def __init__(self, article_index=None, cache: AIResponseCache = None, ledger: TokenLedger = None):
+        # ArticleIndex: не отправлять в API уже переписанные новости
+        self.article_index = article_index
+        # Кэш ответов: та же новость в том же стиле не переписывается повторно
+        self.cache = cache
+        # Учет токенов и стоимости по дням и каналам, дневной лимит токенов
+        self.ledger = ledger
+        # Один клиент и пул соединений на все время работы; повторы делает _chat (с учетом лимитов),
+        # встроенные повторы клиента отключены
+        self.client = openai.AsyncOpenAI(api_key=config.OPENAI_API_KEY, base_url=OPENAI_BASE_URL, max_retries=0)
+        self.rate_limiter = RateLimiter()
+        # Модель, температура и max_tokens; настройки из БД применяются на лету (watch_settings)
+        self.params = AIParams()
+        # Отключается сам, если модель не поддерживает response_format с JSON-схемой
+        self.structured_output = AI_STRUCTURED_OUTPUT
+        # Сходство пересказа с оригиналом по символьным n-граммам (устойчиво к смене окончаний)
+        self.similarity = TextSimilarity()
+        # Вариантов пересказа в одном ответе (параметр n)
+        self.candidates = AI_CANDIDATES
+
+    @property
+    def model(self) -> str:
+        return model_override.get() or self.params.model
+
+    @property
+    def temperature(self) -> float:
+        return self.params.temperature
+
+    @property
+    def max_tokens(self) -> int:
+        return self.params.max_tokens
+
+    def apply_settings(self, changes: Dict[str, Optional[str]]):
+        """Применить изменения настроек ИИ: новый AIParams подменяет старый одним присваиванием
+
+        Запрос, уже начатый со старыми параметрами, так с ними и завершится.
+        """
+        updates = {}
+        for key, value in changes.items():
+            try:
+                updates.update(parse_ai_setting(key, value))
+            except (TypeError, ValueError) as e:
+                logger.warning(f"⚠️ Настройка {key}={value!r} не применена: {e}")
+
+        if updates and any(getattr(self.params, name) != value for name, value in updates.items()):
+            self.params = replace(self.params, **updates)
+            logger.info(
+                f"🔄 Параметры ИИ: {self.params.model}, температура {self.params.temperature}, "
+                f"max_tokens {self.params.max_tokens}, моделей по каналам {len(self.params.channel_models)}"
+            )
+
+    async def watch_settings(self, db):
+        """Взять параметры ИИ из настроек БД и дальше применять их изменения без перезапуска"""
+        self.apply_settings({key: await db.get_setting(key) for key in AI_SETTING_KEYS})
+        db.on_settings_changed(self.apply_settings, AI_SETTING_KEYS)
+
+    @contextmanager
+    def use_model(self, model: Optional[str]):
+        """Запросы внутри блока (и запущенных в нем задач) идут к model"""
+        token = model_override.set(model)
         try:
-            # Объединяем заголовок и контент
-            original_text = f"Заголовок: {title}\n\nТекст: {content}"
-
-            # Ограничиваем длину входного текста
-            if len(original_text) > 3000:
-                original_text = original_text[:3000] + "..."
-
-            # Выбираем промпт в зависимости от стиля
-            prompt = self._get_style_prompt(style) + f"\n\nИсходная новость:\n{original_text}"
-
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "Ты профессиональный редактор и копирайтер. Твоя задача - переписывать новости, сохраняя все факты, но полностью меняя стиль изложения и структуру текста для избежания нарушения авторских прав."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
+            yield
+        finally:
+            model_override.reset(token)
+
+    def primary_model(self, channels: Iterable[Dict]) -> str:
+        """Модель, нужная большинству каналов: ею переписываются новости прогона"""
+        params = self.params
+        counts = Counter(params.model_for(channel['channel_id']) for channel in channels)
+        return counts.most_common(1)[0][0] if counts else params.model
+
+    def group_channels(self, channels: Iterable[Dict]) -> Dict[str, List[Dict]]:
+        """Каналы по моделям, которыми для них переписываются посты"""
+        params = self.params
+        groups: Dict[str, List[Dict]] = {}
+        for channel in channels:
+            groups.setdefault(params.model_for(channel['channel_id']), []).append(channel)
+        return groups
+
+    async def _chat(self, messages: List[Dict], max_tokens: int, temperature: float = None, **extra):
+        """Запрос к Chat Completions через ограничитель; повтор с паузой при 429, 5xx и сетевых ошибках"""
+        if self.ledger:
+            await self.ledger.check()
+        # Модель фиксируется на весь запрос, даже если настройки сменятся во время повторов
+        model = self.model
+        estimated = count_message_tokens(messages, model) + max_tokens
+        params = {'model': model, 'messages': messages, 'max_tokens': max_tokens, **extra}
+        if temperature is not None:
+            params['temperature'] = temperature
+
+        for attempt in range(AI_MAX_RETRIES + 1):
+            async with self.rate_limiter.acquire(estimated):
+                try:
+                    raw = await self.client.chat.completions.with_raw_response.create(**params)
+                except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                    error = e
+                else:
+                    self.rate_limiter.update_from_headers(raw.headers)
+                    response = raw.parse()
+                    if response.usage:
+                        self.rate_limiter.settle(estimated, response.usage.total_tokens)
+                        if self.ledger:
+                            await self.ledger.record(
+                                model, response.usage.prompt_tokens, response.usage.completion_tokens
+                            )
+                    return response
+
+            if attempt == AI_MAX_RETRIES:
+                raise error
+            await self._backoff(error, attempt)
+
+    async def _chat_stream(self, messages: List[Dict], max_tokens: int, temperature: float = None,
+                           post_usage: Dict = None, **extra) -> AsyncIterator[str]:
+        """Потоковый _chat: части текста ответа по мере генерации
+
+        Повтор возможен, только пока поток не открыт; usage приходит последним чанком
+        и записывается так же, как у обычного запроса (расход поста - в post_usage, если передан).
+        """
+        if self.ledger:
+            await self.ledger.check()
+        model = self.model
+        estimated = count_message_tokens(messages, model) + max_tokens
+        params = {'model': model, 'messages': messages, 'max_tokens': max_tokens, 'stream': True,
+                  'stream_options': {'include_usage': True}, **extra}
+        if temperature is not None:
+            params['temperature'] = temperature
+
+        for attempt in range(AI_MAX_RETRIES + 1):
+            # Слот ограничителя занят, пока читается поток
+            async with self.rate_limiter.acquire(estimated):
+                try:
+                    raw = await self.client.chat.completions.with_raw_response.create(**params)
+                except (openai.RateLimitError, openai.InternalServerError, openai.APIConnectionError) as e:
+                    error = e
+                else:
+                    self.rate_limiter.update_from_headers(raw.headers)
+                    stream = raw.parse()
+                    usage = None
+                    try:
+                        async for chunk in stream:
+                            if chunk.usage:
+                                usage = chunk.usage
+                            for choice in chunk.choices:
+                                if choice.index == 0 and choice.delta.content:
+                                    yield choice.delta.content
+                    finally:
+                        await stream.close()
+                        if usage:
+                            self.rate_limiter.settle(estimated, usage.total_tokens)
+                            if self.ledger:
+                                # Контекст генератора - у читающего поток: расход поста передается явно
+                                usage_token = current_usage.set(post_usage) if post_usage is not None else None
+                                try:
+                                    await self.ledger.record(model, usage.prompt_tokens, usage.completion_tokens)
+                                finally:
+                                    if usage_token:
+                                        current_usage.reset(usage_token)
+                    return
+
+            if attempt == AI_MAX_RETRIES:
+                raise error
+            await self._backoff(error, attempt)
+
+    async def _backoff(self, error: Exception, attempt: int):
+        """Пауза перед повтором запроса; 429 притормаживает и общий ограничитель"""
+        throttled = isinstance(error, openai.RateLimitError)
+        headers = error.response.headers if isinstance(error, openai.APIStatusError) else {}
+        delay = backoff_delay(attempt, retry_after=parse_retry_after(headers))
+        if throttled:
+            # 429 касается всех запросов: притормаживаем общий ограничитель
+            self.rate_limiter.update_from_headers(headers)
+            self.rate_limiter.pause(delay)
+        self.rate_limiter.record_retry(throttled)
+        logger.warning(f"⏳ OpenAI: {type(error).__name__}, повтор {attempt + 1}/{AI_MAX_RETRIES} через {delay:.1f} с")
+        await asyncio.sleep(delay)
+
+    def _cache_key(self, kind: str, style: str, text: str) -> str:
+        # Хештеги запрашиваются с постоянными параметрами, пересказ - с настраиваемыми
+        if kind == 'hashtags':
+            return AIResponseCache.make_key(self.model, kind, style, PROMPT_VERSION, text)
+        return AIResponseCache.make_key(self.model, kind, style, PROMPT_VERSION, text,
+                                        self.temperature, self.max_tokens)
+
+    async def _cached(self, kind: str, style: str, text: str, compute, force: bool = False):
+        """Ответ из кэша или compute() с сохранением; force - сгенерировать заново"""
+        if not self.cache:
+            return await compute()
+
+        key = self._cache_key(kind, style, text)
+        if force:
+            self.cache.record_bypass()
+        else:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                logger.info(f"💾 Ответ ИИ из кэша ({kind})")
+                return cached
+
+        value = await compute()
+        if value:
+            await self.cache.put(key, kind, self.model, value)
+        return value
+
+    async def rewrite_news(self, title: str, content: str, style: str = "engaging",
+                           force: bool = False) -> Optional[str]:
+        """Переписывание новости с помощью ChatGPT (через кэш ответов)"""
+        return await self._cached(
+            'rewrite', style, self._original_text(title, content),
+            lambda: self._rewrite_news(title, content, style), force
+        )
+
+    async def _rewrite_news(self, title: str, content: str, style: str) -> Optional[str]:
+        try:
+            original_text = self._original_text(title, content)
+
+            # Инструкции по стилю - готовым системным сообщением, от запроса меняется только новость
+            response = await self._chat(
+                [*prompt_messages(style), {"role": "user", "content": f"Исходная новость:\n{original_text}"}],
                 max_tokens=self.max_tokens,
-                temperature=self.temperature
+                temperature=self.temperature,
+                **self._candidates_param()
             )
 
-            rewritten_text = response.choices[0].message.content.strip()
+            candidates = [choice.message.content.strip() for choice in response.choices if choice.message.content]
 
             # Проверяем качество переписанного текста
-            if self._validate_rewritten_text(original_text, rewritten_text):
+            chosen = self._pick_candidate(original_text, candidates)
+            if chosen is not None:
                 logger.info(f"Успешно переписана новость: {title[:50]}...")
-                return rewritten_text
+                return candidates[chosen]
             else:
                 logger.warning(f"Переписанный текст не прошел валидацию: {title[:50]}...")
                 return None
@@ -59,34 +405,107 @@ class AIProcessor:
             logger.error(f"Ошибка переписывания новости: {str(e)}")
             return None
 
-    def _get_style_prompt(self, style: str) -> str:
-        """Получение промпта в зависимости от стиля"""
+    async def rewrite_news_stream(self, title: str, content: str, style: str = "engaging",
+                                  force: bool = False, usage: Dict = None) -> AsyncIterator[str]:
+        """Потоковый rewrite_news: части текста по мере генерации, ответ из кэша - одной частью
 
-        base_requirements = """
-Требования к переписыванию:
-1. Сохрани ВСЕ важные факты, цифры, имена, даты
-2. Полностью измени структуру текста и порядок подачи информации
-3. Используй синонимы и перефразируй предложения
-4. Добавь подходящие эмодзи для привлекательности
-5. Создай новый уникальный заголовок
-6. Текст должен быть от 200 до 500 символов
-7. В конце добавь 2-3 релевантных хештега
+        Текст не проверяется и не кэшируется - это делает create_post_stream после последней части.
+        В usage (если передан) записывается расход токенов, как в create_post.
         """
+        original_text = self._original_text(title, content)
+        if self.cache and force:
+            self.cache.record_bypass()
+        elif self.cache:
+            cached = await self.cache.get(
+                self._cache_key('rewrite', style, original_text)
+            )
+            if cached is not None:
+                logger.info("💾 Ответ ИИ из кэша (rewrite)")
+                yield cached
+                return
+
+        async for delta in self._chat_stream(
+            [*prompt_messages(style), {"role": "user", "content": f"Исходная новость:\n{original_text}"}],
+            max_tokens=self.max_tokens,
+            temperature=self.temperature,
+            post_usage=usage
+        ):
+            yield delta
+
+    def create_post_stream(self, news_item: Dict, style: str = "engaging", force: bool = False) -> 'PostStream':
+        """Пост с потоковым пересказом для предпросмотра: см. PostStream"""
+        return PostStream(self, news_item, style, force)
+
+    async def rewrite_news_structured(self, title: str, content: str, style: str = "engaging",
+                                      force: bool = False) -> Optional[Dict]:
+        """Переписывание одним запросом: заголовок, текст и хештеги в JSON по схеме POST_SCHEMA"""
+        return await self._cached(
+            'post', style, self._original_text(title, content),
+            lambda: self._rewrite_news_structured(title, content, style), force
+        )
+
+    async def _rewrite_news_structured(self, title: str, content: str, style: str) -> Optional[Dict]:
+        try:
+            original_text = self._original_text(title, content)
+
+            response = await self._chat(
+                [*prompt_messages(style, True), {"role": "user", "content": f"Исходная новость:\n{original_text}"}],
+                max_tokens=self.max_tokens,
+                temperature=self.temperature,
+                response_format={"type": "json_schema", "json_schema": POST_SCHEMA},
+                **self._candidates_param()
+            )
 
-        style_instructions = {
-            "engaging": f"{base_requirements}\n\nСтиль: Привлекательный и интересный, с эмодзи и захватывающими формулировками. Используй яркие эпитеты и интригующие обороты.",
+            posts = [parse_structured_post(choice.message.content) for choice in response.choices]
 
-            "neutral": f"{base_requirements}\n\nСтиль: Нейтральный информационный стиль, сдержанный и объективный. Минимум эмодзи, факты без эмоциональной окраски.",
+            # Те же проверки, что и для текста в свободной форме
+            chosen = self._pick_candidate(original_text, [post['content'] for post in posts])
+            if chosen is not None:
+                logger.info(f"Успешно переписана новость: {title[:50]}...")
+                return posts[chosen]
 
-            "formal": f"{base_requirements}\n\nСтиль: Официальный деловой стиль, строгие формулировки, терминология. Используй конструкции 'сообщается', 'отмечается', 'по данным'.",
+            logger.warning(f"Переписанный текст не прошел валидацию: {title[:50]}...")
+            return None
 
-            "casual": f"{base_requirements}\n\nСтиль: Неформальный дружественный стиль, как будто рассказываешь другу. Простые слова, разговорные обороты."
-        }
+        except openai.BadRequestError as e:
+            if 'response_format' not in str(e) and 'json_schema' not in str(e):
+                logger.error(f"Ошибка переписывания новости: {str(e)}")
+                return None
+            # Модель не поддерживает JSON-схему - дальше работаем в два запроса
+            logger.warning(f"Structured output недоступен для {self.model}, переключаемся на обычный режим: {str(e)}")
+            self.structured_output = False
+            return None
+        except Exception as e:
+            logger.error(f"Ошибка переписывания новости: {str(e)}")
+            return None
+
+    def _original_text(self, title: str, content: str) -> str:
+        """Заголовок и текст новости для промпта, не длиннее AI_INPUT_MAX_TOKENS токенов
 
-        return style_instructions.get(style, style_instructions["engaging"])
+        Текст обрезается по предложениям: первые абзацы с главным остаются целиком.
+        """
+        header = f"Заголовок: {title}\n\nТекст: "
+        budget = max(AI_INPUT_MAX_TOKENS - count_tokens(header, self.model), 0)
+        return header + trim_to_tokens(content, budget, self.model)
+
+    def _candidates_param(self) -> Dict:
+        """Параметр n запроса: несколько вариантов пересказа за один вызов"""
+        return {'n': self.candidates} if self.candidates > 1 else {}
 
-    def _validate_rewritten_text(self, original: str, rewritten: str) -> bool:
-        """Валидация переписанного текста"""
+    def _pick_candidate(self, original: str, candidates: List[str]) -> Optional[int]:
+        """Номер первого варианта, прошедшего валидацию (сходство всех вариантов - одним вызовом)"""
+        if not candidates:
+            return None
+        scores = self.similarity.similarities(original, candidates)
+        for i, (candidate, score) in enumerate(zip(candidates, scores)):
+            if self._validate_rewritten_text(original, candidate, float(score)):
+                if len(candidates) > 1:
+                    logger.info(f"🎯 Принят вариант {i + 1}/{len(candidates)}")
+                return i
+        return None
+
+    def _validate_rewritten_text(self, original: str, rewritten: str, similarity: float = None) -> bool:
+        """Валидация переписанного текста (similarity - уже посчитанное сходство с оригиналом)"""
         # Проверяем минимальную длину
         if len(rewritten) < 100:
             return False
@@ -96,8 +515,9 @@ class AIProcessor:
             return False
 
         # Проверяем, что текст действительно изменился
-        similarity = self._calculate_similarity(original.lower(), rewritten.lower())
-        if similarity > 0.7:  # Слишком похож на оригинал
+        if similarity is None:
+            similarity = self.similarity.similarity(original, rewritten)
+        if similarity > REWRITE_SIMILARITY_THRESHOLD:  # Слишком похож на оригинал
             logger.warning(f"Текст слишком похож на оригинал (схожесть: {similarity:.2f})")
             return False
 
@@ -108,121 +528,182 @@ class AIProcessor:
 
         return True
 
-    def _calculate_similarity(self, text1: str, text2: str) -> float:
-        """Простой расчет похожести текстов по словам"""
-        words1 = set(re.findall(r'\w+', text1.lower()))
-        words2 = set(re.findall(r'\w+', text2.lower()))
-
-        if len(words1) == 0 or len(words2) == 0:
-            return 0.0
-
-        intersection = len(words1.intersection(words2))
-        union = len(words1.union(words2))
-
-        return intersection / union if union > 0 else 0
-
-    async def generate_hashtags(self, content: str, category: str) -> List[str]:
-        """Генерация хештегов для поста"""
+    async def generate_hashtags(self, content: str, category: str, force: bool = False) -> List[str]:
+        """Генерация хештегов для поста (через кэш ответов)"""
         try:
-            prompt = f"""
-            Создай 2-3 релевантных хештега для новости из категории "{category}".
-
-            Требования:
-            1. Хештеги на русском языке
-            2. Короткие и емкие (1-2 слова)
-            3. Релевантные содержанию и категории
-            4. Популярные в данной тематике
-
-            Контент: {content[:200]}...
-
-            Верни только хештеги через пробел, например: #новости #политика #россия
-            """
+            prompt = f"Категория: {category}\n\nКонтент: {content[:200]}..."
+
+            async def request() -> List[str]:
+                response = await self._chat(
+                    [
+                        {"role": "system", "content": HASHTAG_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=50,
+                    temperature=0.5
+                )
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "Ты эксперт по созданию хештегов для социальных сетей."},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=50,
-                temperature=0.5
-            )
+                hashtags_text = response.choices[0].message.content.strip()
+                hashtags = re.findall(r'#\w+', hashtags_text)
 
-            hashtags_text = response.choices[0].message.content.strip()
-            hashtags = re.findall(r'#\w+', hashtags_text)
+                return hashtags[:3]  # Максимум 3 хештега
 
-            return hashtags[:3]  # Максимум 3 хештега
+            return await self._cached('hashtags', category, content[:200], request, force)
 
         except Exception as e:
             logger.error(f"Ошибка генерации хештегов: {str(e)}")
             # Возвращаем базовые хештеги по категории
-            category_hashtags = {
-                'политика': ['#политика', '#новости', '#россия'],
-                'экономика': ['#экономика', '#финансы', '#бизнес'],
-                'технологии': ['#технологии', '#инновации', '#наука'],
-                'спорт': ['#спорт', '#соревнования', '#победа'],
-                'наука': ['#наука', '#открытия', '#исследования'],
-                'общество': ['#общество', '#люди', '#жизнь']
-            }
-            return category_hashtags.get(category, ['#новости', '#актуально'])
+            return CATEGORY_HASHTAGS.get(category, ['#новости', '#актуально'])
 
-    async def create_post(self, news_item: Dict, style: str = "engaging") -> Optional[Dict]:
-        """Создание готового поста из новости"""
+    async def create_post(self, news_item: Dict, style: str = "engaging", force: bool = False) -> Optional[Dict]:
+        """Создание готового поста из новости (force - не брать ответы ИИ из кэша)"""
+        # Расход токенов на этот пост: ledger распределит его по каналам после публикации
+        usage = {}
+        usage_token = current_usage.set(usage)
         try:
             logger.info(f"Создаем пост из новости: {news_item['title'][:50]}...")
 
-            # Переписываем новость
-            rewritten_content = await self.rewrite_news(
-                news_item['title'],
-                news_item['content'],
-                style
-            )
+            # Переписываем новость: одним запросом по схеме или текстом в свободной форме
+            structured = None
+            if self.structured_output:
+                structured = await self.rewrite_news_structured(
+                    news_item['title'], news_item['content'], style, force=force
+                )
 
-            if not rewritten_content:
+            if structured:
+                rewritten_content = structured['content']
+                existing_hashtags = list(structured['hashtags'])
+            elif self.structured_output:
                 logger.warning("Не удалось переписать новость")
                 return None
-
-            # Проверяем, есть ли уже хештеги в тексте
-            existing_hashtags = re.findall(r'#\w+', rewritten_content)
-
-            # Если хештегов мало, генерируем дополнительные
-            if len(existing_hashtags) < 2:
-                additional_hashtags = await self.generate_hashtags(
-                    rewritten_content,
-                    news_item.get('category', 'общее')
+            else:
+                rewritten_content = await self.rewrite_news(
+                    news_item['title'],
+                    news_item['content'],
+                    style,
+                    force=force
                 )
 
-                # Добавляем хештеги, которых еще нет
-                for hashtag in additional_hashtags:
-                    if hashtag not in existing_hashtags:
-                        rewritten_content += f" {hashtag}"
-                        existing_hashtags.append(hashtag)
-                    if len(existing_hashtags) >= 3:
-                        break
+                if not rewritten_content:
+                    logger.warning("Не удалось переписать новость")
+                    return None
 
-            return {
-                'content': rewritten_content,
-                'original_title': news_item['title'],
-                'original_content': news_item['content'],
-                'source_url': news_item.get('url', ''),
-                'category': news_item.get('category', 'общее'),
-                'source_id': news_item.get('source_id'),
-                'hashtags': existing_hashtags,
-                'style': style
-            }
+                # Проверяем, есть ли уже хештеги в тексте
+                existing_hashtags = HASHTAG_RE.findall(rewritten_content)
+
+            rewritten_content = await self._top_up_hashtags(news_item, rewritten_content, existing_hashtags, force)
+            return self._make_post(news_item, rewritten_content, existing_hashtags, style, usage)
 
         except Exception as e:
             logger.error(f"Ошибка создания поста: {str(e)}")
             return None
+        finally:
+            current_usage.reset(usage_token)
+
+    async def _top_up_hashtags(self, news_item: Dict, content: str, hashtags: List[str], force: bool = False) -> str:
+        """Если хештегов меньше двух - догенерировать; hashtags дополняется на месте"""
+        if len(hashtags) >= 2:
+            return content
+
+        additional_hashtags = await self.generate_hashtags(content, news_item.get('category', 'общее'), force=force)
+
+        # Добавляем хештеги, которых еще нет
+        for hashtag in additional_hashtags:
+            if hashtag not in hashtags:
+                content += f" {hashtag}"
+                hashtags.append(hashtag)
+            if len(hashtags) >= 3:
+                break
+        return content
+
+    async def _finish_streamed_post(self, news_item: Dict, text: str, style: str, force: bool,
+                                    usage: Dict = None) -> Optional[Dict]:
+        """Пост из текста, полученного потоком: те же проверки и кэш, что у rewrite_news"""
+        usage = usage if usage is not None else {}
+        original_text = self._original_text(news_item['title'], news_item['content'])
+        if self._pick_candidate(original_text, [text]) is None:
+            logger.warning(f"Переписанный текст не прошел валидацию: {news_item['title'][:50]}...")
+            return None
+
+        if self.cache:
+            key = self._cache_key('rewrite', style, original_text)
+            await self.cache.put(key, 'rewrite', self.model, text)
+
+        hashtags = HASHTAG_RE.findall(text)
+        usage_token = current_usage.set(usage)
+        try:
+            content = await self._top_up_hashtags(news_item, text, hashtags, force)
+        finally:
+            current_usage.reset(usage_token)
+        return self._make_post(news_item, content, hashtags, style, usage)
+
+    def _make_post(self, news_item: Dict, content: str, hashtags: List[str], style: str, usage: Dict,
+                   model: str = None) -> Dict:
+        return {
+            'content': content,
+            'original_title': news_item['title'],
+            'original_content': news_item['content'],
+            'source_url': news_item.get('url', ''),
+            'category': news_item.get('category', 'общее'),
+            'source_id': news_item.get('source_id'),
+            'hashtags': hashtags,
+            'style': style,
+            'model': model or self.model,
+            'usage': usage
+        }
+
+    def batch_request(self, custom_id: str, news_item: Dict, style: str) -> Dict:
+        """Строка JSONL для Batch API - тот же запрос, что делает rewrite_news(_structured)"""
+        original_text = self._original_text(news_item['title'], news_item['content'])
+        body = {
+            'model': self.model,
+            'messages': [*prompt_messages(style, self.structured_output),
+                         {"role": "user", "content": f"Исходная новость:\n{original_text}"}],
+            'max_tokens': self.max_tokens,
+            'temperature': self.temperature,
+            **self._candidates_param()
+        }
+        if self.structured_output:
+            body['response_format'] = {"type": "json_schema", "json_schema": POST_SCHEMA}
+        return {'custom_id': custom_id, 'method': 'POST', 'url': '/v1/chat/completions', 'body': body}
+
+    def post_from_batch_result(self, news_item: Dict, style: str, structured: bool, body: Dict,
+                               usage: Dict, model: str = None) -> Optional[Dict]:
+        """Пост из ответа пакета: те же проверки, хештеги без дозапроса - по категории"""
+        contents = [choice['message']['content'] for choice in body.get('choices') or []
+                    if choice.get('message', {}).get('content')]
+        try:
+            if structured:
+                candidates = [parse_structured_post(content) for content in contents]
+            else:
+                candidates = [{'content': content.strip(), 'hashtags': HASHTAG_RE.findall(content)}
+                              for content in contents]
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning(f"Некорректный ответ пакета для {news_item['title'][:50]}: {e}")
+            return None
+
+        original_text = self._original_text(news_item['title'], news_item['content'])
+        chosen = self._pick_candidate(original_text, [candidate['content'] for candidate in candidates])
+        if chosen is None:
+            logger.warning(f"Переписанный текст не прошел валидацию: {news_item['title'][:50]}...")
+            return None
+
+        content = candidates[chosen]['content']
+        hashtags = list(candidates[chosen]['hashtags'])
+        if len(hashtags) < 2:
+            for hashtag in CATEGORY_HASHTAGS.get(news_item.get('category', 'общее'), ['#новости', '#актуально']):
+                if hashtag not in hashtags and len(hashtags) < 3:
+                    content += f" {hashtag}"
+                    hashtags.append(hashtag)
+        return self._make_post(news_item, content, hashtags, style, usage, model)
 
     async def test_ai_connection(self) -> Dict:
         """Тестирование подключения к OpenAI"""
         try:
             test_prompt = "Привет! Это тест подключения к OpenAI API."
 
-            response = await self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = await self._chat(
+                [
                     {"role": "user", "content": test_prompt}
                 ],
                 max_tokens=50
@@ -245,23 +726,60 @@ class AIProcessor:
 
     async def process_news_batch(self, news_list: List[Dict], style: str = "engaging", max_posts: int = 5) -> List[
         Dict]:
-        """Обработка пакета новостей"""
-        processed_posts = []
+        """Обработка пакета новостей
 
-        for i, news_item in enumerate(news_list[:max_posts]):
-            try:
-                logger.info(f"Обрабатываем новость {i + 1}/{min(len(news_list), max_posts)}")
+        Новости переписываются параллельно, не больше max_concurrency ограничителя
+        одновременно; темп запросов задает rate_limiter. Статьи в индексе здесь не
+        отмечаются: это делает вызывающий после успешной публикации.
+        """
+        if self.article_index:
+            news_list = await self.article_index.filter_unprocessed(news_list)
 
-                post = await self.create_post(news_item, style)
-                if post:
-                    processed_posts.append(post)
+        batch = news_list[:max_posts]
+        semaphore = asyncio.Semaphore(self.rate_limiter.max_concurrency)
 
-                # Небольшая пауза между запросами к API
-                await asyncio.sleep(1)
+        async def process(i: int, news_item: Dict) -> Optional[Dict]:
+            async with semaphore:
+                try:
+                    logger.info(f"Обрабатываем новость {i + 1}/{len(batch)}")
+                    return await self.create_post(news_item, style)
+                except Exception as e:
+                    logger.error(f"Ошибка обработки новости {i + 1}: {str(e)}")
+                    return None
 
-            except Exception as e:
-                logger.error(f"Ошибка обработки новости {i + 1}: {str(e)}")
-                continue
+        results = await asyncio.gather(*[process(i, news_item) for i, news_item in enumerate(batch)])
+        processed_posts = [post for post in results if post]
 
         logger.info(f"Обработано {len(processed_posts)} постов из {len(news_list)} новостей")
-        return processed_posts
\ No newline at end of file
+        return processed_posts
+
+
+class PostStream:
+    """Создание поста с потоковым пересказом (для предпросмотра в Telegram)
+
+    async for дает части текста по мере генерации; после цикла в post - готовый
+    пост или None, если текст не прошел проверку, как у create_post.
+    """
+
+    def __init__(self, processor: AIProcessor, news_item: Dict, style: str = "engaging", force: bool = False):
+        self.processor = processor
+        self.news_item = news_item
+        self.style = style
+        self.force = force
+        self.text = ''
+        self.post: Optional[Dict] = None
+        # Расход токенов пересказа и дозапроса хештегов - для TokenLedger.attribute
+        self.usage: Dict = {}
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        parts = []
+        async for delta in self.processor.rewrite_news_stream(
+            self.news_item['title'], self.news_item['content'], self.style, force=self.force, usage=self.usage
+        ):
+            parts.append(delta)
+            yield delta
+
+        self.text = ''.join(parts).strip()
+        self.post = await self.processor._finish_streamed_post(
+            self.news_item, self.text, self.style, self.force, self.usage
+        )
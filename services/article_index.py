@@ -0,0 +1,133 @@
+import hashlib
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from database.models import DatabaseModels
+
+logger = logging.getLogger(__name__)
+
+# Параметры ссылок, которые не меняют статью (метки рекламных кампаний и т.п.)
+TRACKING_PARAMS = {'fbclid', 'gclid', 'yclid', 'ysclid', 'from', 'ref', 'rss', 'utm'}
+
+
+def canonical_url(url: str) -> str:
+    """Каноническая форма URL: без www, фрагмента, меток и завершающего слеша"""
+    if not url:
+        return ''
+
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith('utm_') and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip('/') or '/'
+
+    # http и https считаем одной статьей: большинство сайтов перенаправляет на https
+    scheme = parts.scheme.lower()
+    if scheme in ('', 'http'):
+        scheme = 'https'
+
+    return urlunsplit((scheme, host, path, urlencode(query), ''))
+
+
+def title_hash(title: str) -> str:
+    """Хеш нормализованного заголовка"""
+    normalized = re.sub(r'[^\w\s]', '', (title or '').lower().replace('ё', 'е'))
+    normalized = re.sub(r'\s+', ' ', normalized).strip()
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+class ArticleIndex:
+    """Индекс уже обработанных статей: что получено, переписано и опубликовано по каналам"""
+
+    def __init__(self, db: DatabaseModels, retention_days: int = 14):
+        self.db = db
+        self.retention_days = retention_days
+
+    @staticmethod
+    def keys_for(item: Dict) -> Tuple[str, str]:
+        """(url_key, title_hash) новости или готового поста"""
+        if item.get('url_key') and item.get('title_hash'):
+            return item['url_key'], item['title_hash']
+
+        title = item.get('title') or item.get('original_title') or ''
+        digest = title_hash(title)
+        url = canonical_url(item.get('url') or item.get('source_url') or '')
+        return url or f"title:{digest}", digest
+
+    def attach_keys(self, items: List[Dict]) -> List[Dict]:
+        for item in items:
+            item['url_key'], item['title_hash'] = self.keys_for(item)
+        return items
+
+    async def lookup(self, items: List[Dict]) -> Dict[str, Dict]:
+        """Известные записи по url_key каждой новости (совпадение по URL или заголовку)"""
+        self.attach_keys(items)
+        rows = await self.db.get_article_states(
+            list({item['url_key'] for item in items}),
+            list({item['title_hash'] for item in items})
+        )
+
+        by_url = {row['url_key']: row for row in rows}
+        by_title = {row['title_hash']: row for row in rows}
+
+        known = {}
+        for item in items:
+            row = by_url.get(item['url_key']) or by_title.get(item['title_hash'])
+            if row:
+                known[item['url_key']] = row
+        return known
+
+    async def record_fetched(self, items: List[Dict]):
+        """Запомнить полученные статьи вместе с текстом"""
+        self.attach_keys(items)
+        await self.db.add_articles_bulk([
+            {
+                'url_key': item['url_key'],
+                'title_hash': item['title_hash'],
+                'title': item.get('title'),
+                'content': item.get('content'),
+                'source_id': item.get('source_id')
+            }
+            for item in items
+        ])
+
+    async def filter_unprocessed(self, items: List[Dict]) -> List[Dict]:
+        """Оставить только новости, которые еще не переписывались"""
+        if not items:
+            return []
+
+        known = await self.lookup(items)
+        fresh = [item for item in items if not (known.get(item['url_key']) or {}).get('rewritten_at')]
+
+        if len(fresh) < len(items):
+            logger.info(f"⏭️ Пропущено уже обработанных новостей: {len(items) - len(fresh)}")
+        return fresh
+
+    async def mark_rewritten(self, item: Dict):
+        url_key, digest = self.keys_for(item)
+        await self.db.mark_article_rewritten(url_key, digest, item.get('title') or item.get('original_title'))
+
+    async def mark_published(self, item: Dict, channel_id: str):
+        url_key, _ = self.keys_for(item)
+        await self.db.mark_article_published(url_key, channel_id)
+
+    async def published_channels(self, items: List[Dict]) -> Dict[str, set]:
+        """Каналы, где уже опубликована каждая новость (по url_key)"""
+        return await self.db.get_article_publications(
+            list({self.keys_for(item)[0] for item in items})
+        )
+
+    async def prune(self) -> int:
+        """Забыть статьи старше срока хранения"""
+        removed = await self.db.prune_articles(datetime.now() - timedelta(days=self.retention_days))
+        if removed:
+            logger.info(f"🧹 Удалено устаревших записей индекса статей: {removed}")
+        return removed
@@ -0,0 +1,147 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import openai
+
+from config import AI_BATCH_BASE_URL, AI_BATCH_READY_TTL_HOURS
+from services.token_budget import current_usage
+
+logger = logging.getLogger(__name__)
+
+# Статусы пакета, после которых он больше не меняется
+FINAL_STATUSES = {'completed', 'failed', 'expired', 'cancelled'}
+# Batch API вдвое дешевле обычных запросов
+BATCH_PRICE_FACTOR = 0.5
+# Поля новости, нужные для поста и индекса статей после получения результатов
+ITEM_FIELDS = ('title', 'content', 'url', 'category', 'source_id', 'url_key', 'title_hash')
+
+
+class BatchRewriter:
+    """Офлайн-переписывание через OpenAI Batch API
+
+    submit() отправляет новости одним JSONL-файлом, poll() опрашивает пакеты
+    и складывает прошедшие проверку посты в очередь ready_posts, откуда их
+    публикуют ежедневные задачи планировщика. Адрес API задается base_url
+    (AI_BATCH_BASE_URL) или готовым клиентом - например, для локальной заглушки.
+    По умолчанию используется клиент ai_processor с его пулом соединений.
+    """
+
+    def __init__(self, db, ai_processor, client: openai.AsyncOpenAI = None, base_url: str = AI_BATCH_BASE_URL,
+                 completion_window: str = '24h', ready_ttl_hours: int = AI_BATCH_READY_TTL_HOURS):
+        self.db = db
+        self.ai_processor = ai_processor
+        # Копия клиента ИИ с другим адресом и встроенными повторами: HTTP-пул общий
+        self.client = client or ai_processor.client.with_options(base_url=base_url, max_retries=2)
+        self.completion_window = completion_window
+        self.ready_ttl = timedelta(hours=ready_ttl_hours)
+
+    async def submit(self, news_items: List[Dict], style: str = "engaging") -> Optional[str]:
+        """Отправить новости пакетом; возвращает ID пакета"""
+        if not news_items:
+            return None
+        if self.ai_processor.ledger:
+            await self.ai_processor.ledger.check()
+
+        items = {f"item-{i}": {field: item.get(field) for field in ITEM_FIELDS} for i, item in enumerate(news_items)}
+        lines = [self.ai_processor.batch_request(custom_id, item, style) for custom_id, item in items.items()]
+        payload = "\n".join(json.dumps(line, ensure_ascii=False) for line in lines).encode('utf-8')
+
+        input_file = await self.client.files.create(file=('rewrites.jsonl', payload), purpose='batch')
+        batch = await self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint='/v1/chat/completions',
+            completion_window=self.completion_window,
+            metadata={'kind': 'rewrite', 'style': style}
+        )
+        await self.db.add_ai_batch(
+            batch.id, input_file.id, self.ai_processor.model, style,
+            json.dumps({'structured': self.ai_processor.structured_output, 'items': items}, ensure_ascii=False),
+            len(lines), batch.status
+        )
+        logger.info(f"📦 Пакет {batch.id} отправлен: {len(lines)} новостей")
+        return batch.id
+
+    async def poll(self) -> int:
+        """Проверить незавершенные пакеты; возвращает число постов, добавленных в очередь"""
+        queued = 0
+        for row in await self.db.get_open_ai_batches():
+            try:
+                batch = await self.client.batches.retrieve(row['batch_id'])
+            except openai.APIError as e:
+                logger.warning(f"⚠️ Пакет {row['batch_id']}: не удалось получить статус: {e}")
+                continue
+
+            if batch.status not in FINAL_STATUSES:
+                if batch.status != row['status']:
+                    await self.db.update_ai_batch(batch.id, batch.status)
+                continue
+
+            posts = []
+            if batch.status == 'completed' and batch.output_file_id:
+                output = await self.client.files.content(batch.output_file_id)
+                posts = await self._load_results(row, output.text)
+                await self.db.add_ready_posts(
+                    (batch.id, post.get('url_key'), json.dumps(post, ensure_ascii=False, default=str))
+                    for post in posts
+                )
+            else:
+                logger.warning(f"⚠️ Пакет {batch.id} завершился без результатов: {batch.status}")
+
+            await self.db.update_ai_batch(batch.id, batch.status, posts_count=len(posts), finished=True)
+            logger.info(f"📦 Пакет {batch.id}: готово постов {len(posts)} из {row['request_count']}")
+            queued += len(posts)
+        return queued
+
+    async def _load_results(self, row: Dict, output: str) -> List[Dict]:
+        """Посты из JSONL с результатами; расход токенов записывается со скидкой Batch API"""
+        meta = json.loads(row['items'])
+        items = meta['items']
+        ledger = self.ai_processor.ledger
+        posts = []
+
+        for line in output.splitlines():
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            news_item = items.get(result.get('custom_id'))
+            response = result.get('response') or {}
+            if not news_item or result.get('error') or response.get('status_code') != 200:
+                logger.warning(f"⚠️ Запрос {result.get('custom_id')} пакета не выполнен: {result.get('error')}")
+                continue
+
+            body = response.get('body') or {}
+            usage = {}
+            if ledger and body.get('usage'):
+                usage_token = current_usage.set(usage)
+                try:
+                    await ledger.record(
+                        body.get('model') or row['model'], body['usage'].get('prompt_tokens', 0),
+                        body['usage'].get('completion_tokens', 0), price_factor=BATCH_PRICE_FACTOR
+                    )
+                finally:
+                    current_usage.reset(usage_token)
+
+            post = self.ai_processor.post_from_batch_result(
+                news_item, row['style'], meta['structured'], body, usage, row['model']
+            )
+            if not post:
+                continue
+            post['url_key'] = news_item.get('url_key')
+            post['title_hash'] = news_item.get('title_hash')
+            # Статья отмечается переписанной только после публикации (ContentManager.publish_ready_posts)
+            posts.append(post)
+
+        return posts
+
+    async def take_ready(self, limit: int) -> List[tuple]:
+        """Готовые посты из очереди: (id, post)"""
+        rows = await self.db.get_ready_posts(limit, datetime.now() - self.ready_ttl)
+        return [(post_id, json.loads(post)) for post_id, post in rows]
+
+    async def ready_count(self) -> int:
+        return await self.db.get_ready_posts_count(datetime.now() - self.ready_ttl)
+
+    async def prune(self) -> int:
+        return await self.db.prune_ready_posts(datetime.now() - self.ready_ttl * 2)
@@ -1,19 +1,38 @@
 import asyncio
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 from aiogram import Bot
 from database.models import DatabaseModels
 from services.news_parser import NewsParser
 from services.ai_processor import AIProcessor
+from services.ai_cache import AIResponseCache
+from services.token_budget import TokenLedger
+from services.article_index import ArticleIndex
+from services.http_client import HttpClient
+from services.fetch_planner import FetchPlanner
+from services.story_dedup import StoryDeduplicator
+from services.news_pipeline import NewsPipeline
+from services.batch_rewriter import BatchRewriter
+from config import AI_BATCH_SIZE, PIPELINE_MAX_POSTS
 
 logger = logging.getLogger(__name__)
 
 
 class ContentManager:
-    def __init__(self, bot: Bot, db: DatabaseModels):
+    def __init__(self, bot: Bot, db: DatabaseModels, http_client: HttpClient = None):
         self.bot = bot
         self.db = db
-        self.ai_processor = AIProcessor()
+        self.http_client = http_client
+        self.article_index = ArticleIndex(db)
+        self.fetch_planner = FetchPlanner()
+        self.story_dedup = StoryDeduplicator(db)
+        # Метрики последнего прогона конвейера (для /status)
+        self.pipeline_stats: Optional[Dict] = None
+        self.token_ledger = TokenLedger(db)
+        self.ai_processor = AIProcessor(
+            article_index=self.article_index, cache=AIResponseCache(db), ledger=self.token_ledger
+        )
+        self.batch_rewriter = BatchRewriter(db, self.ai_processor)
 
     async def process_and_publish_news(self):
         """Обработка и публикация новостей с ИИ"""
@@ -34,53 +53,175 @@ class ContentManager:
                 logger.info("Нет активных источников новостей")
                 return
 
-            # Парсим новости
-            async with NewsParser() as parser:
-                all_news = await parser.get_news_from_sources(sources)
+            await self.article_index.prune()
+            sources = self.fetch_planner.due_sources(sources)
+            style = await self.db.get_setting("default_style") or "engaging"
 
-            if not all_news:
-                logger.info("Не удалось получить новости")
+            # Потоковый конвейер: пост публикуется, как только переписан, не дожидаясь остальных лент.
+            # Новости переписываются моделью большинства каналов, остальным - свой пересказ при публикации
+            channel_posts: Dict[str, int] = {}
+            async with NewsParser(article_index=self.article_index, http_client=self.http_client) as parser:
+                pipeline = NewsPipeline(
+                    parser, self.ai_processor, self.story_dedup,
+                    publish=lambda post: self._publish_to_channels(post, active_channels, channel_posts),
+                    style=style
+                )
+                with self.ai_processor.use_model(self.ai_processor.primary_model(active_channels)):
+                    self.pipeline_stats = await pipeline.run(sources, conditional=True)
+            parser.forget_validators(pipeline.cut_sources)
+            await self.db.update_sources_fetch_state(parser.feed_states)
+            await self.db.update_sources_schedule(self.fetch_planner.plan_all(sources, parser.feed_states))
+
+            if not pipeline.posts:
+                logger.info("Нет новых новостей для публикации")
                 return
 
-            logger.info(f"Получено {len(all_news)} новостей для ИИ обработки")
-
-            # Обрабатываем новости через ИИ
-            style = await self.db.get_setting("default_style") or "engaging"
-            processed_posts = await self.ai_processor.process_news_batch(
-                all_news, style, max_posts=3
+            logger.info(
+                f"Опубликовано {pipeline.published} постов в {len(active_channels)} каналов "
+                f"(переписано ИИ: {len(pipeline.posts)})"
             )
 
-            if not processed_posts:
-                logger.warning("ИИ не смог обработать ни одной новости")
+        except Exception as e:
+            logger.error(f"Ошибка в процессе обработки новостей: {str(e)}")
+
+    async def prepare_offline_batch(self):
+        """Собрать новости на завтра и отправить их на переписывание пакетом Batch API"""
+        try:
+            sources = await self.db.get_news_sources()
+            if not sources:
+                logger.info("Нет активных источников новостей")
                 return
 
-            logger.info(f"ИИ обработал {len(processed_posts)} постов")
+            await self.batch_rewriter.prune()
+            async with NewsParser(article_index=self.article_index, http_client=self.http_client,
+                                  story_dedup=self.story_dedup) as parser:
+                news = await parser.get_news_from_sources(sources)
 
-            # Публикуем в каналы
-            published_count = 0
-            for channel in active_channels:
-                for post in processed_posts[:channel['posts_per_day']]:
-                    success = await self._publish_post_to_channel(
-                        channel['channel_id'],
-                        post['content']
-                    )
-                    if success:
-                        published_count += 1
-                        # Сохраняем в БД
-                        await self._save_published_post(post, channel['channel_id'])
+            news = await self.article_index.filter_unprocessed(news)
+            await self.article_index.record_fetched(news)
+            # По одной новости на сюжет; отправленные сюжеты не попадут и в обычный конвейер
+            candidates = (await self.story_dedup.pick_representatives(news))[:AI_BATCH_SIZE]
+            if not candidates:
+                logger.info("📦 Нет новых новостей для пакета")
+                return
 
-                    # Пауза между публикациями
-                    await asyncio.sleep(2)
+            style = await self.db.get_setting("default_style") or "engaging"
+            await self.batch_rewriter.submit(candidates, style)
+            await self.story_dedup.add_covered(
+                candidates, key_func=lambda item: self.article_index.keys_for(item)[0]
+            )
 
-            logger.info(f"Опубликовано {published_count} постов в {len(active_channels)} каналов")
+        except Exception as e:
+            logger.error(f"Ошибка подготовки пакета: {str(e)}")
 
+    async def poll_ai_batches(self):
+        """Проверить пакеты Batch API и сложить готовые посты в очередь"""
+        try:
+            queued = await self.batch_rewriter.poll()
+            if queued:
+                logger.info(f"📦 В очередь публикации добавлено постов: {queued}")
         except Exception as e:
-            logger.error(f"Ошибка в процессе обработки новостей: {str(e)}")
+            logger.error(f"Ошибка опроса пакетов: {str(e)}")
+
+    async def publish_ready_posts(self):
+        """Публикация готовых постов из очереди пакетов; очередь пуста - обычная обработка новостей"""
+        try:
+            ready = await self.batch_rewriter.take_ready(PIPELINE_MAX_POSTS)
+            if not ready:
+                logger.info("📦 Очередь готовых постов пуста, переписываем новости сейчас")
+                await self.process_and_publish_news()
+                return
+
+            channels = await self.db.get_channels()
+            active_channels = [ch for ch in channels if ch['is_active']]
+            if not active_channels:
+                logger.info("Нет активных каналов для публикации")
+                return
 
-    async def _publish_post_to_channel(self, channel_id: str, content: str) -> bool:
-        """Публикация поста в канал"""
+            channel_posts: Dict[str, int] = {}
+            active_ids = {channel['channel_id'] for channel in active_channels}
+            published = 0
+            for post_id, post in ready:
+                count = await self._publish_to_channels(post, active_channels, channel_posts)
+                published += count
+                if count:
+                    await self.article_index.mark_rewritten(post)
+                # С очереди снимается пост, который вышел или уже есть во всех каналах;
+                # иначе (ошибки Telegram, лимиты каналов) он ждет следующей публикации до истечения TTL
+                url_key, _ = self.article_index.keys_for(post)
+                if count or active_ids <= set((await self.article_index.published_channels([post])).get(url_key, ())):
+                    await self.db.mark_ready_post_published(post_id)
+
+            logger.info(f"Опубликовано {published} готовых постов из очереди ({len(ready)} взято)")
+
+        except Exception as e:
+            logger.error(f"Ошибка публикации из очереди: {str(e)}")
+
+    async def _publish_to_channels(self, post: Dict, channels: List[Dict], channel_posts: Dict[str, int]) -> int:
+        """Публикация поста во все каналы, где не исчерпан лимит постов; возвращает число публикаций
+
+        Каналы, которым настроена другая модель, получают пересказ этой новости их моделью.
+        """
+        url_key, _ = self.article_index.keys_for(post)
+        already_published = (await self.article_index.published_channels([post])).get(url_key, ())
+        due_channels = [
+            channel for channel in channels
+            if channel['channel_id'] not in already_published
+            and channel_posts.get(channel['channel_id'], 0) < channel['posts_per_day']
+        ]
+
+        published = 0
+        for model, group in self.ai_processor.group_channels(due_channels).items():
+            group_post = post if model == post.get('model', model) else await self._rewrite_for_model(post, model)
+            if group_post:
+                published += await self._publish_post(group_post, group, channel_posts)
+        return published
+
+    async def _rewrite_for_model(self, post: Dict, model: str) -> Optional[Dict]:
+        """Пересказ новости поста другой моделью (для каналов с отдельной моделью)"""
+        news_item = {
+            'title': post['original_title'],
+            'content': post['original_content'],
+            'url': post.get('source_url'),
+            'category': post.get('category', 'общее'),
+            'source_id': post.get('source_id')
+        }
+        news_item['url_key'], news_item['title_hash'] = self.article_index.keys_for(post)
+
+        with self.ai_processor.use_model(model):
+            variant = await self.ai_processor.create_post(news_item, post.get('style', 'engaging'))
+        if variant:
+            # Публикации варианта отмечаются в индексе под той же новостью
+            variant['url_key'], variant['title_hash'] = news_item['url_key'], news_item['title_hash']
+        else:
+            logger.warning(f"Не удалось переписать новость моделью {model}: {post['original_title'][:50]}...")
+        return variant
+
+    async def _publish_post(self, post: Dict, channels: List[Dict], channel_posts: Dict[str, int]) -> int:
+        """Публикация готового поста в каналы; расход токенов поста записывается на них"""
+        published_channels = []
+
+        for channel in channels:
+            channel_id = channel['channel_id']
+            message_id = await self._publish_post_to_channel(channel_id, post['content'])
+            if message_id:
+                published_channels.append(channel_id)
+                channel_posts[channel_id] = channel_posts.get(channel_id, 0) + 1
+                # Сохраняем в БД
+                await self._save_published_post(post, channel_id, message_id)
+                await self.article_index.mark_published(post, channel_id)
+
+            # Пауза между публикациями
+            await asyncio.sleep(2)
+
+        # Токены, потраченные на пост, записываются на каналы, где он вышел
+        await self.token_ledger.attribute(post.get('usage'), published_channels)
+        return len(published_channels)
+
+    async def _publish_post_to_channel(self, channel_id: str, content: str) -> Optional[int]:
+        """Публикация поста в канал; возвращает ID сообщения или None"""
         try:
-            await self.bot.send_message(
+            message = await self.bot.send_message(
                 chat_id=channel_id,
                 text=content,
                 parse_mode="HTML",
@@ -88,17 +229,25 @@ class ContentManager:
             )
 
             logger.info(f"Пост опубликован в канал {channel_id}")
-            return True
+            return message.message_id
 
         except Exception as e:
             logger.error(f"Ошибка публикации в канал {channel_id}: {str(e)}")
-            return False
+            return None
 
-    async def _save_published_post(self, post: Dict, channel_id: str):
+    async def _save_published_post(self, post: Dict, channel_id: str, message_id: int):
         """Сохранение опубликованного поста в БД"""
         try:
-            # Здесь можно сохранить информацию о посте
-            # Пока что просто логируем
+            await self.db.add_published_post(
+                channel_id,
+                str(message_id),
+                post['content'],
+                original_title=post.get('original_title'),
+                source_url=post.get('source_url'),
+                category=post.get('category', 'общее'),
+                style=post.get('style')
+            )
+            await self.db.update_last_post_time(channel_id)
             logger.info(f"Сохранен пост в БД для канала {channel_id}")
         except Exception as e:
             logger.error(f"Ошибка сохранения поста: {str(e)}")
@@ -117,7 +266,7 @@ class ContentManager:
 
             # Получаем тестовую новость
             sources = await self.db.get_news_sources()
-            async with NewsParser() as parser:
+            async with NewsParser(http_client=self.http_client, story_dedup=self.story_dedup) as parser:
                 news = await parser.get_news_from_sources(sources)
 
             if not news:
@@ -154,7 +303,7 @@ class ContentManager:
         try:
             sources = await self.db.get_news_sources()
 
-            async with NewsParser() as parser:
+            async with NewsParser(http_client=self.http_client, story_dedup=self.story_dedup) as parser:
                 news = await parser.get_news_from_sources(sources)
 
             return news[:limit]
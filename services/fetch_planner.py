@@ -0,0 +1,93 @@
+import logging
+import random
+from datetime import datetime, timedelta
+from statistics import median
+from typing import Dict, List, Optional
+
+from config import POLL_MIN_INTERVAL, POLL_MAX_INTERVAL, POLL_DEFAULT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class FetchPlanner:
+    """Планировщик опроса источников: интервал подстраивается под частоту публикаций ленты"""
+
+    # Сколько последних записей ленты учитывать при оценке частоты
+    CADENCE_WINDOW = 20
+    # Вес новой оценки при сглаживании интервала
+    SMOOTHING = 0.5
+    # Случайный разброс, чтобы источники не опрашивались одной пачкой
+    JITTER = 0.1
+
+    def __init__(self, min_interval: int = POLL_MIN_INTERVAL, max_interval: int = POLL_MAX_INTERVAL,
+                 default_interval: int = POLL_DEFAULT_INTERVAL):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+
+    def is_due(self, source: Dict, now: datetime = None) -> bool:
+        next_fetch_at = source.get('next_fetch_at')
+        if not next_fetch_at:
+            return True
+        if isinstance(next_fetch_at, str):
+            next_fetch_at = datetime.fromisoformat(next_fetch_at)
+        return next_fetch_at <= (now or datetime.now())
+
+    def due_sources(self, sources: List[Dict], now: datetime = None) -> List[Dict]:
+        """Источники, которым пора обновиться"""
+        now = now or datetime.now()
+        due = [source for source in sources if self.is_due(source, now)]
+        if len(due) < len(sources):
+            logger.info(f"⏳ К опросу источников: {len(due)} из {len(sources)}")
+        return due
+
+    def estimate_interval(self, item_times: List[datetime]) -> Optional[float]:
+        """Медианный промежуток между публикациями ленты в секундах"""
+        times = sorted(item_times, reverse=True)[:self.CADENCE_WINDOW]
+        gaps = [
+            (newer - older).total_seconds()
+            for newer, older in zip(times, times[1:])
+            if newer > older
+        ]
+        return median(gaps) if gaps else None
+
+    def _clamp(self, interval: float) -> int:
+        return int(min(self.max_interval, max(self.min_interval, interval)))
+
+    def plan(self, source: Dict, state: Dict, now: datetime = None) -> Dict:
+        """Новый интервал и время следующего опроса по результату запроса ленты"""
+        now = now or datetime.now()
+        interval = source.get('poll_interval') or self.default_interval
+        error_count = source.get('error_count') or 0
+
+        wait = interval
+        if state.get('error'):
+            # Экспоненциальная пауза при ошибках подряд; выученный интервал не трогаем
+            error_count += 1
+            wait = self._clamp(interval * 2 ** min(error_count, 10))
+        elif state.get('not_modified'):
+            # Лента не менялась - опрашиваем реже
+            error_count = 0
+            interval = wait = self._clamp(interval * 2)
+        else:
+            error_count = 0
+            estimate = self.estimate_interval(state.get('item_times') or [])
+            if estimate is not None:
+                interval = self._clamp(interval * (1 - self.SMOOTHING) + estimate * self.SMOOTHING)
+            wait = interval
+
+        delay = wait * random.uniform(1 - self.JITTER, 1 + self.JITTER)
+        return {
+            'poll_interval': interval,
+            'error_count': error_count,
+            'next_fetch_at': now + timedelta(seconds=delay)
+        }
+
+    def plan_all(self, sources: List[Dict], feed_states: Dict[int, Dict], now: datetime = None) -> Dict[int, Dict]:
+        """Планы для всех опрошенных источников (source_id -> план)"""
+        by_id = {source['id']: source for source in sources}
+        return {
+            source_id: self.plan(by_id[source_id], state, now)
+            for source_id, state in feed_states.items()
+            if source_id in by_id
+        }
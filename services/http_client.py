@@ -0,0 +1,90 @@
+import logging
+from typing import Dict, Optional
+
+import aiohttp
+
+from config import USER_AGENT, REQUEST_TIMEOUT, HTTP_POOL_LIMIT, HTTP_POOL_LIMIT_PER_HOST, HTTP_DNS_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """Общая HTTP-сессия бота: keep-alive, кэш DNS и лимиты соединений на хост"""
+
+    def __init__(self, limit: int = HTTP_POOL_LIMIT, limit_per_host: int = HTTP_POOL_LIMIT_PER_HOST,
+                 dns_cache_ttl: int = HTTP_DNS_CACHE_TTL, keepalive_timeout: float = 30.0):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.dns_cache_ttl = dns_cache_ttl
+        self.keepalive_timeout = keepalive_timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+        self.stats = {
+            'requests': 0,
+            'connections_created': 0,
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0
+        }
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            raise RuntimeError("HTTP клиент не запущен")
+        return self._session
+
+    @property
+    def is_open(self) -> bool:
+        return self._session is not None and not self._session.closed
+
+    async def start(self):
+        """Создать сессию (нужен запущенный event loop)"""
+        if self.is_open:
+            return
+
+        connector = aiohttp.TCPConnector(
+            limit=self.limit,
+            limit_per_host=self.limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=self.dns_cache_ttl,
+            keepalive_timeout=self.keepalive_timeout
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            headers={
+                'User-Agent': USER_AGENT,
+                'Accept': 'application/rss+xml, application/xml, text/xml, */*',
+                'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8'
+            },
+            trace_configs=[self._trace_config()]
+        )
+        logger.info(f"🌐 HTTP клиент запущен: до {self.limit} соединений, {self.limit_per_host} на хост")
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        """Счетчики запросов, новых/повторно использованных соединений и кэша DNS"""
+        trace_config = aiohttp.TraceConfig()
+
+        def counter(key):
+            async def handler(session, context, params):
+                self.stats[key] += 1
+            return handler
+
+        trace_config.on_request_start.append(counter('requests'))
+        trace_config.on_connection_create_end.append(counter('connections_created'))
+        trace_config.on_connection_reuseconn.append(counter('connections_reused'))
+        trace_config.on_dns_cache_hit.append(counter('dns_cache_hits'))
+        trace_config.on_dns_cache_miss.append(counter('dns_cache_misses'))
+        return trace_config
+
+    def get_stats(self) -> Dict:
+        connections = self.stats['connections_created'] + self.stats['connections_reused']
+        return {
+            **self.stats,
+            'reuse_rate': round(self.stats['connections_reused'] / connections * 100, 1) if connections else 0.0
+        }
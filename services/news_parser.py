@@ -1,140 +1,518 @@
-import aiohttp
 import feedparser
 import asyncio
 from bs4 import BeautifulSoup
-from typing import List, Dict, Optional
+import lxml.html
+from lxml import etree
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 import logging
 import re
-from config import USER_AGENT, REQUEST_TIMEOUT, MAX_NEWS_PER_SOURCE
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from config import (
+    MAX_NEWS_PER_SOURCE, MAX_CONCURRENT_FETCHES, MAX_FETCHES_PER_HOST, ARTICLE_FETCH_TIMEOUT,
+    FEED_MAX_BYTES, ARTICLE_MAX_BYTES, ARTICLE_ENOUGH_BYTES
+)
+from services.http_client import HttpClient
+from services.parse_executor import ParseExecutor, get_parse_executor
+from services.story_dedup import StoryDeduplicator
 
 logger = logging.getLogger(__name__)
 
+# Служебные хвосты: один общий шаблон вместо пяти re.sub подряд
+CLEANUP_RE = re.compile(
+    r'Читайте также:.*|Подписывайтесь.*|Следите за новостями.*|© \d{4}.*|Источник:.*',
+    re.IGNORECASE | re.DOTALL
+)
+WHITESPACE_RE = re.compile(r'\s+')
+
+# Элементы страницы, которые не относятся к тексту статьи
+NOISE_TAGS = ('script', 'style', 'nav', 'header', 'footer', 'aside', 'iframe')
+
+# Селекторы основного контента в порядке приоритета (как в CSS-версии), скомпилированные в XPath
+_CLASS_TEST = "contains(concat(' ', normalize-space(@class), ' '), ' {} ')"
+CONTENT_XPATHS = [
+    etree.XPath(expression) for expression in [
+        '//article',
+        *(f'//*[{_CLASS_TEST.format(name)}]' for name in (
+            'article-content', 'article-body', 'article-text',
+            'content', 'post-content', 'entry-content',
+            'text', 'story-text', 'news-text'
+        )),
+        f"//main//*[{_CLASS_TEST.format('text')}]",
+        '//main//p'
+    ]
+]
+PARAGRAPH_XPATH = etree.XPath('//p')
+
+# Допустимые типы ответов для лент и страниц статей
+MARKUP_CONTENT_TYPES = ('html', 'xml', 'rss', 'atom')
+READ_CHUNK_SIZE = 64 * 1024
+META_CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.IGNORECASE)
+
+# Функции разбора ниже выполняются в пуле воркеров (ParseExecutor), поэтому
+# они на уровне модуля и не трогают состояние NewsParser
+
+
+def _finish_text(text: str) -> str:
+    text = WHITESPACE_RE.sub(' ', text).strip()
+    return CLEANUP_RE.sub('', text).strip()
+
+
+def _element_text(element) -> str:
+    """Текст элемента как get_text(strip=True): фрагменты без пробелов между ними"""
+    return ''.join(part.strip() for part in element.itertext())
+
+
+def clean_text(text: str) -> str:
+    """Очистка текста"""
+    if not text:
+        return ""
+
+    # Разбор HTML нужен, только если в тексте есть разметка или сущности
+    if '<' in text or '&' in text:
+        try:
+            fragment = lxml.html.fragment_fromstring(text, create_parent='div')
+        except (etree.ParserError, ValueError):
+            return clean_text_bs4(text)
+        # Как и BeautifulSoup.get_text, не берем содержимое скриптов и стилей
+        etree.strip_elements(fragment, 'script', 'style', with_tail=False)
+        text = fragment.text_content()
+
+    return _finish_text(text)
+
+
+def parse_entry_date(entry) -> Optional[datetime]:
+    """Парсинг даты публикации"""
+    date_fields = ['published', 'updated', 'pubDate']
+
+    for field in date_fields:
+        if hasattr(entry, field):
+            date_str = getattr(entry, field, None)
+            if date_str:
+                try:
+                    # feedparser автоматически парсит даты
+                    if hasattr(entry, f'{field}_parsed') and getattr(entry, f'{field}_parsed'):
+                        parsed_time = getattr(entry, f'{field}_parsed')
+                        return datetime.fromtimestamp(time.mktime(parsed_time))
+                except:
+                    pass
+
+    return None
+
+
+def parse_feed_entries(content: str) -> Tuple[int, List[Dict], List[datetime]]:
+    """Разбор RSS: (число записей, свежие записи с очищенными полями, даты всех записей)"""
+    feed = feedparser.parse(content)
+    candidates = []
+    item_times = []
+
+    for entry in feed.entries:
+        # Парсим дату публикации
+        pub_date = parse_entry_date(entry)
+        if pub_date:
+            item_times.append(pub_date)
+
+        # Проверяем актуальность (не старше 24 часов)
+        if pub_date and (datetime.now() - pub_date).days > 1:
+            continue
+
+        title = clean_text(entry.get('title', ''))
+        description = clean_text(entry.get('description', ''))
+        link = entry.get('link', '')
+
+        if not title or len(title) < 10:
+            continue
+
+        candidates.append({
+            'title': title,
+            'description': description,
+            'url': link,
+            'published_date': pub_date
+        })
+
+    return len(feed.entries), candidates, item_times
+
+
+def decode_html(body: bytes, charset: Optional[str] = None) -> str:
+    """Декодирование HTML: кодировка из заголовков, затем из <meta charset>, иначе UTF-8"""
+    if not charset:
+        match = META_CHARSET_RE.search(body[:4096])
+        charset = match.group(1).decode('ascii') if match else 'utf-8'
+    try:
+        return body.decode(charset, errors='replace')
+    except LookupError:
+        return body.decode('utf-8', errors='replace')
+
+
+def extract_article_text(html: str) -> Optional[str]:
+    """Извлечение основного текста статьи из HTML"""
+    try:
+        tree = lxml.html.document_fromstring(html)
+    except (etree.ParserError, ValueError):
+        # Например, XHTML с объявлением кодировки в строке
+        return extract_article_text_bs4(html)
+
+    # Удаляем ненужные элементы (текст после них остается, как при decompose)
+    etree.strip_elements(tree, etree.Comment, *NOISE_TAGS, with_tail=False)
+
+    content = None
+    for xpath in CONTENT_XPATHS:
+        elements = xpath(tree)
+        if elements:
+            content = ' '.join([_element_text(el) for el in elements])
+            break
+
+    if not content:
+        # Если не нашли по селекторам, берем все параграфы
+        texts = [_element_text(p) for p in PARAGRAPH_XPATH(tree)]
+        content = ' '.join([text for text in texts if len(text) > 50])
+
+    return _truncate_article(_finish_text(content or ''))
+
+
+def _truncate_article(content: str) -> Optional[str]:
+    if not content:
+        return None
+    # Ограничиваем длину
+    if len(content) > 2000:
+        content = content[:2000] + "..."
+    return content
+
+
+# Реализации на BeautifulSoup: запасной путь и эталон для tools/bench_extract.py
+
+def clean_text_bs4(text: str) -> str:
+    """Очистка текста через BeautifulSoup"""
+    if not text:
+        return ""
+
+    # Удаляем HTML теги
+    soup = BeautifulSoup(text, 'html.parser')
+    text = soup.get_text()
+
+    # Убираем лишние пробелы и переносы
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip()
+
+    # Убираем служебную информацию
+    patterns_to_remove = [
+        r'Читайте также:.*',
+        r'Подписывайтесь.*',
+        r'Следите за новостями.*',
+        r'© \d{4}.*',
+        r'Источник:.*'
+    ]
+
+    for pattern in patterns_to_remove:
+        text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
+
+    return text.strip()
+
+
+def extract_article_text_bs4(html: str) -> Optional[str]:
+    """Извлечение текста статьи через BeautifulSoup"""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Удаляем ненужные элементы
+    for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'iframe']):
+        element.decompose()
+
+    # Ищем основной контент
+    content_selectors = [
+        'article',
+        '.article-content', '.article-body', '.article-text',
+        '.content', '.post-content', '.entry-content',
+        '.text', '.story-text', '.news-text',
+        'main .text', 'main p'
+    ]
+
+    content = None
+    for selector in content_selectors:
+        elements = soup.select(selector)
+        if elements:
+            content = ' '.join([el.get_text(strip=True) for el in elements])
+            break
+
+    if not content:
+        # Если не нашли по селекторам, берем все параграфы
+        paragraphs = soup.find_all('p')
+        content = ' '.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50])
+
+    if content:
+        content = clean_text_bs4(content)
+        # Ограничиваем длину
+        if len(content) > 2000:
+            content = content[:2000] + "..."
+
+        return content
+
+    return None
+
 
 class NewsParser:
-    def __init__(self):
+    def __init__(self, article_index=None, parse_executor: ParseExecutor = None,
+                 http_client: HttpClient = None, story_dedup: StoryDeduplicator = None):
         self.session = None
+        # Общий HTTP клиент бота; без него парсер открывает и закрывает свой
+        self.http_client = http_client
+        self._owns_client = http_client is None
+        # Пул для разбора RSS и HTML (по умолчанию общий, см. PARSE_EXECUTOR)
+        self.parse_executor = parse_executor or get_parse_executor()
+        # ArticleIndex: пропуск уже обработанных статей и повторное использование текста
+        self.article_index = article_index
+        # Склейка почти одинаковых новостей разных источников в get_news_from_sources
+        self.story_dedup = story_dedup or StoryDeduplicator()
+
+        # Ограничения параллельной загрузки статей: общее и на каждый хост
+        self._fetch_semaphore = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+        # source_id -> {'not_modified', 'etag', 'last_modified'} после условных запросов
+        self.feed_states: Dict[int, Dict] = {}
 
     async def __aenter__(self):
-        timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
-        self.session = aiohttp.ClientSession(
-            timeout=timeout,
-            headers={
-                'User-Agent': USER_AGENT,
-                'Accept': 'application/rss+xml, application/xml, text/xml, */*',
-                'Accept-Language': 'ru-RU,ru;q=0.9,en;q=0.8'
-            }
-        )
+        if self._owns_client:
+            self.http_client = HttpClient()
+        await self.http_client.start()
+        self.session = self.http_client.session
         return self
 
     async def __aexit__(self, exc_type, exc_val, exc_tb):
-        if self.session:
-            await self.session.close()
+        if self._owns_client and self.http_client:
+            await self.http_client.close()
+        self.session = None
 
-    async def parse_rss_feed(self, url: str, source_name: str) -> List[Dict]:
-        """Парсинг RSS ленты"""
-        try:
-            logger.info(f"Парсинг RSS: {source_name} ({url})")
+    async def parse_rss_feed(self, url: str, source_name: str, source_id: int = None,
+                             fetch_full_text: bool = True, etag: str = None,
+                             last_modified: str = None) -> List[Dict]:
+        """Парсинг RSS ленты (условный запрос, если переданы etag/last_modified)"""
+        pending, known = await self.fetch_feed(url, source_name, source_id, etag, last_modified)
 
-            async with self.session.get(url) as response:
-                if response.status != 200:
-                    logger.error(f"HTTP {response.status} для {url}")
-                    return []
+        news_items = []
+        fetched_items = []
+        try:
+            while pending and len(news_items) < MAX_NEWS_PER_SOURCE:
+                # Загружаем столько статей, сколько не хватает до лимита, параллельно
+                wave = pending[:MAX_NEWS_PER_SOURCE - len(news_items)]
+                pending = pending[len(wave):]
+                results = await asyncio.gather(*[
+                    self.build_item(candidate, known.get(candidate.get('url_key')), source_name,
+                                    source_id, fetch_full_text)
+                    for candidate in wave
+                ])
+
+                for candidate, news_item in zip(wave, results):
+                    if not news_item:
+                        continue
+                    if self.article_index and not known.get(candidate.get('url_key')):
+                        fetched_items.append(news_item)
+                    news_items.append(news_item)
 
-                content = await response.text()
-                feed = feedparser.parse(content)
+            if fetched_items:
+                await self.article_index.record_fetched(fetched_items)
 
-                if not feed.entries:
-                    logger.warning(f"Нет записей в RSS {source_name}")
-                    return []
+        except Exception as e:
+            logger.error(f"Ошибка загрузки статей {url}: {str(e)}")
 
-                news_items = []
-                count = 0
+        if pending or news_items:
+            logger.info(f"Получено {len(news_items)} новостей из {source_name}")
+        return news_items
 
-                for entry in feed.entries:
-                    if count >= MAX_NEWS_PER_SOURCE:
-                        break
+    async def fetch_feed(self, url: str, source_name: str, source_id: int = None,
+                         etag: str = None, last_modified: str = None) -> Tuple[List[Dict], Dict[str, Dict]]:
+        """Загрузка и разбор ленты: записи без уже переписанных статей и известные статьи (url_key -> состояние)"""
+        try:
+            logger.info(f"Парсинг RSS: {source_name} ({url})")
 
-                    # Парсим дату публикации
-                    pub_date = self._parse_date(entry)
+            headers = {}
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
 
-                    # Проверяем актуальность (не старше 24 часов)
-                    if pub_date and (datetime.now() - pub_date).days > 1:
-                        continue
+            async with self.session.get(url, headers=headers) as response:
+                if response.status == 304:
+                    logger.info(f"📭 {source_name}: лента не изменилась (304)")
+                    self._remember_feed_state(source_id, True, etag, last_modified)
+                    return [], {}
 
-                    title = self._clean_text(entry.get('title', ''))
-                    description = self._clean_text(entry.get('description', ''))
-                    link = entry.get('link', '')
+                if response.status != 200:
+                    logger.error(f"HTTP {response.status} для {url}")
+                    self._remember_feed_state(source_id, False, etag, last_modified, error=True)
+                    return [], {}
+
+                if not self._is_markup_response(response):
+                    logger.warning(f"⚠️ {source_name}: неподходящий Content-Type {response.content_type}")
+                    self._remember_feed_state(source_id, False, etag, last_modified, error=True)
+                    return [], {}
+
+                # Байты отдаем feedparser как есть: кодировку он определит по XML-объявлению
+                content = await self._read_limited(response, FEED_MAX_BYTES)
+                new_etag = response.headers.get('ETag')
+                new_last_modified = response.headers.get('Last-Modified')
+
+            # Разбор ленты - в пуле воркеров, чтобы не блокировать event loop
+            entries_count, candidates, item_times = await self.parse_executor.run(parse_feed_entries, content)
+
+            if not entries_count:
+                logger.warning(f"Нет записей в RSS {source_name}")
+                self._remember_feed_state(source_id, False, new_etag, new_last_modified)
+                return [], {}
+
+            # Уже известные статьи проверяем до сетевых запросов
+            known = await self.article_index.lookup(candidates) if self.article_index else {}
+            pending = [
+                candidate for candidate in candidates
+                if not (known.get(candidate.get('url_key')) or {}).get('rewritten_at')
+            ]
 
-                    if not title or len(title) < 10:
-                        continue
+            # Валидаторы запоминаем только после успешного разбора ленты
+            self._remember_feed_state(source_id, False, new_etag, new_last_modified, item_times=item_times)
+            return pending, known
 
-                    # Получаем полный текст статьи
-                    full_content = await self._get_full_article(link)
-                    content = full_content if full_content else description
+        except Exception as e:
+            logger.error(f"Ошибка парсинга RSS {url}: {str(e)}")
+            self._remember_feed_state(source_id, False, etag, last_modified, error=True)
+            return [], {}
+
+    async def build_item(self, candidate: Dict, state: Optional[Dict], source_name: str,
+                         source_id: int = None, fetch_full_text: bool = True) -> Optional[Dict]:
+        """Новость из записи ленты (с загрузкой полного текста); None, если текста слишком мало"""
+        content = await self._candidate_content(candidate, state, fetch_full_text)
+        news_item = self._build_news_item(candidate, content, source_name)
+        if not news_item:
+            return None
+
+        news_item['source_id'] = source_id
+        if self.article_index:
+            news_item['url_key'] = candidate['url_key']
+            news_item['title_hash'] = candidate['title_hash']
+        return news_item
+
+    @staticmethod
+    def _is_markup_response(response) -> bool:
+        """Проверка Content-Type до чтения тела: только HTML/XML (или тип не указан)"""
+        content_type = response.headers.get('Content-Type')
+        if not content_type:
+            return True
+        return any(marker in response.content_type for marker in MARKUP_CONTENT_TYPES)
+
+    @staticmethod
+    async def _read_limited(response, max_bytes: int, section: Tuple[bytes, bytes] = None,
+                            enough_bytes: int = 0) -> bytes:
+        """Потоковое чтение не больше max_bytes; с section - до закрытия блока длиной от enough_bytes"""
+        body = bytearray()
+        section_start = -1
+
+        async for chunk in response.content.iter_chunked(READ_CHUNK_SIZE):
+            # Небольшое перекрытие, чтобы не пропустить тег на стыке чанков
+            scan_from = max(0, len(body) - 16)
+            body.extend(chunk)
+            if len(body) >= max_bytes:
+                break
+
+            if section:
+                opening, closing = section
+                if section_start < 0:
+                    section_start = body.find(opening, scan_from)
+                if section_start >= 0:
+                    section_end = body.rfind(closing, max(scan_from, section_start))
+                    if section_end - section_start >= enough_bytes:
+                        break
 
-                    if content and len(content) > 100:
-                        news_item = {
-                            'title': title,
-                            'content': content,
-                            'url': link,
-                            'source': source_name,
-                            'published_date': pub_date or datetime.now(),
-                            'category': self._categorize_news(title + ' ' + content)
-                        }
+        return bytes(body[:max_bytes])
+
+    def _remember_feed_state(self, source_id: Optional[int], not_modified: bool,
+                             etag: Optional[str], last_modified: Optional[str],
+                             error: bool = False, item_times: List[datetime] = None):
+        if source_id is None:
+            return
+        self.feed_states[source_id] = {
+            'not_modified': not_modified,
+            'etag': etag,
+            'last_modified': last_modified,
+            'error': error,
+            'item_times': item_times or []
+        }
 
-                        news_items.append(news_item)
-                        count += 1
+    def forget_validators(self, source_ids):
+        """Не сохранять ETag/Last-Modified лент, новости которых обработаны не все
+
+        Иначе следующий условный запрос получит 304 и необработанные новости больше не увидит.
+        """
+        for source_id in source_ids:
+            state = self.feed_states.get(source_id)
+            if state and not state['not_modified']:
+                state['etag'] = state['last_modified'] = None
+
+    async def _candidate_content(self, candidate: Dict, state: Optional[Dict], fetch_full_text: bool) -> str:
+        """Текст новости: сохраненный, полный текст статьи или описание из RSS"""
+        if state and state['content']:
+            return state['content']
+
+        if fetch_full_text:
+            full_content = await self._get_full_article(candidate['url'])
+            if full_content:
+                return full_content
+
+        return candidate['description']
+
+    def _build_news_item(self, candidate: Dict, content: str, source_name: str) -> Optional[Dict]:
+        if not content or len(content) <= 100:
+            return None
+
+        title = candidate['title']
+        return {
+            'title': title,
+            'content': content,
+            'url': candidate['url'],
+            'source': source_name,
+            'published_date': candidate['published_date'] or datetime.now(),
+            'category': self._categorize_news(title + ' ' + content)
+        }
 
-                logger.info(f"Получено {len(news_items)} новостей из {source_name}")
-                return news_items
+    @asynccontextmanager
+    async def _fetch_slot(self, url: str):
+        """Слот загрузки: общий лимит и лимит на хост"""
+        host = urlsplit(url).netloc.lower()
+        host_semaphore = self._host_semaphores.get(host)
+        if host_semaphore is None:
+            host_semaphore = self._host_semaphores[host] = asyncio.Semaphore(MAX_FETCHES_PER_HOST)
 
-        except Exception as e:
-            logger.error(f"Ошибка парсинга RSS {url}: {str(e)}")
-            return []
+        async with host_semaphore:
+            async with self._fetch_semaphore:
+                yield
 
     async def _get_full_article(self, url: str) -> Optional[str]:
         """Получение полного текста статьи"""
+        if not url:
+            return None
+
+        try:
+            async with self._fetch_slot(url):
+                return await asyncio.wait_for(self._download_article(url), ARTICLE_FETCH_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.debug(f"Превышено время загрузки статьи {url}")
+            return None
+
+    async def _download_article(self, url: str) -> Optional[str]:
+        """Загрузка и извлечение текста статьи"""
         try:
             async with self.session.get(url) as response:
                 if response.status != 200:
                     return None
 
-                html = await response.text()
-                soup = BeautifulSoup(html, 'html.parser')
-
-                # Удаляем ненужные элементы
-                for element in soup(['script', 'style', 'nav', 'header', 'footer', 'aside', 'iframe']):
-                    element.decompose()
-
-                # Ищем основной контент
-                content_selectors = [
-                    'article',
-                    '.article-content', '.article-body', '.article-text',
-                    '.content', '.post-content', '.entry-content',
-                    '.text', '.story-text', '.news-text',
-                    'main .text', 'main p'
-                ]
-
-                content = None
-                for selector in content_selectors:
-                    elements = soup.select(selector)
-                    if elements:
-                        content = ' '.join([el.get_text(strip=True) for el in elements])
-                        break
-
-                if not content:
-                    # Если не нашли по селекторам, берем все параграфы
-                    paragraphs = soup.find_all('p')
-                    content = ' '.join([p.get_text(strip=True) for p in paragraphs if len(p.get_text(strip=True)) > 50])
-
-                if content:
-                    content = self._clean_text(content)
-                    # Ограничиваем длину
-                    if len(content) > 2000:
-                        content = content[:2000] + "..."
+                if not self._is_markup_response(response):
+                    return None
 
-                    return content
+                # Дальше первого достаточно длинного <article> страницу не читаем
+                body = await self._read_limited(
+                    response, ARTICLE_MAX_BYTES, (b'<article', b'</article>'), ARTICLE_ENOUGH_BYTES
+                )
+                html = decode_html(body, response.charset)
+                return await self.parse_executor.run(extract_article_text, html)
 
         except Exception as e:
             logger.debug(f"Ошибка получения полного текста {url}: {str(e)}")
@@ -143,49 +521,11 @@ class NewsParser:
 
     def _clean_text(self, text: str) -> str:
         """Очистка текста"""
-        if not text:
-            return ""
-
-        # Удаляем HTML теги
-        soup = BeautifulSoup(text, 'html.parser')
-        text = soup.get_text()
-
-        # Убираем лишние пробелы и переносы
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
-
-        # Убираем служебную информацию
-        patterns_to_remove = [
-            r'Читайте также:.*',
-            r'Подписывайтесь.*',
-            r'Следите за новостями.*',
-            r'© \d{4}.*',
-            r'Источник:.*'
-        ]
-
-        for pattern in patterns_to_remove:
-            text = re.sub(pattern, '', text, flags=re.IGNORECASE | re.DOTALL)
-
-        return text.strip()
+        return clean_text(text)
 
     def _parse_date(self, entry) -> Optional[datetime]:
         """Парсинг даты публикации"""
-        date_fields = ['published', 'updated', 'pubDate']
-
-        for field in date_fields:
-            if hasattr(entry, field):
-                date_str = getattr(entry, field, None)
-                if date_str:
-                    try:
-                        # feedparser автоматически парсит даты
-                        if hasattr(entry, f'{field}_parsed') and getattr(entry, f'{field}_parsed'):
-                            import time
-                            parsed_time = getattr(entry, f'{field}_parsed')
-                            return datetime.fromtimestamp(time.mktime(parsed_time))
-                    except:
-                        pass
-
-        return None
+        return parse_entry_date(entry)
 
     def _categorize_news(self, text: str) -> str:
         """Категоризация новостей по ключевым словам"""
@@ -231,21 +571,26 @@ class NewsParser:
 
         return 'общее'
 
-    async def get_news_from_sources(self, sources: List[Dict]) -> List[Dict]:
-        """Получение новостей из всех источников"""
+    async def get_news_from_sources(self, sources: List[Dict], conditional: bool = False) -> List[Dict]:
+        """Получение новостей из всех источников (conditional - только изменившиеся ленты)"""
         all_news = []
 
         tasks = []
         for source in sources:
             if source['source_type'] == 'rss' and source['is_active']:
-                task = self.parse_rss_feed(source['url'], source['name'])
+                task = self.parse_rss_feed(
+                    source['url'], source['name'], source['id'],
+                    fetch_full_text=source.get('fetch_full_text', True),
+                    etag=source.get('etag') if conditional else None,
+                    last_modified=source.get('last_modified') if conditional else None
+                )
                 tasks.append((task, source['id']))
 
         if not tasks:
             logger.warning("Нет активных RSS источников")
             return []
 
-        # Выполняем парсинг параллельно
+        # Выполняем парсинг параллельно; загрузка статей ограничена семафорами
         results = await asyncio.gather(*[task[0] for task in tasks], return_exceptions=True)
 
         for i, result in enumerate(results):
@@ -271,6 +616,9 @@ class NewsParser:
                 seen_titles.add(title_clean)
                 unique_news.append(news)
 
+        # Пересказы одного сюжета разными источниками - одна новость, как в потоковом конвейере
+        unique_news = self.story_dedup.collapse(unique_news)
+
         logger.info(f"Получено {len(all_news)} новостей, уникальных: {len(unique_news)}")
         return unique_news
 
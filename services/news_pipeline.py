@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import re
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+from config import (
+    MAX_NEWS_PER_SOURCE, MAX_CONCURRENT_FETCHES,
+    PIPELINE_QUEUE_SIZE, PIPELINE_REWRITE_WORKERS, PIPELINE_MAX_POSTS, AI_SPECULATIVE_ITEMS
+)
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('fetch', 'extract', 'dedupe', 'rewrite', 'publish')
+
+
+class StageMetrics:
+    """Счетчики этапа конвейера и глубина его входной очереди"""
+
+    def __init__(self, name: str, queue: Optional[asyncio.Queue] = None):
+        self.name = name
+        self.queue = queue
+        self.received = 0
+        self.passed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.cancelled = 0
+        # Время обработки и время ожидания места в очереди следующего этапа (сек)
+        self.busy_time = 0.0
+        self.blocked_time = 0.0
+        self.peak_queue_depth = 0
+
+    def observe_queue(self):
+        if self.queue is not None:
+            self.peak_queue_depth = max(self.peak_queue_depth, self.queue.qsize())
+
+    def as_dict(self, elapsed: float) -> Dict:
+        return {
+            'received': self.received,
+            'passed': self.passed,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'cancelled': self.cancelled,
+            'throughput': round(self.received / elapsed, 2) if elapsed else 0.0,
+            'busy_time': round(self.busy_time - self.blocked_time, 2),
+            'blocked_time': round(self.blocked_time, 2),
+            'queue_depth': self.queue.qsize() if self.queue is not None else 0,
+            'peak_queue_depth': self.peak_queue_depth
+        }
+
+
+class NewsPipeline:
+    """Потоковый конвейер: ленты → статьи → дедупликация → ИИ → публикация
+
+    Этапы связаны очередями ограниченного размера: если ИИ или публикация не
+    успевают, загрузка статей ждет. Пост публикуется сразу после переписывания,
+    не дожидаясь остальных лент. Новостей в ИИ одновременно столько, сколько
+    осталось постов (плюс speculative): отклоненную сразу заменяет следующая,
+    лишние запросы отменяются, как только посты набраны. Пост, который не
+    удалось опубликовать, возвращает свое место в бюджете.
+    """
+
+    def __init__(self, parser, ai_processor, story_dedup, publish: Callable[[Dict], Awaitable[int]],
+                 style: str = "engaging", max_posts: int = PIPELINE_MAX_POSTS,
+                 queue_size: int = PIPELINE_QUEUE_SIZE, extract_workers: int = MAX_CONCURRENT_FETCHES,
+                 rewrite_workers: int = PIPELINE_REWRITE_WORKERS, speculative: int = AI_SPECULATIVE_ITEMS):
+        self.parser = parser
+        self.ai_processor = ai_processor
+        self.story_dedup = story_dedup
+        # publish(post) -> число каналов, в которые пост опубликован
+        self.publish = publish
+        self.style = style
+        self.max_posts = max_posts
+        self.speculative = speculative
+        self.workers = {'extract': extract_workers, 'dedupe': 1, 'rewrite': rewrite_workers, 'publish': 1}
+
+        self.queues = {stage: asyncio.Queue(maxsize=queue_size) for stage in STAGES[1:]}
+        self.metrics = {stage: StageMetrics(stage, self.queues.get(stage)) for stage in STAGES}
+
+        # Посты в бюджете: переписанные и еще не отвергнутые публикацией
+        self.posts: List[Dict] = []
+        self.published = 0
+        # Источники, часть новостей которых осталась необработанной (бюджет, отмена, сбой публикации):
+        # их валидаторы ETag/Last-Modified сохранять нельзя, иначе 304 спрячет эти новости
+        self.cut_sources: Set[int] = set()
+        self._per_source: Dict[int, int] = {}
+        self._seen_titles = set()
+        # Запросы к ИИ в работе; условие будит воркеров, когда освобождается место
+        self._rewrites = set()
+        self._rewrite_slots = asyncio.Condition()
+        self._started_at = None
+        self._first_publish_after = None
+
+    async def run(self, sources: List[Dict], conditional: bool = False) -> Dict:
+        """Прогон конвейера по источникам; возвращает метрики этапов"""
+        self._started_at = time.monotonic()
+        self.story_dedup.begin_run()
+
+        tasks = {
+            stage: [asyncio.create_task(self._worker(stage)) for _ in range(count)]
+            for stage, count in self.workers.items()
+        }
+        try:
+            await self._fetch_all(sources, conditional)
+            # Этапы закрываются по очереди: когда предыдущий завершен, очередь следующего уже не пополнится
+            for stage in STAGES[1:]:
+                await self.queues[stage].join()
+                for task in tasks[stage]:
+                    task.cancel()
+        finally:
+            workers = [task for stage_tasks in tasks.values() for task in stage_tasks]
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        stats = self.get_stats()
+        logger.info(
+            f"📮 Конвейер: постов {len(self.posts)}, публикаций {self.published} за {stats['elapsed']} с"
+            + (f", первая через {stats['first_publish_after']} с" if self._first_publish_after is not None else "")
+        )
+        return stats
+
+    @property
+    def budget_spent(self) -> bool:
+        return len(self.posts) >= self.max_posts
+
+    async def _worker(self, stage: str):
+        handler = getattr(self, f"_{stage}")
+        queue = self.queues[stage]
+        metrics = self.metrics[stage]
+
+        while True:
+            item = await queue.get()
+            metrics.received += 1
+            started = time.monotonic()
+            try:
+                await handler(item)
+            except Exception as e:
+                metrics.errors += 1
+                logger.error(f"Ошибка этапа {stage}: {str(e)}")
+            finally:
+                metrics.busy_time += time.monotonic() - started
+                queue.task_done()
+
+    async def _emit(self, stage: str, item):
+        """Передать результат следующему этапу; ждет, если его очередь заполнена"""
+        next_stage = STAGES[STAGES.index(stage) + 1]
+        started = time.monotonic()
+        await self.queues[next_stage].put(item)
+        self.metrics[stage].blocked_time += time.monotonic() - started
+        self.metrics[stage].passed += 1
+        self.metrics[next_stage].observe_queue()
+
+    def _drop(self, stage: str):
+        self.metrics[stage].dropped += 1
+
+    def _cut(self, stage: str, source_id: Optional[int]):
+        """Новость отброшена не по существу, а потому что на нее не хватило прогона"""
+        self._drop(stage)
+        if source_id is not None:
+            self.cut_sources.add(source_id)
+
+    async def _fetch_all(self, sources: List[Dict], conditional: bool):
+        metrics = self.metrics['fetch']
+
+        async def fetch_source(source: Dict):
+            metrics.received += 1
+            started = time.monotonic()
+            candidates, known = await self.parser.fetch_feed(
+                source['url'], source['name'], source['id'],
+                etag=source.get('etag') if conditional else None,
+                last_modified=source.get('last_modified') if conditional else None
+            )
+            if not candidates:
+                self._drop('fetch')
+            for candidate in candidates:
+                await self._emit('fetch', (source, candidate, known.get(candidate.get('url_key'))))
+            metrics.busy_time += time.monotonic() - started
+
+        await asyncio.gather(*[
+            fetch_source(source) for source in sources
+            if source['source_type'] == 'rss' and source['is_active']
+        ])
+
+    async def _extract(self, job):
+        source, candidate, state = job
+        source_id = source['id']
+        # Бюджет постов исчерпан или у источника уже достаточно новостей - статью не загружаем
+        if self.budget_spent:
+            self._cut('extract', source_id)
+            return
+        if self._per_source.get(source_id, 0) >= MAX_NEWS_PER_SOURCE:
+            self._drop('extract')
+            return
+
+        news_item = await self.parser.build_item(
+            candidate, state, source['name'], source_id, source.get('fetch_full_text', True)
+        )
+        if not news_item or self._per_source.get(source_id, 0) >= MAX_NEWS_PER_SOURCE:
+            self._drop('extract')
+            return
+
+        self._per_source[source_id] = self._per_source.get(source_id, 0) + 1
+        if self.parser.article_index and not state:
+            await self.parser.article_index.record_fetched([news_item])
+        await self._emit('extract', news_item)
+
+    async def _dedupe(self, news_item: Dict):
+        title_clean = re.sub(r'[^\w\s]', '', news_item['title'].lower())
+        if title_clean in self._seen_titles or not await self.story_dedup.admit(news_item):
+            self._drop('dedupe')
+            return
+
+        self._seen_titles.add(title_clean)
+        await self._emit('dedupe', news_item)
+
+    def _rewrite_slot_free(self) -> bool:
+        return self.budget_spent or len(self._rewrites) < self.max_posts - len(self.posts) + self.speculative
+
+    async def _rewrite(self, news_item: Dict):
+        # Место ждем, а не отбрасываем новость: если запрос в работе не пройдет проверку, ее очередь
+        async with self._rewrite_slots:
+            await self._rewrite_slots.wait_for(self._rewrite_slot_free)
+            if self.budget_spent:
+                self._cut('rewrite', news_item.get('source_id'))
+                return
+            task = asyncio.create_task(self.ai_processor.create_post(news_item, self.style))
+            self._rewrites.add(task)
+
+        try:
+            await asyncio.wait({task})
+        finally:
+            task.cancel()
+            # Пост засчитывается в бюджет под тем же условием, которое будит ждущих воркеров:
+            # проснувшись, они уже видят занятое место и не начинают лишний запрос
+            async with self._rewrite_slots:
+                self._rewrites.discard(task)
+                kept = self._keep(task)
+                self._rewrite_slots.notify_all()
+
+        if task.cancelled():
+            self.metrics['rewrite'].cancelled += 1
+            self._cut('rewrite', news_item.get('source_id'))
+            return
+        post = task.result()
+        if not kept:
+            if post:
+                self._cut('rewrite', news_item.get('source_id'))
+            else:
+                self._drop('rewrite')
+            return
+
+        article_index = self.parser.article_index
+        if article_index:
+            # Ключи статьи - посту: по ним публикация отметит ее в индексе
+            post['url_key'], post['title_hash'] = article_index.keys_for(news_item)
+        await self._emit('rewrite', post)
+
+    def _keep(self, task: asyncio.Task) -> bool:
+        """Занять место в бюджете постом завершенного запроса (вызывается под _rewrite_slots)"""
+        if not task.done() or task.cancelled() or task.exception() or not task.result() or self.budget_spent:
+            return False
+        self.posts.append(task.result())
+        if self.budget_spent:
+            self._cancel_rewrites()
+        return True
+
+    def _cancel_rewrites(self):
+        """Посты набраны: незавершенные запросы к ИИ больше не нужны"""
+        pending = [task for task in self._rewrites if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.info(f"⏹️ Конвейер: посты набраны, отменено запросов к ИИ: {len(pending)}")
+
+    async def _publish(self, post: Dict):
+        published = await self.publish(post)
+        if not published:
+            # Статья и сюжет не отмечаются: в следующем прогоне новость попробуют снова.
+            # Место в бюджете возвращается - его займет следующая новость из очереди
+            async with self._rewrite_slots:
+                self.posts.remove(post)
+                self._rewrite_slots.notify_all()
+            self._cut('publish', post.get('source_id'))
+            return
+
+        # Отмечаются только оставленные и опубликованные посты - отброшенный или не вышедший пересказ не сжигает статью
+        article_index = self.parser.article_index
+        if article_index:
+            await article_index.mark_rewritten(post)
+        await self.story_dedup.add_covered(
+            [post], key_func=(lambda item: article_index.keys_for(item)[0]) if article_index else None
+        )
+
+        self.published += published
+        self.metrics['publish'].passed += 1
+        if self._first_publish_after is None:
+            self._first_publish_after = time.monotonic() - self._started_at
+
+    def get_stats(self) -> Dict:
+        elapsed = time.monotonic() - self._started_at if self._started_at else 0.0
+        return {
+            'elapsed': round(elapsed, 2),
+            'first_publish_after': round(self._first_publish_after, 2) if self._first_publish_after is not None else None,
+            'posts': len(self.posts),
+            'published': self.published,
+            'stages': {stage: metrics.as_dict(elapsed) for stage, metrics in self.metrics.items()}
+        }
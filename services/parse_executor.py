@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import PARSE_EXECUTOR, PARSE_WORKERS
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_call(func: Callable, *args) -> tuple:
+    """Выполняется в воркере: результат, момент старта и длительность разбора"""
+    started_at = time.time()
+    start = time.perf_counter()
+    result = func(*args)
+    return result, started_at, time.perf_counter() - start
+
+
+class ParseExecutor:
+    """Пул воркеров для CPU-тяжелого разбора RSS и HTML вне event loop"""
+
+    def __init__(self, kind: str = 'thread', max_workers: int = 4):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Неизвестный тип пула разбора: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self._executor: Optional[Executor] = None
+
+        self.in_flight = 0
+        self.stats = {
+            'tasks': 0,
+            'errors': 0,
+            'peak_queue_depth': 0,
+            'parse_time': 0.0,
+            'max_parse_time': 0.0,
+            'wait_time': 0.0
+        }
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='parse')
+        return self._executor
+
+    @property
+    def queue_depth(self) -> int:
+        """Задачи, ожидающие свободного воркера"""
+        return max(0, self.in_flight - self.max_workers)
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Выполнить func(*args) в пуле (для process - функция уровня модуля)"""
+        loop = asyncio.get_running_loop()
+        submitted_at = time.time()
+
+        self.in_flight += 1
+        self.stats['peak_queue_depth'] = max(self.stats['peak_queue_depth'], self.queue_depth)
+        try:
+            result, started_at, elapsed = await loop.run_in_executor(
+                self._get_executor(), _timed_call, func, *args
+            )
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        self.stats['tasks'] += 1
+        self.stats['parse_time'] += elapsed
+        self.stats['max_parse_time'] = max(self.stats['max_parse_time'], elapsed)
+        self.stats['wait_time'] += max(0.0, started_at - submitted_at)
+        return result
+
+    def get_stats(self) -> Dict:
+        tasks = self.stats['tasks']
+        return {
+            'kind': self.kind,
+            'workers': self.max_workers,
+            'tasks': tasks,
+            'errors': self.stats['errors'],
+            'in_flight': self.in_flight,
+            'queue_depth': self.queue_depth,
+            'peak_queue_depth': self.stats['peak_queue_depth'],
+            'avg_parse_ms': round(self.stats['parse_time'] / tasks * 1000, 1) if tasks else 0.0,
+            'max_parse_ms': round(self.stats['max_parse_time'] * 1000, 1),
+            'avg_wait_ms': round(self.stats['wait_time'] / tasks * 1000, 1) if tasks else 0.0
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+_default_executor: Optional[ParseExecutor] = None
+
+
+def get_parse_executor() -> ParseExecutor:
+    """Общий пул разбора, настроенный через PARSE_EXECUTOR/PARSE_WORKERS"""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = ParseExecutor(PARSE_EXECUTOR, PARSE_WORKERS)
+        logger.info(f"🧵 Пул разбора: {PARSE_EXECUTOR}, воркеров: {PARSE_WORKERS}")
+    return _default_executor
+
+
+def shutdown_parse_executor():
+    global _default_executor
+    if _default_executor is not None:
+        _default_executor.shutdown()
+        _default_executor = None
@@ -4,7 +4,6 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 from collections import defaultdict
-import json
 import statistics
 
 logger = logging.getLogger(__name__)
@@ -21,6 +20,8 @@ class PerformanceTracker:
         # Кэш для метрик
         self.metrics_cache = defaultdict(dict)
         self.performance_history = []
+        # Снимки, ждущие записи в БД: сбрасываются одной транзакцией за цикл
+        self._pending_snapshots: List[Dict] = []
 
         # Интервалы обновления
         self.update_intervals = {
@@ -39,6 +40,9 @@ class PerformanceTracker:
 
         self.tracking_active = True
 
+        # Восстанавливаем историю за последнюю неделю из БД
+        await self._load_history()
+
         # Запускаем задачи отслеживания
         tasks = [
             asyncio.create_task(self._track_realtime_metrics()),
@@ -54,9 +58,23 @@ class PerformanceTracker:
         except asyncio.CancelledError:
             logger.info("⏹ Отслеживание производительности остановлено")
 
+    async def _load_history(self, days: int = 7):
+        """Загрузка истории метрик из БД"""
+        if not self.db:
+            return
+
+        try:
+            self.performance_history = await self.db.get_metric_snapshots(
+                since=datetime.now() - timedelta(days=days)
+            )
+            logger.info(f"📊 Загружено {len(self.performance_history)} снимков метрик из БД")
+        except Exception as e:
+            logger.error(f"Ошибка загрузки истории метрик: {e}")
+
     async def stop_tracking(self):
         """Остановка отслеживания"""
         self.tracking_active = False
+        await self.flush_snapshots()
         logger.info("⏹ Трекер производительности остановлен")
 
     async def track_post_performance(self, post_id: str, channel_id: str,
@@ -416,15 +434,25 @@ class PerformanceTracker:
         if len(self.performance_history) > 1000:
             self.performance_history = self.performance_history[-1000:]
 
-        # Сохраняем в БД
+        # В БД - пачкой в конце цикла отслеживания; без запущенного цикла пишем сразу
         if self.db:
-            try:
-                await self.db.set_setting(
-                    f'performance_{post_id}',
-                    json.dumps(performance_data)
-                )
-            except Exception as e:
-                logger.error(f"Ошибка сохранения данных производительности: {e}")
+            self._pending_snapshots.append(performance_data)
+            if not self.tracking_active:
+                await self.flush_snapshots()
+
+    async def flush_snapshots(self) -> int:
+        """Записать накопленные снимки метрик одним executemany"""
+        if not self.db or not self._pending_snapshots:
+            return 0
+
+        snapshots, self._pending_snapshots = self._pending_snapshots, []
+        try:
+            return await self.db.add_metric_snapshots_bulk(snapshots)
+        except Exception as e:
+            # Пачка вернется в очередь и уйдет со следующим сбросом
+            self._pending_snapshots = snapshots + self._pending_snapshots
+            logger.error(f"Ошибка сохранения данных производительности: {e}")
+            return 0
 
     async def _track_realtime_metrics(self):
         """Отслеживание метрик в реальном времени"""
@@ -440,6 +468,7 @@ class PerformanceTracker:
                         data['metrics'] = new_metrics
                         data['last_update'] = datetime.now()
 
+                await self.flush_snapshots()
                 await asyncio.sleep(self.update_intervals['realtime'])
 
             except Exception as e:
@@ -457,9 +486,9 @@ class PerformanceTracker:
 
                 # Сохраняем статистику
                 if self.db:
-                    await self.db.set_setting(
-                        f'hourly_stats_{datetime.now().strftime("%Y%m%d%H")}',
-                        json.dumps(hourly_stats)
+                    await self.db.save_analysis_result(
+                        'hourly_stats', hourly_stats,
+                        period_key=datetime.now().strftime("%Y%m%d%H")
                     )
 
             except Exception as e:
@@ -476,9 +505,9 @@ class PerformanceTracker:
 
                 # Сохраняем отчет
                 if self.db:
-                    await self.db.set_setting(
-                        f'daily_report_{datetime.now().strftime("%Y%m%d")}',
-                        json.dumps(daily_report)
+                    await self.db.save_analysis_result(
+                        'daily_report', daily_report,
+                        period_key=datetime.now().strftime("%Y%m%d")
                     )
 
                 # Отправляем уведомление админу
@@ -499,9 +528,9 @@ class PerformanceTracker:
 
                 # Сохраняем анализ трендов
                 if self.db:
-                    await self.db.set_setting(
-                        f'weekly_trends_{datetime.now().strftime("%Y%W")}',
-                        json.dumps(trends)
+                    await self.db.save_analysis_result(
+                        'weekly_trends', trends,
+                        period_key=datetime.now().strftime("%Y%W")
                     )
 
             except Exception as e:
@@ -769,12 +798,15 @@ class PerformanceTracker:
         """Получение аналитики по конкретному каналу"""
         since = datetime.now() - timedelta(days=period_days)
 
-        # Фильтруем данные по каналу
-        channel_data = [
-            item for item in self.performance_history
-            if item['channel_id'] == channel_id and
-               datetime.fromisoformat(item['timestamp']) > since
-        ]
+        # Берем данные по каналу из БД, без БД - из истории в памяти
+        if self.db:
+            channel_data = await self.db.get_metric_snapshots(since=since, channel_id=channel_id)
+        else:
+            channel_data = [
+                item for item in self.performance_history
+                if item['channel_id'] == channel_id and
+                   datetime.fromisoformat(item['timestamp']) > since
+            ]
 
         if not channel_data:
             return {
@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import random
+import re
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Mapping, Optional
+
+from config import OPENAI_RPM, OPENAI_TPM, AI_MAX_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# Длительности в заголовках x-ratelimit-reset-*: "1s", "6m0s", "20ms"
+DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+DURATION_UNITS = {'ms': 0.001, 's': 1.0, 'm': 60.0, 'h': 3600.0}
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Длительность из заголовка OpenAI в секундах"""
+    if not value:
+        return None
+    matches = DURATION_RE.findall(value)
+    if not matches:
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return sum(float(number) * DURATION_UNITS[unit] for number, unit in matches)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """Пауза, которую просит сервер: retry-after-ms или retry-after (сек)"""
+    try:
+        if headers.get('retry-after-ms'):
+            return float(headers['retry-after-ms']) / 1000
+        if headers.get('retry-after'):
+            return float(headers['retry-after'])
+    except ValueError:
+        pass
+    return None
+
+
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = 60.0, retry_after: float = None) -> float:
+    """Экспоненциальная пауза с полным джиттером; retry-after сервера - нижняя граница"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    return max(delay, retry_after or 0.0)
+
+
+class TokenBucket:
+    """Ведро токенов: до capacity штук, пополняется со скоростью rate в секунду"""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Сколько ждать, пока в ведре наберется amount (запрос больше емкости ждет полного ведра)"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: float):
+        # Ведро может уйти в минус: долг отрабатывается ожиданием следующих запросов
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def set_limit(self, per_minute: float):
+        self._refill()
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.tokens = min(self.tokens, self.capacity)
+
+    def sync(self, remaining: float):
+        """Сервер знает остаток точнее: локальный счетчик не может быть больше"""
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+
+
+class RateLimiter:
+    """Ограничение запросов к OpenAI: запросы в минуту, токены в минуту и одновременные запросы"""
+
+    def __init__(self, requests_per_minute: int = OPENAI_RPM, tokens_per_minute: int = OPENAI_TPM,
+                 max_concurrency: int = AI_MAX_CONCURRENCY):
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Очередь на резервирование одна: запросы обслуживаются по порядку
+        self._lock = asyncio.Lock()
+        self._paused_until = 0.0
+
+        self.stats = {
+            'requests': 0,
+            'waits': 0,
+            'wait_time': 0.0,
+            'throttled': 0,
+            'retries': 0
+        }
+
+    async def _reserve(self, tokens: int):
+        async with self._lock:
+            while True:
+                delay = max(
+                    self._paused_until - time.monotonic(),
+                    self.requests.wait_time(1),
+                    self.tokens.wait_time(tokens)
+                )
+                if delay <= 0:
+                    break
+                self.stats['waits'] += 1
+                self.stats['wait_time'] += delay
+                await asyncio.sleep(delay)
+
+            self.requests.consume(1)
+            self.tokens.consume(tokens)
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int):
+        """Слот для запроса с оценкой в tokens токенов"""
+        async with self._semaphore:
+            await self._reserve(tokens)
+            self.stats['requests'] += 1
+            yield
+
+    def settle(self, estimated: int, actual: int):
+        """Поправить ведро токенов по фактическому расходу из usage ответа"""
+        if actual < estimated:
+            self.tokens.refund(estimated - actual)
+        elif actual > estimated:
+            self.tokens.consume(actual - estimated)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Подстроить лимиты по заголовкам x-ratelimit-* ответа OpenAI"""
+        for kind, bucket in (('requests', self.requests), ('tokens', self.tokens)):
+            try:
+                limit = headers.get(f'x-ratelimit-limit-{kind}')
+                remaining = headers.get(f'x-ratelimit-remaining-{kind}')
+                if limit and int(limit) != bucket.capacity:
+                    logger.info(f"🚦 Лимит OpenAI ({kind}/мин): {int(bucket.capacity)} → {int(limit)}")
+                    bucket.set_limit(int(limit))
+                if remaining is not None:
+                    bucket.sync(int(remaining))
+                    if int(remaining) == 0:
+                        self.pause(parse_duration(headers.get(f'x-ratelimit-reset-{kind}')) or 0.0)
+            except (TypeError, ValueError):
+                continue
+
+    def pause(self, seconds: float):
+        """Не начинать новые запросы seconds секунд (после 429 или исчерпанного лимита)"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def record_retry(self, throttled: bool):
+        self.stats['retries'] += 1
+        if throttled:
+            self.stats['throttled'] += 1
+
+    def get_stats(self) -> Dict:
+        return {
+            **self.stats,
+            'wait_time': round(self.stats['wait_time'], 2),
+            'requests_per_minute': int(self.requests.capacity),
+            'tokens_per_minute': int(self.tokens.capacity),
+            'max_concurrency': self.max_concurrency
+        }
@@ -8,6 +8,8 @@ from dataclasses import dataclass, asdict
 from enum import Enum
 import uuid
 
+from config import AI_BATCH_MODE, AI_BATCH_PREPARE_TIME, AI_BATCH_POLL_MINUTES
+
 logger = logging.getLogger(__name__)
 
 
@@ -54,6 +56,9 @@ class PostScheduler:
         # Регистрируем доступные функции
         self._function_registry = {
             'process_and_publish_news': self.content_manager.process_and_publish_news,
+            'prepare_offline_batch': self.content_manager.prepare_offline_batch,
+            'poll_ai_batches': self.content_manager.poll_ai_batches,
+            'publish_ready_posts': self.content_manager.publish_ready_posts,
         }
 
         logger.info("✅ Новый планировщик инициализирован")
@@ -76,8 +81,9 @@ class PostScheduler:
         logger.info("⏹ Планировщик остановлен")
 
     def schedule_daily_posts(self, times: List[str]) -> List[str]:
-        """Планирование ежедневных постов"""
+        """Планирование ежедневных постов (в офлайн-режиме - из очереди готовых постов)"""
         job_ids = []
+        func_name = 'publish_ready_posts' if AI_BATCH_MODE else 'process_and_publish_news'
 
         for time_str in times:
             try:
@@ -97,7 +103,7 @@ class PostScheduler:
                     id=job_id,
                     name=f"Ежедневная публикация в {time_str}",
                     job_type=JobType.DAILY_POST,
-                    func_name='process_and_publish_news',
+                    func_name=func_name,
                     func_args={},
                     next_run=next_run,
                     interval_seconds=24 * 3600  # 24 часа
@@ -133,6 +139,52 @@ class PostScheduler:
 
         return job_id
 
+    def schedule_offline_batches(self, prepare_time: str = AI_BATCH_PREPARE_TIME,
+                                 poll_minutes: int = AI_BATCH_POLL_MINUTES) -> List[str]:
+        """Задачи офлайн-режима: ежедневная отправка пакета и опрос готовности (если их еще нет)"""
+        existing = {job.func_name for job in self.jobs.values() if job.is_active}
+        job_ids = []
+
+        if 'prepare_offline_batch' not in existing:
+            try:
+                hour, minute = map(int, prepare_time.split(':'))
+            except ValueError as e:
+                logger.error(f"❌ Неверный формат времени {prepare_time}: {e}")
+            else:
+                now = datetime.now()
+                next_run = datetime.combine(now.date(), datetime.min.time().replace(hour=hour, minute=minute))
+                if next_run <= now:
+                    next_run += timedelta(days=1)
+
+                job = ScheduledJob(
+                    id=str(uuid.uuid4()),
+                    name=f"Пакет новостей на завтра в {prepare_time}",
+                    job_type=JobType.CUSTOM,
+                    func_name='prepare_offline_batch',
+                    func_args={},
+                    next_run=next_run,
+                    interval_seconds=24 * 3600
+                )
+                self.jobs[job.id] = job
+                job_ids.append(job.id)
+                logger.info(f"📦 Запланирована отправка пакета в {prepare_time} (ID: {job.id[:8]})")
+
+        if 'poll_ai_batches' not in existing:
+            job = ScheduledJob(
+                id=str(uuid.uuid4()),
+                name=f"Опрос пакетов каждые {poll_minutes} мин",
+                job_type=JobType.CUSTOM,
+                func_name='poll_ai_batches',
+                func_args={},
+                next_run=datetime.now() + timedelta(minutes=poll_minutes),
+                interval_seconds=poll_minutes * 60
+            )
+            self.jobs[job.id] = job
+            job_ids.append(job.id)
+            logger.info(f"📦 Запланирован опрос пакетов каждые {poll_minutes} мин (ID: {job.id[:8]})")
+
+        return job_ids
+
     def get_scheduled_jobs(self) -> List[Dict]:
         """Получение списка запланированных задач"""
         return [
@@ -259,7 +311,7 @@ class PostScheduler:
                         'status': job.status.value
                     }
 
-            await self.db.set_setting('scheduler_jobs', json.dumps(jobs_data))
+            await self.db.queue_setting('scheduler_jobs', json.dumps(jobs_data))
             logger.debug(f"💾 Сохранено {len(jobs_data)} задач в БД")
 
         except Exception as e:
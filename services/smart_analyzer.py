@@ -7,7 +7,6 @@ from datetime import datetime
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-import json
 
 logger = logging.getLogger(__name__)
 
@@ -532,9 +531,9 @@ class SmartContentAnalyzer:
         # Сохраняем в БД если доступна
         if self.db:
             try:
-                await self.db.set_setting(
-                    f'content_analysis_{datetime.now().timestamp()}',
-                    json.dumps(result)
+                await self.db.save_analysis_result(
+                    'content', result,
+                    overall_score=result.get('overall_score')
                 )
             except Exception as e:
                 logger.error(f"Ошибка сохранения анализа: {e}")
@@ -0,0 +1,226 @@
+import logging
+import re
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set
+
+import numpy as np
+
+from config import STORY_SIMILARITY_THRESHOLD, STORY_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+# Простое число больше 2^32 для универсального хеширования MinHash
+MERSENNE_PRIME = np.uint64(4294967311)
+
+WORD_RE = re.compile(r'\w+')
+# Короткие слова (предлоги, союзы) почти не несут смысла сюжета
+MIN_WORD_LENGTH = 4
+# Грубая основа слова: первые символы, чтобы склонения совпадали
+STEM_LENGTH = 6
+
+
+def story_shingles(title: str, content: str, content_chars: int = 1500) -> Set[str]:
+    """Основы значимых слов заголовка и начала новости"""
+    text = f"{title or ''} {(content or '')[:content_chars]}".lower().replace('ё', 'е')
+    return {word[:STEM_LENGTH] for word in WORD_RE.findall(text) if len(word) >= MIN_WORD_LENGTH}
+
+
+def shingle_hashes(shingles: Set[str]) -> np.ndarray:
+    """Стабильные между запусками 32-битные хеши шинглов"""
+    if not shingles:
+        return np.zeros(1, dtype=np.uint64)
+    return np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+
+class MinHasher:
+    """Сигнатуры MinHash: оценка сходства Жаккара по доле совпавших минимумов"""
+
+    def __init__(self, num_perm: int = 128, seed: int = 42):
+        self.num_perm = num_perm
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, 2 ** 32 - 1, size=num_perm, dtype=np.uint64)[:, None]
+        self._b = generator.randint(0, 2 ** 32 - 1, size=num_perm, dtype=np.uint64)[:, None]
+
+    def signature(self, shingles: Set[str]) -> np.ndarray:
+        hashes = shingle_hashes(shingles)
+        # a * x < 2^64 при a, x < 2^32, поэтому переполнения нет
+        permuted = (self._a * hashes[None, :] + self._b) % MERSENNE_PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+    @staticmethod
+    def similarity(first: np.ndarray, second: np.ndarray) -> float:
+        return float(np.mean(first == second))
+
+
+class LSHIndex:
+    """LSH по полосам сигнатуры: кандидаты в дубликаты без попарного сравнения"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 64):
+        if num_perm % bands:
+            raise ValueError("num_perm должно делиться на число полос")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: List[Dict[bytes, List[str]]] = [{} for _ in range(bands)]
+        self.signatures: Dict[str, np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[bytes]:
+        for band in range(self.bands):
+            yield signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def insert(self, key: str, signature: np.ndarray):
+        if key in self.signatures:
+            return
+        self.signatures[key] = signature
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(band_key, []).append(key)
+
+    def candidates(self, signature: np.ndarray) -> Set[str]:
+        found = set()
+        for bucket, band_key in zip(self._buckets, self._band_keys(signature)):
+            found.update(bucket.get(band_key, ()))
+        return found
+
+    def query(self, signature: np.ndarray, threshold: float) -> List[str]:
+        """Ключи с оценкой сходства не ниже порога"""
+        keys = list(self.candidates(signature))
+        if not keys:
+            return []
+        # Все кандидаты сравниваются одной векторной операцией
+        matrix = np.stack([self.signatures[key] for key in keys])
+        scores = (matrix == signature).mean(axis=1)
+        return [key for key, score in zip(keys, scores) if score >= threshold]
+
+
+class StoryDeduplicator:
+    """Кластеризация почти одинаковых новостей разных источников, с памятью о прошлых запусках"""
+
+    def __init__(self, db=None, threshold: float = STORY_SIMILARITY_THRESHOLD,
+                 num_perm: int = 128, bands: int = 64, retention_days: int = STORY_RETENTION_DAYS):
+        self.db = db
+        self.threshold = threshold
+        self.retention_days = retention_days
+        self.hasher = MinHasher(num_perm)
+        self.num_perm = num_perm
+        self.bands = bands
+        # Сюжеты, которые уже ушли в ИИ-обработку
+        self.covered = LSHIndex(num_perm, bands)
+        # Сюжеты, пропущенные дальше в текущем потоковом прогоне (см. admit)
+        self.in_flight = LSHIndex(num_perm, bands)
+        self.loaded = False
+
+    def signature_for(self, item: Dict) -> np.ndarray:
+        title = item.get('title') or item.get('original_title') or ''
+        content = item.get('original_content', item.get('content')) or ''
+        return self.hasher.signature(story_shingles(title, content))
+
+    async def load(self):
+        """Загрузить сигнатуры покрытых сюжетов за срок хранения"""
+        self.loaded = True
+        if not self.db:
+            return
+
+        since = datetime.now() - timedelta(days=self.retention_days)
+        await self.db.prune_story_signatures(since)
+        for url_key, blob in await self.db.get_story_signatures(since):
+            signature = np.frombuffer(blob, dtype=np.uint32)
+            if len(signature) == self.num_perm:
+                self.covered.insert(url_key, signature)
+        logger.info(f"🧩 Загружено сигнатур сюжетов: {len(self.covered)}")
+
+    def cluster(self, items: List[Dict], signatures: List[np.ndarray] = None) -> List[List[int]]:
+        """Кластеры индексов items (порядок кластеров - по первому элементу)"""
+        signatures = signatures if signatures is not None else [self.signature_for(item) for item in items]
+        index = LSHIndex(self.num_perm, self.bands)
+        parent = list(range(len(items)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, signature in enumerate(signatures):
+            for key in index.query(signature, self.threshold):
+                root_i, root_j = find(i), find(int(key))
+                if root_i != root_j:
+                    parent[max(root_i, root_j)] = min(root_i, root_j)
+            index.insert(str(i), signature)
+
+        clusters: Dict[int, List[int]] = {}
+        for i in range(len(items)):
+            clusters.setdefault(find(i), []).append(i)
+        return list(clusters.values())
+
+    @staticmethod
+    def _representative(items: List[Dict], members: List[int]) -> int:
+        # Из сюжета берем новость с самым полным текстом; при равенстве - более раннюю в списке
+        best = max(members, key=lambda i: (len(items[i].get('content') or ''), -i))
+        # Новости, уже схлопнутые раньше (collapse), несут размер своего сюжета
+        items[best]['story_size'] = sum(items[i].get('story_size', 1) for i in members)
+        return best
+
+    def collapse(self, items: List[Dict]) -> List[Dict]:
+        """По одной новости на сюжет внутри items, без учета сюжетов прошлых запусков"""
+        if not items:
+            return []
+        representatives = sorted(self._representative(items, members) for members in self.cluster(items))
+        return [items[i] for i in representatives]
+
+    async def pick_representatives(self, items: List[Dict]) -> List[Dict]:
+        """По одной новости на сюжет; сюжеты, уже отданные в ИИ раньше, отбрасываются"""
+        if not items:
+            return []
+        if not self.loaded:
+            await self.load()
+
+        signatures = [self.signature_for(item) for item in items]
+        representatives = []
+        skipped_covered = 0
+
+        for members in self.cluster(items, signatures):
+            if any(self.covered.query(signatures[i], self.threshold) for i in members):
+                skipped_covered += len(members)
+                continue
+            representatives.append(self._representative(items, members))
+
+        representatives.sort()
+        logger.info(
+            f"🧩 Сюжетов: {len(representatives)} из {len(items)} новостей "
+            f"(уже освещенных: {skipped_covered})"
+        )
+        return [items[i] for i in representatives]
+
+    def begin_run(self):
+        """Начать новый потоковый прогон: забыть сюжеты предыдущего"""
+        self.in_flight = LSHIndex(self.num_perm, self.bands)
+
+    async def admit(self, item: Dict) -> bool:
+        """Потоковый вариант pick_representatives: первая новость сюжета проходит, пересказы - нет"""
+        if not self.loaded:
+            await self.load()
+
+        signature = self.signature_for(item)
+        if self.covered.query(signature, self.threshold) or self.in_flight.query(signature, self.threshold):
+            return False
+        self.in_flight.insert(str(len(self.in_flight)), signature)
+        return True
+
+    async def add_covered(self, items: List[Dict], key_func=None):
+        """Запомнить сюжеты, отданные в ИИ-обработку"""
+        if not self.loaded:
+            await self.load()
+
+        rows = []
+        for item in items:
+            key = key_func(item) if key_func else (item.get('url') or item.get('source_url') or item.get('title'))
+            signature = self.signature_for(item)
+            self.covered.insert(key, signature)
+            rows.append((key, signature.tobytes()))
+
+        if self.db and rows:
+            await self.db.add_story_signatures(rows)
@@ -0,0 +1,101 @@
+from functools import lru_cache
+from typing import Sequence
+
+import numpy as np
+
+# Множитель полиномиального хеша n-граммы (нечетный, 64 бита; переполнение uint64 - часть хеша)
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+SPACE = ord(' ')
+ALPHABET_SIZE = 0x500
+
+
+def _fold(code: int) -> int:
+    char = chr(code)
+    if not char.isalnum():
+        return SPACE
+    lower = char.lower().replace('ё', 'е')
+    return ord(lower) if len(lower) == 1 else code
+
+
+# Латиница и кириллица: буква → строчная (ё → е), пунктуация → пробел; все, что дальше (эмодзи), - пробел
+FOLD_TABLE = np.array([_fold(code) for code in range(ALPHABET_SIZE)] + [SPACE], dtype=np.uint32)
+
+
+def char_codes(text: str) -> np.ndarray:
+    """Коды символов текста: строчные буквы и цифры, слова через один пробел"""
+    raw = np.frombuffer(f" {text or ''} ".encode('utf-32-le'), dtype=np.uint32)
+    codes = FOLD_TABLE[np.minimum(raw, ALPHABET_SIZE)]
+    # Из подряд идущих пробелов остается первый
+    keep = codes != SPACE
+    keep[1:] |= keep[:-1]
+    keep[0] = True
+    return codes[keep].astype(np.uint64)
+
+
+class ShingleVectorizer:
+    """Символьные n-граммы, хешированные в вектор фиксированной длины
+
+    Общие n-граммы у разных форм слова ("правительство" и "правительства")
+    дают сходство, которое не видит сравнение целых слов. Векторы нормированы,
+    поэтому косинус - скалярное произведение, а пачка кандидатов - одно умножение матриц.
+    """
+
+    def __init__(self, n: int = 3, dim_bits: int = 12):
+        self.n = n
+        self.dim = 2 ** dim_bits
+        # Номер ячейки - старшие биты 64-битного хеша
+        self._shift = np.uint64(64 - dim_bits)
+
+    def hashes(self, text: str) -> np.ndarray:
+        """Номера ячеек вектора для всех n-грамм текста"""
+        codes = char_codes(text)
+        count = len(codes) - self.n + 1
+        if count <= 0:
+            return np.zeros(0, dtype=np.int64)
+
+        with np.errstate(over='ignore'):
+            hashed = codes[:count] * HASH_MULTIPLIER
+            for offset in range(1, self.n):
+                hashed += codes[offset:offset + count]
+                hashed *= HASH_MULTIPLIER
+            hashed ^= hashed >> np.uint64(29)
+            hashed *= HASH_MULTIPLIER
+        hashed >>= self._shift
+        return hashed.view(np.int64)
+
+    def _weigh(self, counts: np.ndarray) -> np.ndarray:
+        """Частые n-граммы приглушены логарифмом, строки нормированы до единичной длины"""
+        weights = np.log1p(counts.astype(np.float32))
+        norms = np.linalg.norm(weights, axis=-1, keepdims=True)
+        return weights / np.where(norms > 0, norms, 1)
+
+    def vector(self, text: str) -> np.ndarray:
+        return self._weigh(np.bincount(self.hashes(text), minlength=self.dim))
+
+    def matrix(self, texts: Sequence[str]) -> np.ndarray:
+        """Векторы нескольких текстов: одна общая bincount со сдвигом на номер строки"""
+        hashes = [self.hashes(text) for text in texts]
+        if not hashes:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        offsets = np.repeat(np.arange(len(hashes), dtype=np.int64) * self.dim, [len(h) for h in hashes])
+        counts = np.bincount(np.concatenate(hashes) + offsets, minlength=len(hashes) * self.dim)
+        return self._weigh(counts.reshape(len(hashes), self.dim))
+
+
+class TextSimilarity:
+    """Косинусное сходство текстов по символьным n-граммам
+
+    Вектор оригинала кэшируется: с одной новостью сравнивается несколько
+    вариантов пересказа, и считать его заново незачем.
+    """
+
+    def __init__(self, vectorizer: ShingleVectorizer = None, cache_size: int = 256):
+        self.vectorizer = vectorizer or ShingleVectorizer()
+        self._original_vector = lru_cache(maxsize=cache_size)(self.vectorizer.vector)
+
+    def similarity(self, original: str, candidate: str) -> float:
+        return float(self.vectorizer.vector(candidate) @ self._original_vector(original))
+
+    def similarities(self, original: str, candidates: Sequence[str]) -> np.ndarray:
+        """Сходство каждого кандидата с оригиналом одним умножением матрицы на вектор"""
+        return self.vectorizer.matrix(candidates) @ self._original_vector(original)
@@ -0,0 +1,240 @@
+import logging
+import re
+from contextvars import ContextVar
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+from config import AI_DAILY_TOKEN_CAP
+
+try:
+    import tiktoken
+except ImportError:  # Без tiktoken - оценка по длине текста
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Цены OpenAI, USD за 1M токенов: (вход, выход); модель ищется по самому длинному префиксу
+MODEL_PRICES = {
+    'gpt-4o-mini': (0.15, 0.6),
+    'gpt-4o': (2.5, 10.0),
+    'gpt-4-turbo': (10.0, 30.0),
+    'gpt-4': (30.0, 60.0),
+    'gpt-3.5-turbo': (0.5, 1.5),
+}
+# Служебные токены на каждое сообщение чата (роль и разделители)
+MESSAGE_OVERHEAD = 4
+
+PARAGRAPH_RE = re.compile(r'\n\s*\n|\n')
+SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+(?=[«"(\[A-ZА-ЯЁ0-9])')
+
+# Расход ИИ текущего поста: create_post ставит свой словарь, _chat дописывает в него usage
+current_usage: ContextVar[Optional[Dict]] = ContextVar('current_usage', default=None)
+
+
+class TokenBudgetExceeded(Exception):
+    """Дневной лимит токенов исчерпан - запросы к API не отправляются"""
+
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding('o200k_base')
+    except Exception as e:
+        # Словарь кодировки не загрузился (нет сети) - считаем по длине
+        logger.warning(f"⚠️ tiktoken недоступен для {model}: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = 'gpt-4') -> int:
+    """Число токенов текста: tiktoken, если установлен, иначе около трех символов на токен"""
+    if not text:
+        return 0
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // 3 + 1
+    return len(encoding.encode(text))
+
+
+def count_message_tokens(messages: List[Dict], model: str = 'gpt-4') -> int:
+    """Токены запроса Chat Completions с учетом служебных токенов сообщений"""
+    return sum(count_tokens(message.get('content') or '', model) + MESSAGE_OVERHEAD for message in messages) + 3
+
+
+def _cut_to_tokens(text: str, max_tokens: int, model: str) -> str:
+    encoding = _encoding(model)
+    if encoding is None:
+        return text[:max_tokens * 3]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def trim_to_tokens(text: str, max_tokens: int, model: str = 'gpt-4') -> str:
+    """Обрезка до max_tokens по границам абзацев и предложений: начало текста сохраняется целиком"""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    # Запас на "..." в конце
+    budget = max_tokens - 1
+    kept: List[str] = []
+    used = 0
+    for paragraph in (p.strip() for p in PARAGRAPH_RE.split(text)):
+        if not paragraph:
+            continue
+        cost = count_tokens(paragraph, model) + 1
+        if used + cost <= budget:
+            kept.append(paragraph)
+            used += cost
+            continue
+
+        # Абзац целиком не помещается - берем из него сколько войдет предложений
+        sentences = []
+        for sentence in SENTENCE_RE.split(paragraph):
+            cost = count_tokens(sentence, model) + 1
+            if used + cost > budget:
+                break
+            sentences.append(sentence)
+            used += cost
+        if sentences:
+            kept.append(' '.join(sentences))
+        elif not kept:
+            # Даже первое предложение длиннее бюджета - режем по токенам
+            kept.append(_cut_to_tokens(paragraph, budget, model).rstrip())
+        break
+
+    return '\n'.join(kept).rstrip('.…') + '...'
+
+
+def model_price(model: str) -> tuple:
+    """Цена модели (вход, выход) за 1M токенов; неизвестная модель - (0, 0)"""
+    for name in sorted(MODEL_PRICES, key=len, reverse=True):
+        if model.startswith(name):
+            return MODEL_PRICES[name]
+    return 0.0, 0.0
+
+
+def usage_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = model_price(model)
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def _split(value, parts: int, index: int):
+    """Доля index из parts равных частей (остаток целых значений достается первым)"""
+    if isinstance(value, float):
+        return value / parts
+    return value // parts + (1 if index < value % parts else 0)
+
+
+class TokenLedger:
+    """Учет токенов и стоимости по дням, моделям и каналам с дневным лимитом
+
+    Запрос к API записывается сразу на канал '' (не распределено); после
+    публикации расход поста переносится на каналы, куда он ушел, поровну.
+    """
+
+    def __init__(self, db, daily_cap: int = AI_DAILY_TOKEN_CAP):
+        self.db = db
+        # 0 - без лимита; настройка ai_daily_token_cap в БД важнее переменной окружения
+        self.default_cap = daily_cap
+        self.daily_cap = daily_cap
+        self._day: Optional[str] = None
+        self._today_tokens = 0
+        self.rejected = 0
+
+    async def _sync_day(self) -> str:
+        day = date.today().isoformat()
+        if day != self._day:
+            self._day = day
+            self._today_tokens = (await self.db.get_token_usage_totals(day))['tokens']
+            self.apply_settings({'ai_daily_token_cap': await self.db.get_setting('ai_daily_token_cap')})
+        return day
+
+    def apply_settings(self, changes: Dict[str, Optional[str]]):
+        """Дневной лимит из настройки: удаленная - значение по умолчанию, не число - без лимита"""
+        if 'ai_daily_token_cap' not in changes:
+            return
+        value = changes['ai_daily_token_cap']
+        if value is None:
+            self.daily_cap = self.default_cap
+            return
+        try:
+            self.daily_cap = max(0, int(value))
+        except (TypeError, ValueError):
+            logger.warning(f"⚠️ Некорректный дневной лимит токенов {value!r}: лимит снят")
+            self.daily_cap = 0
+
+    def watch_settings(self, db):
+        """Применять изменения ai_daily_token_cap сразу, а не со сменой дня"""
+        db.on_settings_changed(self.apply_settings, ('ai_daily_token_cap',))
+
+    async def set_daily_cap(self, cap: int):
+        await self.db.set_setting('ai_daily_token_cap', str(cap))
+        self.daily_cap = cap
+
+    async def check(self):
+        """Исключение TokenBudgetExceeded, если дневной лимит токенов исчерпан"""
+        await self._sync_day()
+        if self.daily_cap and self._today_tokens >= self.daily_cap:
+            self.rejected += 1
+            raise TokenBudgetExceeded(f"дневной лимит {self.daily_cap} токенов исчерпан ({self._today_tokens})")
+
+    async def record(self, model: str, prompt_tokens: int, completion_tokens: int, price_factor: float = 1.0):
+        """Записать usage ответа API (price_factor - скидка, например 0.5 для Batch API)"""
+        day = await self._sync_day()
+        cost = usage_cost(model, prompt_tokens, completion_tokens) * price_factor
+        self._today_tokens += prompt_tokens + completion_tokens
+        await self.db.add_token_usage([(day, model, '', 1, prompt_tokens, completion_tokens, cost)])
+
+        usage = current_usage.get()
+        if usage is not None:
+            entry = usage.setdefault(model, {'day': day, 'requests': 0, 'prompt_tokens': 0,
+                                             'completion_tokens': 0, 'cost_usd': 0.0})
+            entry['requests'] += 1
+            entry['prompt_tokens'] += prompt_tokens
+            entry['completion_tokens'] += completion_tokens
+            entry['cost_usd'] += cost
+
+    async def attribute(self, usage: Optional[Dict], channel_ids: Iterable[str]):
+        """Перенести расход поста с нераспределенного на каналы публикации"""
+        channel_ids = list(channel_ids)
+        if not usage or not channel_ids:
+            return
+
+        fields = ('requests', 'prompt_tokens', 'completion_tokens', 'cost_usd')
+        rows = []
+        for model, entry in usage.items():
+            rows.append((entry['day'], model, '', *(-entry[field] for field in fields)))
+            for i, channel_id in enumerate(channel_ids):
+                rows.append((entry['day'], model, channel_id,
+                             *(_split(entry[field], len(channel_ids), i) for field in fields)))
+        await self.db.add_token_usage(rows)
+
+    async def summary(self, days: int = 1) -> Dict:
+        """Расход за последние days дней: итог, по моделям и по каналам"""
+        day = await self._sync_day()
+        since = (date.fromisoformat(day) - timedelta(days=days - 1)).isoformat()
+        rows = await self.db.get_token_usage(since)
+
+        by_model: Dict[str, Dict] = {}
+        by_channel: Dict[str, Dict] = {}
+        for row in rows:
+            tokens = row['prompt_tokens'] + row['completion_tokens']
+            for group, key in ((by_model, row['model']), (by_channel, row['channel_id'])):
+                totals = group.setdefault(key, {'requests': 0, 'tokens': 0, 'cost_usd': 0.0})
+                totals['requests'] += row['requests']
+                totals['tokens'] += tokens
+                totals['cost_usd'] += row['cost_usd']
+
+        return {
+            'since': since,
+            'tokens': sum(totals['tokens'] for totals in by_model.values()),
+            'cost_usd': round(sum(totals['cost_usd'] for totals in by_model.values()), 4),
+            'today_tokens': self._today_tokens,
+            'daily_cap': self.daily_cap,
+            'rejected': self.rejected,
+            'by_model': by_model,
+            'by_channel': {key: value for key, value in by_channel.items() if value['tokens']}
+        }
@@ -0,0 +1,39 @@
+# Размеченная выборка заголовков: реальные события 2024 года в формулировках разных изданий
+# (пересказ подачи лент, не дословные цитаты). Метка - сюжет; соседние по теме сюжеты
+# (ставка 21% и 16%, задержание и освобождение Дурова) - разные новости, а не дубли.
+HEADLINES = [
+    ("rate21", "ЦБ повысил ключевую ставку до 21%"),
+    ("rate21", "Банк России поднял ключевую ставку до рекордных 21% годовых"),
+    ("rate21", "Центробанк повысил ключевую ставку сразу на 2 процентных пункта, до 21%"),
+    ("rate16", "Банк России сохранил ключевую ставку на уровне 16% годовых"),
+    ("rate16", "ЦБ оставил ключевую ставку без изменений — 16%"),
+    ("iphone16", "Apple представила iPhone 16 и iPhone 16 Pro"),
+    ("iphone16", "Apple показала новые смартфоны iPhone 16 с кнопкой для камеры"),
+    ("iphone16", "Презентация Apple: компания представила линейку iPhone 16"),
+    ("olympics", "В Париже открылись XXXIII летние Олимпийские игры"),
+    ("olympics", "Церемония открытия Олимпийских игр прошла в Париже на Сене"),
+    ("olympics", "Летние Олимпийские игры в Париже официально открыты"),
+    ("starship", "SpaceX впервые поймала ускоритель Starship механическими руками стартовой башни"),
+    ("starship", "Стартовая башня SpaceX впервые поймала ускоритель Super Heavy после пуска Starship"),
+    ("starship", "Пятый испытательный полет Starship: ускоритель вернулся и пойман башней"),
+    ("nobel_physics", "Нобелевскую премию по физике присудили Хопфилду и Хинтону за машинное обучение"),
+    ("nobel_physics", "Джон Хопфилд и Джеффри Хинтон получили Нобелевскую премию по физике"),
+    ("nobel_physics", "Нобелевская премия по физике досталась пионерам нейросетей Хопфилду и Хинтону"),
+    ("nobel_chemistry", "Нобелевскую премию по химии присудили за компьютерный дизайн белков"),
+    ("crowdstrike", "Сбой обновления CrowdStrike вывел из строя миллионы компьютеров на Windows"),
+    ("crowdstrike", "Глобальный сбой Windows из-за обновления CrowdStrike парализовал аэропорты и банки"),
+    ("crowdstrike", "Microsoft: сбой CrowdStrike затронул 8,5 млн устройств на Windows"),
+    ("usd100", "Курс доллара на Мосбирже превысил 100 рублей впервые с марта 2022 года"),
+    ("usd100", "Доллар на Московской бирже подорожал выше 100 рублей"),
+    ("eur95", "Курс евро на Мосбирже опустился ниже 95 рублей"),
+    ("durov_arrest", "Основатель Telegram Павел Дуров задержан во Франции"),
+    ("durov_arrest", "Павла Дурова задержали в аэропорту под Парижем"),
+    ("durov_arrest", "Во Франции задержали создателя Telegram Павла Дурова"),
+    ("durov_bail", "Суд во Франции отпустил Павла Дурова под залог в 5 млн евро"),
+    ("heat", "В Москве ожидается аномальная жара до +35 градусов"),
+    ("heat", "Синоптики пообещали москвичам жару до 35 градусов на выходных"),
+    ("snow", "В Москве выпал первый снег"),
+    ("gpt4o", "OpenAI представила модель GPT-4o с голосовым режимом"),
+    ("gpt4o", "OpenAI выпустила мультимодальную нейросеть GPT-4o"),
+    ("o1", "OpenAI представила модель o1, которая умеет рассуждать"),
+]
@@ -0,0 +1,28 @@
+from services.ai_cache import AIResponseCache, normalize_text
+
+make_key = AIResponseCache.make_key
+
+
+def test_normalize_text_collapses_whitespace_and_unicode_forms():
+    decomposed = "Новы\u0438\u0306"  # "й" из двух кодовых точек
+    assert normalize_text(f"  Ставка\n\t{decomposed}  ") == "Ставка Новый"
+
+
+def test_make_key_is_stable_for_equivalent_text():
+    key = make_key('gpt-4o-mini', 'rewrite', 'news', 3, "ЦБ повысил ставку")
+    assert key == make_key('gpt-4o-mini', 'rewrite', 'news', 3, " ЦБ  повысил\nставку ")
+    assert len(key) == 64
+
+
+def test_make_key_depends_on_every_parameter():
+    base = ('gpt-4o-mini', 'rewrite', 'news', 3, "ЦБ повысил ставку")
+    variants = [
+        ('gpt-4o', 'rewrite', 'news', 3, "ЦБ повысил ставку"),
+        ('gpt-4o-mini', 'title', 'news', 3, "ЦБ повысил ставку"),
+        ('gpt-4o-mini', 'rewrite', 'analytics', 3, "ЦБ повысил ставку"),
+        ('gpt-4o-mini', 'rewrite', 'news', 4, "ЦБ повысил ставку"),
+        ('gpt-4o-mini', 'rewrite', 'news', 3, "ЦБ понизил ставку"),
+    ]
+    keys = {make_key(*base)} | {make_key(*variant) for variant in variants}
+    keys |= {make_key(*base, temperature=0.2), make_key(*base, max_tokens=500)}
+    assert len(keys) == len(variants) + 3
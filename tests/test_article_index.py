@@ -0,0 +1,20 @@
+from services.article_index import canonical_url, title_hash
+
+
+def test_canonical_url_drops_tracking_and_cosmetic_differences():
+    assert canonical_url("http://www.Example.com/news/1/?utm_source=tg&b=2&a=1#comments") == \
+        "https://example.com/news/1?a=1&b=2"
+
+
+def test_canonical_url_keeps_meaningful_query():
+    assert canonical_url("https://example.com/article?id=5&fbclid=xyz") == "https://example.com/article?id=5"
+    assert canonical_url("https://example.com/article?id=5") != canonical_url("https://example.com/article?id=6")
+
+
+def test_canonical_url_root_and_empty():
+    assert canonical_url("https://example.com") == "https://example.com/"
+    assert canonical_url("") == ""
+
+
+def test_title_hash_ignores_case_punctuation_and_yo():
+    assert title_hash("Ёлки подорожали!") == title_hash("  елки   ПОДОРОЖАЛИ ")
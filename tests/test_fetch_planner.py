@@ -0,0 +1,82 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from services.fetch_planner import FetchPlanner
+
+NOW = datetime(2024, 10, 1, 12, 0)
+
+
+@pytest.fixture
+def planner():
+    return FetchPlanner(min_interval=300, max_interval=12 * 3600, default_interval=1800)
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    monkeypatch.setattr(random, 'uniform', lambda low, high: 1.0)
+
+
+def test_estimate_interval_is_median_gap(planner):
+    times = [NOW - timedelta(minutes=m) for m in (0, 10, 20, 90)]
+    assert planner.estimate_interval(times) == 600
+    assert planner.estimate_interval([NOW]) is None
+
+
+def test_estimate_interval_uses_latest_window(planner):
+    recent = [NOW - timedelta(minutes=5 * i) for i in range(planner.CADENCE_WINDOW)]
+    old = [NOW - timedelta(days=1, hours=i) for i in range(10)]
+    assert planner.estimate_interval(recent + old) == 300
+
+
+def test_plan_smooths_towards_feed_cadence(planner):
+    source = {'poll_interval': 3600}
+    times = [NOW - timedelta(minutes=20 * i) for i in range(5)]
+
+    plan = planner.plan(source, {'item_times': times}, NOW)
+    assert plan['poll_interval'] == 2400
+    assert plan['error_count'] == 0
+    assert plan['next_fetch_at'] == NOW + timedelta(seconds=2400)
+
+
+def test_plan_backs_off_when_feed_not_modified(planner):
+    plan = planner.plan({'poll_interval': 8 * 3600}, {'not_modified': True}, NOW)
+    assert plan['poll_interval'] == 12 * 3600
+
+
+def test_plan_backs_off_exponentially_on_errors(planner):
+    source = {'poll_interval': 600, 'error_count': 0}
+    waits = []
+    for _ in range(3):
+        plan = planner.plan(source, {'error': 'timeout'}, NOW)
+        waits.append((plan['next_fetch_at'] - NOW).total_seconds())
+        source = {**source, **plan}
+
+    assert waits == [1200, 2400, 4800]
+    # Выученный интервал при ошибках не меняется
+    assert source['poll_interval'] == 600
+    assert source['error_count'] == 3
+
+    recovered = planner.plan(source, {'item_times': []}, NOW)
+    assert recovered['error_count'] == 0
+
+
+def test_plan_error_backoff_is_capped(planner):
+    plan = planner.plan({'poll_interval': 3600, 'error_count': 20}, {'error': 'boom'}, NOW)
+    assert plan['next_fetch_at'] - NOW == timedelta(hours=12)
+
+
+def test_due_sources(planner):
+    sources = [
+        {'id': 1},
+        {'id': 2, 'next_fetch_at': (NOW - timedelta(minutes=1)).isoformat()},
+        {'id': 3, 'next_fetch_at': NOW + timedelta(minutes=1)},
+    ]
+    assert [source['id'] for source in planner.due_sources(sources, NOW)] == [1, 2]
+
+
+def test_plan_all_skips_unknown_sources(planner):
+    plans = planner.plan_all([{'id': 1}], {1: {'not_modified': True}, 2: {'error': 'x'}}, NOW)
+    assert list(plans) == [1]
+    assert plans[1]['poll_interval'] == 3600
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from database.migrations import MIGRATIONS, Migration, MigrationRunner
+from database.models import DatabaseModels
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "bot.db")
+
+
+async def schema_versions(models):
+    async with models._read() as db:
+        async with db.execute("SELECT version FROM schema_version ORDER BY version") as cursor:
+            return [row[0] for row in await cursor.fetchall()]
+
+
+def test_init_applies_all_migrations_once(db_path):
+    async def scenario():
+        models = DatabaseModels(db_path)
+        await models.init_database()
+        try:
+            first = models.schema_version
+            second = await MigrationRunner(models).run()
+            return first, second, await schema_versions(models)
+        finally:
+            await models.close()
+
+    first, second, versions = asyncio.run(scenario())
+    latest = max(m.version for m in MIGRATIONS)
+    assert first == second == latest
+    assert versions == sorted(m.version for m in MIGRATIONS)
+
+
+def test_reopening_database_keeps_version(db_path):
+    async def scenario():
+        for _ in range(2):
+            models = DatabaseModels(db_path)
+            await models.init_database()
+            versions = await schema_versions(models)
+            await models.close()
+        return versions
+
+    assert asyncio.run(scenario()) == sorted(m.version for m in MIGRATIONS)
+
+
+def test_add_columns_skips_existing_columns(db_path):
+    migrations = [
+        Migration(1, "Таблица", ["CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"]),
+        Migration(2, "Колонка", add_columns=[('items', 'name', 'TEXT'), ('items', 'score', 'REAL')]),
+    ]
+
+    async def scenario():
+        models = DatabaseModels(db_path)
+        await models.pool.open()
+        try:
+            version = await MigrationRunner(models, migrations).run()
+            async with models._read() as db:
+                async with db.execute("PRAGMA table_info(items)") as cursor:
+                    columns = [row[1] for row in await cursor.fetchall()]
+            return version, columns
+        finally:
+            await models.close()
+
+    assert asyncio.run(scenario()) == (2, ['id', 'name', 'score'])
+
+
+def test_explicit_empty_migration_list(db_path):
+    async def scenario():
+        models = DatabaseModels(db_path)
+        runner = MigrationRunner(models, [])
+        return runner.latest_version, await runner.run()
+
+    assert asyncio.run(scenario()) == (0, 0)
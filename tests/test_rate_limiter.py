@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from services.rate_limiter import backoff_delay, parse_duration, parse_retry_after
+
+
+def test_parse_retry_after_prefers_milliseconds():
+    assert parse_retry_after({'retry-after-ms': '1500', 'retry-after': '10'}) == 1.5
+    assert parse_retry_after({'retry-after': '7'}) == 7.0
+
+
+def test_parse_retry_after_ignores_missing_and_invalid():
+    assert parse_retry_after({}) is None
+    assert parse_retry_after({'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'}) is None
+
+
+def test_parse_duration():
+    assert parse_duration('6m0s') == 360
+    assert parse_duration('20ms') == pytest.approx(0.02)
+    assert parse_duration('1.5') == 1.5
+    assert parse_duration('') is None
+
+
+def test_backoff_delay_grows_and_is_capped(monkeypatch):
+    monkeypatch.setattr(random, 'uniform', lambda low, high: high)
+    assert [backoff_delay(attempt) for attempt in range(4)] == [1, 2, 4, 8]
+    assert backoff_delay(10, cap=60) == 60
+
+
+def test_backoff_delay_is_full_jitter():
+    delays = [backoff_delay(3) for _ in range(200)]
+    assert all(0 <= delay <= 8 for delay in delays)
+    assert min(delays) < 4 < max(delays)
+
+
+def test_backoff_delay_respects_retry_after(monkeypatch):
+    monkeypatch.setattr(random, 'uniform', lambda low, high: low)
+    assert backoff_delay(0, retry_after=5) == 5
+    assert backoff_delay(0) == 0
@@ -0,0 +1,127 @@
+import asyncio
+import itertools
+
+import numpy as np
+import pytest
+
+from config import STORY_SIMILARITY_THRESHOLD
+from services.story_dedup import LSHIndex, MinHasher, StoryDeduplicator, story_shingles
+from tests.headlines import HEADLINES
+
+
+def pair_scores(threshold: float, bands: int = 64):
+    """Попарные precision/recall кластеризации заголовков выборки"""
+    dedup = StoryDeduplicator(threshold=threshold, bands=bands)
+    items = [{'title': title, 'content': ''} for _, title in HEADLINES]
+    cluster_of = {}
+    for members in dedup.cluster(items):
+        for i in members:
+            cluster_of[i] = members[0]
+
+    tp = fp = fn = 0
+    for i, j in itertools.combinations(range(len(HEADLINES)), 2):
+        same = HEADLINES[i][0] == HEADLINES[j][0]
+        merged = cluster_of[i] == cluster_of[j]
+        tp += same and merged
+        fp += merged and not same
+        fn += same and not merged
+    return tp / (tp + fp), tp / (tp + fn)
+
+
+def f1(precision: float, recall: float) -> float:
+    return 2 * precision * recall / (precision + recall)
+
+
+def test_story_shingles_stems_and_drops_short_words():
+    shingles = story_shingles("Ёлки в Москве подорожали", "")
+    assert shingles == {"елки", "москве", "подоро"}
+
+
+def test_minhash_estimates_jaccard():
+    hasher = MinHasher(num_perm=128)
+    first = {f"w{i}" for i in range(100)}
+    second = {f"w{i}" for i in range(50, 150)}
+    jaccard = len(first & second) / len(first | second)
+
+    estimate = hasher.similarity(hasher.signature(first), hasher.signature(second))
+    assert estimate == pytest.approx(jaccard, abs=0.1)
+    assert hasher.similarity(hasher.signature(first), hasher.signature(set(first))) == 1.0
+
+
+def test_minhash_signature_is_stable_between_instances():
+    shingles = {"ставка", "ключев", "россии"}
+    assert np.array_equal(MinHasher().signature(shingles), MinHasher().signature(shingles))
+
+
+def test_lsh_index_requires_whole_bands():
+    with pytest.raises(ValueError):
+        LSHIndex(num_perm=128, bands=60)
+
+
+def test_lsh_index_finds_near_duplicates_only():
+    hasher = MinHasher()
+    index = LSHIndex()
+    base = {f"w{i}" for i in range(40)}
+    index.insert("base", hasher.signature(base))
+    index.insert("other", hasher.signature({f"x{i}" for i in range(40)}))
+
+    near = base - {"w0", "w1"} | {"y0", "y1"}
+    assert index.query(hasher.signature(near), 0.5) == ["base"]
+    assert index.query(hasher.signature({f"z{i}" for i in range(40)}), 0.5) == []
+
+
+def test_cluster_groups_retellings_of_one_story():
+    dedup = StoryDeduplicator()
+    items = [{'title': title, 'content': ''} for _, title in HEADLINES[:8]]
+    clusters = dedup.cluster(items)
+
+    assert [0, 1, 2] == clusters[0][:3]
+    assert [5, 6, 7] in clusters
+
+
+def test_collapse_keeps_longest_text_and_sums_story_size():
+    dedup = StoryDeduplicator()
+    items = [
+        {'title': "Джон Хопфилд и Джеффри Хинтон получили Нобелевскую премию по физике", 'content': 'коротко'},
+        {'title': "Нобелевскую премию по физике присудили Хопфилду и Хинтону за машинное обучение",
+         'content': 'подробный текст новости'},
+        {'title': "В Москве выпал первый снег", 'content': ''},
+    ]
+    collapsed = dedup.collapse(items)
+
+    assert [item['title'] for item in collapsed] == [items[1]['title'], items[2]['title']]
+    assert collapsed[0]['story_size'] == 2
+    # Повторное схлопывание уже схлопнутых новостей сохраняет размер сюжета
+    assert dedup.collapse(collapsed + [dict(items[0])])[0]['story_size'] == 3
+
+
+def test_admit_lets_first_retelling_through():
+    dedup = StoryDeduplicator()
+    first, second, unrelated = HEADLINES[14][1], HEADLINES[15][1], HEADLINES[30][1]
+
+    async def admitted():
+        return [await dedup.admit({'title': title, 'content': ''}) for title in (first, second, unrelated)]
+
+    assert asyncio.run(admitted()) == [True, False, True]
+
+
+def test_threshold_on_labeled_headlines():
+    # Только по заголовкам соседние по теме сюжеты (ставка 21% и 16%, GPT-4o и o1) склеиваются:
+    # у них общая большая часть слов. В работе к заголовку добавляется начало текста новости
+    precision, recall = pair_scores(STORY_SIMILARITY_THRESHOLD)
+    assert recall >= 0.75
+    assert precision >= 0.55
+
+
+def test_default_threshold_is_best_among_neighbours():
+    # Порог по умолчанию не хуже соседних значений на той же выборке
+    default = f1(*pair_scores(STORY_SIMILARITY_THRESHOLD))
+    for threshold in (STORY_SIMILARITY_THRESHOLD - 0.05, STORY_SIMILARITY_THRESHOLD + 0.1):
+        assert default >= f1(*pair_scores(threshold))
+
+
+def test_two_row_bands_are_needed_for_low_threshold():
+    # С полосами по 4 строки кандидаты при сходстве ~0.2 почти не находятся
+    _, recall_wide = pair_scores(STORY_SIMILARITY_THRESHOLD, bands=32)
+    _, recall = pair_scores(STORY_SIMILARITY_THRESHOLD, bands=64)
+    assert recall > 2 * recall_wide
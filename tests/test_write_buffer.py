@@ -0,0 +1,104 @@
+import asyncio
+
+from database.write_buffer import SettingsWriteBuffer
+
+
+class FlakyWriter:
+    """Колбэк записи, который падает заданное число раз"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches = []
+
+    async def __call__(self, rows):
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.batches.append({key: value for key, value, _ in rows})
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_put_coalesces_writes_by_key():
+    writer = FlakyWriter()
+
+    async def scenario():
+        buffer = SettingsWriteBuffer(writer, flush_interval=60)
+        await buffer.put('a', '1')
+        await buffer.put('a', '2')
+        await buffer.put('b', '3')
+        assert buffer.get('a') == '2'
+        assert len(buffer) == 2
+        await buffer.close()
+        return buffer.stats
+
+    stats = run(scenario())
+    assert writer.batches == [{'a': '2', 'b': '3'}]
+    assert stats['coalesced'] == 1
+    assert stats['rows_written'] == 2
+
+
+def test_flushes_when_full():
+    writer = FlakyWriter()
+
+    async def scenario():
+        buffer = SettingsWriteBuffer(writer, max_pending=3, flush_interval=60)
+        for i in range(3):
+            await buffer.put(f'k{i}', str(i))
+        assert len(buffer) == 0
+        await buffer.close()
+
+    run(scenario())
+    assert writer.batches == [{'k0': '0', 'k1': '1', 'k2': '2'}]
+
+
+def test_failed_flush_requeues_and_retries_with_backoff():
+    writer = FlakyWriter(failures=2)
+
+    async def scenario():
+        buffer = SettingsWriteBuffer(writer, flush_interval=0.01, max_retry_interval=0.04)
+        await buffer.put('a', '1')
+        for expected in (0.02, 0.04):
+            try:
+                await buffer.flush()
+            except RuntimeError:
+                pass
+            assert buffer.retry_interval == expected
+            # Значение остается видимым для чтения, пока не записано
+            assert buffer.get('a') == '1'
+
+        await buffer.put('a', '2')
+        # Повтор по таймеру после паузы retry_interval
+        await asyncio.sleep(0.1)
+        assert len(buffer) == 0
+        await buffer.close()
+        return buffer.stats
+
+    stats = run(scenario())
+    assert writer.batches == [{'a': '2'}]
+    assert stats['failed_flushes'] == 2
+
+
+def test_failed_flush_does_not_resurrect_discarded_or_overwritten_keys():
+    async def scenario():
+        buffer = None
+
+        async def slow_failing(rows):
+            buffer.discard('gone')
+            await buffer.put('kept', 'new')
+            raise RuntimeError("disk I/O error")
+
+        buffer = SettingsWriteBuffer(slow_failing, flush_interval=60)
+        await buffer.put('gone', 'x')
+        await buffer.put('kept', 'old')
+        try:
+            await buffer.flush()
+        except RuntimeError:
+            pass
+        pending = buffer.pending_items()
+        buffer._timer_task.cancel()
+        return pending
+
+    assert run(scenario()) == {'kept': 'new'}
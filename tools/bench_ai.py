@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк создания постов: один запрос по JSON-схеме против текста + дозапроса хештегов
+
+Работает с локальной заглушкой (tools/stub_openai.py), без сети и расходов:
+сравнивает запросы к API, задержку и токены на пост в обоих режимах и
+проверяет переключение на обычный режим, если модель не знает JSON-схему.
+Затем - время пакета AIProcessor.process_news_batch: по одной новости
+(max_concurrency=1) и параллельно с лимитом ограничителя. И время до набора
+постов конвейером (NewsPipeline), когда заглушка
+часть ответов отдает копией новости: обычный режим, n вариантов в ответе
+и спекулятивный.
+
+Запуск: python tools/bench_ai.py [--posts 20] [--latency 300] [--fail-rate 0.1] [--copy-rate 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('OPENAI_API_KEY', 'stub')
+
+import openai  # noqa: E402
+
+from services.ai_processor import AIProcessor  # noqa: E402
+from services.news_pipeline import NewsPipeline  # noqa: E402
+from services.rate_limiter import RateLimiter  # noqa: E402
+from services.story_dedup import StoryDeduplicator  # noqa: E402
+from tools.stub_openai import StubOpenAI, start_stub  # noqa: E402
+
+SAMPLE_NEWS = {
+    'title': "Правительство утвердило программу развития региональных аэропортов до 2030 года",
+    'content': ("Программа предусматривает реконструкцию сорока аэропортов, обновление взлетно-посадочных "
+                "полос и строительство новых терминалов. На реализацию планируется направить более "
+                "двухсот миллиардов рублей из федерального бюджета и внебюджетных источников. ") * 3,
+    'category': 'экономика',
+    'url': 'https://example.com/news/1'
+}
+
+
+class BenchFeed:
+    """Ленты для конвейера без сети: каждая новость - отдельный источник"""
+
+    article_index = None
+
+    def __init__(self, news_list: list):
+        self.news_list = news_list
+
+    async def fetch_feed(self, url, name, source_id, etag=None, last_modified=None):
+        return [{'url_key': url}], {}
+
+    async def build_item(self, candidate, state, name, source_id, full_text=True):
+        return self.news_list[source_id]
+
+
+def bench_news(count: int) -> list:
+    """Новости с разными словами: одинаковые склеила бы дедупликация сюжетов"""
+    news_list = []
+    for i in range(count):
+        rng = random.Random(i)
+        words = [''.join(rng.choices('абвгдежзиклмнопрстуфхцчшэюя', k=rng.randint(5, 10))) for _ in range(80)]
+        news_list.append({**SAMPLE_NEWS, 'title': f"{SAMPLE_NEWS['title']} ({i})",
+                          'url': f"{SAMPLE_NEWS['url']}?n={i}", 'content': ' '.join(words)})
+    return news_list
+
+
+async def run_mode(posts: int, structured: bool, **stub_options) -> dict:
+    stub = StubOpenAI(seed=1, **stub_options)
+    runner, base_url = await start_stub(stub)
+    try:
+        processor = AIProcessor()
+        processor.client = openai.AsyncOpenAI(api_key='stub', base_url=base_url, max_retries=0)
+        processor.structured_output = structured
+
+        created = 0
+        latencies = []
+        for i in range(posts):
+            started = time.perf_counter()
+            post = await processor.create_post({**SAMPLE_NEWS, 'url': f"{SAMPLE_NEWS['url']}?n={i}"})
+            latencies.append(time.perf_counter() - started)
+            created += 1 if post else 0
+
+        return {
+            'created': created,
+            'requests': stub.stats['requests'],
+            'latency': sum(latencies) / len(latencies),
+            'tokens': stub.stats['prompt_tokens'] + stub.stats['completion_tokens'],
+            'structured_after': processor.structured_output
+        }
+    finally:
+        await runner.cleanup()
+
+
+async def run_batch(news: int, max_posts: int, candidates: int, speculative: int, **stub_options) -> dict:
+    stub = StubOpenAI(seed=5, **stub_options)
+    runner, base_url = await start_stub(stub)
+    try:
+        processor = AIProcessor()
+        processor.client = openai.AsyncOpenAI(api_key='stub', base_url=base_url, max_retries=0)
+        processor.candidates = candidates
+
+        news_list = bench_news(news)
+        sources = [
+            {'id': i, 'url': item['url'], 'name': 'bench', 'source_type': 'rss', 'is_active': True}
+            for i, item in enumerate(news_list)
+        ]
+
+        async def publish(post: dict) -> int:
+            return 1
+
+        pipeline = NewsPipeline(BenchFeed(news_list), processor, StoryDeduplicator(), publish,
+                                max_posts=max_posts, speculative=speculative)
+        started = time.perf_counter()
+        await pipeline.run(sources)
+        return {
+            'posts': len(pipeline.posts),
+            'elapsed': time.perf_counter() - started,
+            'requests': stub.stats['requests'],
+            'tokens': stub.stats['prompt_tokens'] + stub.stats['completion_tokens']
+        }
+    finally:
+        await runner.cleanup()
+
+
+async def run_news_batch(posts: int, concurrency: int, **stub_options) -> dict:
+    stub = StubOpenAI(seed=3, **stub_options)
+    runner, base_url = await start_stub(stub)
+    try:
+        processor = AIProcessor()
+        processor.client = openai.AsyncOpenAI(api_key='stub', base_url=base_url, max_retries=0)
+        processor.rate_limiter = RateLimiter(max_concurrency=concurrency)
+
+        started = time.perf_counter()
+        created = await processor.process_news_batch(bench_news(posts), max_posts=posts)
+        return {
+            'posts': len(created),
+            'elapsed': time.perf_counter() - started,
+            'requests': stub.stats['requests']
+        }
+    finally:
+        await runner.cleanup()
+
+
+def report(name: str, result: dict, posts: int):
+    print(f"  {name:<26} постов {result['created']}/{posts}, запросов на пост {result['requests'] / posts:.2f}, "
+          f"задержка {result['latency'] * 1000:6.0f} мс, токенов на пост {result['tokens'] / posts:6.0f}")
+
+
+async def main(args):
+    options = {'latency': args.latency / 1000, 'fail_rate': args.fail_rate}
+    print(f"🧪 Заглушка OpenAI: задержка {args.latency:.0f} мс, ошибки {args.fail_rate:.0%}, постов {args.posts}\n")
+
+    legacy = await run_mode(args.posts, structured=False, **options)
+    structured = await run_mode(args.posts, structured=True, **options)
+    report("Текст + хештеги (2 вызова)", legacy, args.posts)
+    report("JSON по схеме (1 вызов)", structured, args.posts)
+    if legacy['latency'] and legacy['tokens']:
+        print(f"\n  Задержка: x{legacy['latency'] / structured['latency']:.2f}, "
+              f"токены: {structured['tokens'] / legacy['tokens']:.0%} от обычного режима")
+
+    fallback = await run_mode(2, structured=True, json_schema=False, **options)
+    print(f"\n🔁 Модель без JSON-схемы: постов {fallback['created']}/2, "
+          f"structured output {'включен' if fallback['structured_after'] else 'отключен'}")
+
+    print(f"\n📦 process_news_batch: {args.batch_posts} новостей")
+    sequential = await run_news_batch(args.batch_posts, 1, **options)
+    concurrent = await run_news_batch(args.batch_posts, RateLimiter().max_concurrency, **options)
+    for name, result in (("По одной", sequential), ("Параллельно", concurrent)):
+        print(f"  {name:<22} постов {result['posts']}/{args.batch_posts}, за {result['elapsed'] * 1000:6.0f} мс, "
+              f"запросов {result['requests']:>2}")
+
+    print(f"\n🎯 Конвейер: {args.batch_posts} поста из {args.batch_news} новостей, копий в ответах {args.copy_rate:.0%}")
+    for name, candidates, speculative in (("Обычный", 1, 0), ("n=3 варианта", 3, 0),
+                                          ("+3 спекулятивно", 1, 3), ("n=2 и +2 спекулятивно", 2, 2)):
+        result = await run_batch(args.batch_news, args.batch_posts, candidates, speculative,
+                                 copy_rate=args.copy_rate, **options)
+        print(f"  {name:<22} постов {result['posts']}/{args.batch_posts}, за {result['elapsed'] * 1000:6.0f} мс, "
+              f"запросов {result['requests']:>2}, токенов {result['tokens']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк режимов создания постов")
+    parser.add_argument('--posts', type=int, default=20, help="Сколько постов создать в каждом режиме")
+    parser.add_argument('--latency', type=float, default=300, help="Задержка ответа заглушки, мс")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Доля ответов 429/503")
+    parser.add_argument('--copy-rate', type=float, default=0.5, help="Доля ответов-копий новости в пакетном замере")
+    parser.add_argument('--batch-news', type=int, default=12, help="Новостей в пакете")
+    parser.add_argument('--batch-posts', type=int, default=3, help="Сколько постов набрать из пакета")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк слоя БД: соединение на каждый вызов против пула соединений
+
+Запуск: python tools/bench_db.py [--ops 2000]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import aiosqlite
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database.models import DatabaseModels  # noqa: E402
+
+
+class LegacyDatabase:
+    """Старый путь: новое aiosqlite.connect() на каждый вызов"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+
+    async def get_setting(self, key: str):
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute("SELECT value FROM settings WHERE key = ?", (key,)) as cursor:
+                row = await cursor.fetchone()
+                return row[0] if row else None
+
+    async def set_setting(self, key: str, value: str):
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute(
+                "INSERT OR REPLACE INTO settings (key, value, updated_at) VALUES (?, ?, ?)",
+                (key, value, datetime.now().isoformat())
+            )
+            await db.commit()
+
+    async def get_channels(self):
+        async with aiosqlite.connect(self.db_path) as db:
+            async with db.execute(
+                "SELECT channel_id, channel_name, is_active, posts_per_day FROM channels"
+            ) as cursor:
+                return await cursor.fetchall()
+
+
+async def measure(name: str, func, ops: int) -> float:
+    start = time.perf_counter()
+    for i in range(ops):
+        await func(i)
+    elapsed = time.perf_counter() - start
+    rate = ops / elapsed if elapsed else float('inf')
+    print(f"  {name:<28} {rate:>10.0f} ops/sec")
+    return rate
+
+
+async def run_suite(title: str, db, ops: int) -> dict:
+    print(f"\n{title}")
+    return {
+        'get_setting': await measure('get_setting', lambda i: db.get_setting('openai_model'), ops),
+        'set_setting': await measure('set_setting', lambda i: db.set_setting(f'bench_{i % 50}', str(i)), ops),
+        'get_channels': await measure('get_channels', lambda i: db.get_channels(), ops),
+    }
+
+
+async def main(ops: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+
+        pooled = DatabaseModels(db_path)
+        await pooled.init_database()
+        await pooled.set_setting('openai_model', 'gpt-4')
+        for i in range(10):
+            await pooled.add_channel(f'@channel_{i}', f'Channel {i}')
+
+        legacy_results = await run_suite("🐢 Соединение на каждый вызов", LegacyDatabase(db_path), ops)
+        pooled_results = await run_suite("🚀 Пул соединений", pooled, ops)
+
+        await pooled.close()
+
+    print("\n📊 Ускорение:")
+    for key, legacy_rate in legacy_results.items():
+        print(f"  {key:<28} x{pooled_results[key] / legacy_rate:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк пула соединений SQLite")
+    parser.add_argument('--ops', type=int, default=2000, help="Количество операций на тест")
+    args = parser.parse_args()
+    asyncio.run(main(args.ops))
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк поиска почти одинаковых новостей (MinHash + LSH)
+
+1. Масштабирование: время кластеризации на 2.5k..20k новостей (должно расти линейно).
+2. Точность и полнота попарно на размеченной выборке: JSONL со строками
+   {"cluster": "...", "title": "...", "content": "..."}. Без --labeled
+   выборка генерируется: пересказы одного сюжета с заменой и выбросом слов.
+
+Запуск: python tools/bench_dedup.py [--labeled sample.jsonl] [--threshold 0.2]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from itertools import combinations
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.story_dedup import StoryDeduplicator  # noqa: E402
+
+SYLLABLES = [consonant + vowel for consonant in 'бвгджзклмнпрстфхцчш' for vowel in 'аеиоуыя']
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    return [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 5))) for _ in range(size)]
+
+
+def pick_word(vocabulary: List[str], rng: random.Random) -> str:
+    """Каждое пятое слово - частое (по закону Ципфа), такие встречаются и в разных сюжетах"""
+    if rng.random() < 0.2:
+        return vocabulary[min(int(rng.paretovariate(1.0)) - 1, len(vocabulary) - 1)]
+    return rng.choice(vocabulary)
+
+
+def retell(words: List[str], vocabulary: List[str], rng: random.Random,
+           replace: float = 0.25, drop: float = 0.15) -> List[str]:
+    """Пересказ: часть слов заменена, часть выброшена, предложения местами переставлены"""
+    sentences = [words[i:i + 12] for i in range(0, len(words), 12)]
+    if len(sentences) > 2 and rng.random() < 0.5:
+        i = rng.randrange(len(sentences) - 1)
+        sentences[i], sentences[i + 1] = sentences[i + 1], sentences[i]
+
+    result = []
+    for word in (word for sentence in sentences for word in sentence):
+        roll = rng.random()
+        if roll < drop:
+            continue
+        result.append(pick_word(vocabulary, rng) if roll < drop + replace else word)
+    return result
+
+
+def synthetic_sample(stories: int, seed: int = 7) -> List[Dict]:
+    rng = random.Random(seed)
+    vocabulary = make_vocabulary(20000, rng)
+    items = []
+    for story in range(stories):
+        base = [pick_word(vocabulary, rng) for _ in range(rng.randint(60, 140))]
+        for _ in range(rng.choice([1, 1, 2, 3, 4])):
+            body = retell(base, vocabulary, rng)
+            title = retell(base[:10], vocabulary, rng, replace=0.4, drop=0.2)
+            items.append({'cluster': str(story), 'title': ' '.join(title), 'content': ' '.join(body)})
+    rng.shuffle(items)
+    return items
+
+
+def load_labeled(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def pairs(groups: List[List[int]]) -> set:
+    return {pair for group in groups for pair in combinations(sorted(group), 2)}
+
+
+def evaluate(items: List[Dict], threshold: float):
+    dedup = StoryDeduplicator(threshold=threshold)
+    predicted = pairs(dedup.cluster(items))
+
+    truth: Dict[str, List[int]] = {}
+    for i, item in enumerate(items):
+        truth.setdefault(item['cluster'], []).append(i)
+    expected = pairs(list(truth.values()))
+
+    true_positive = len(predicted & expected)
+    precision = true_positive / len(predicted) if predicted else 1.0
+    recall = true_positive / len(expected) if expected else 1.0
+    print(f"  Порог {threshold:.2f}: точность {precision:.3f}, полнота {recall:.3f} "
+          f"(пар: найдено {len(predicted)}, эталон {len(expected)})")
+
+
+def scaling(sizes: List[int], threshold: float):
+    stories = synthetic_sample(max(sizes) // 2 + 1, seed=11)
+    for size in sizes:
+        items = stories[:size]
+        dedup = StoryDeduplicator(threshold=threshold)
+        start = time.perf_counter()
+        clusters = dedup.cluster(items)
+        elapsed = time.perf_counter() - start
+        print(f"  {size:>6} новостей: {elapsed:6.2f} с, {elapsed / size * 1e6:7.0f} мкс/новость, "
+              f"кластеров {len(clusters)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк кластеризации сюжетов")
+    parser.add_argument('--labeled', help="Размеченная выборка JSONL (cluster, title, content)")
+    parser.add_argument('--threshold', type=float, nargs='*', default=[0.15, 0.2, 0.3], help="Пороги сходства")
+    parser.add_argument('--sizes', type=int, nargs='*', default=[2500, 5000, 10000, 20000], help="Размеры для масштабирования")
+    args = parser.parse_args()
+
+    print("📈 Масштабирование:")
+    scaling(args.sizes, args.threshold[0] if len(args.threshold) == 1 else 0.2)
+
+    sample = load_labeled(args.labeled) if args.labeled else synthetic_sample(1500)
+    print(f"\n🎯 Точность и полнота ({'размеченная' if args.labeled else 'синтетическая'} выборка, {len(sample)} новостей):")
+    for value in args.threshold:
+        evaluate(sample, value)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк извлечения текста: lxml против BeautifulSoup на сохраненном корпусе
+
+Корпус - каталог с файлами *.html (страницы статей) и *.xml/*.rss (ленты,
+по ним проверяется очистка заголовков и описаний). Собрать корпус из
+активных источников бота: --collect 100 (скачает ленты и до 100 статей).
+
+Запуск: python tools/bench_extract.py corpus/ [--collect 100] [--repeat 3]
+"""
+
+import argparse
+import asyncio
+import difflib
+import os
+import sys
+import time
+from hashlib import sha1
+from typing import Callable, List
+
+import feedparser
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATABASE_PATH  # noqa: E402
+from services.news_parser import (  # noqa: E402
+    NewsParser, clean_text, clean_text_bs4, extract_article_text, extract_article_text_bs4
+)
+
+
+async def collect_corpus(corpus_dir: str, db_path: str, limit: int):
+    """Сохранить ленты и страницы статей из активных источников"""
+    from database.models import DatabaseModels
+
+    db = DatabaseModels(db_path)
+    await db.init_database()
+    try:
+        sources = await db.get_news_sources()
+    finally:
+        await db.close()
+
+    os.makedirs(corpus_dir, exist_ok=True)
+    saved = 0
+
+    async with NewsParser() as parser:
+        for source in sources:
+            try:
+                async with parser.session.get(source['url']) as response:
+                    feed_text = await response.text()
+            except Exception as e:
+                print(f"⚠️ {source['name']}: {e}")
+                continue
+
+            name = sha1(source['url'].encode()).hexdigest()[:12]
+            with open(os.path.join(corpus_dir, f"{name}.xml"), 'w', encoding='utf-8') as f:
+                f.write(feed_text)
+
+            for entry in feedparser.parse(feed_text).entries:
+                if saved >= limit:
+                    return
+                link = entry.get('link')
+                if not link:
+                    continue
+                try:
+                    async with parser.session.get(link) as response:
+                        if response.status != 200:
+                            continue
+                        html = await response.text()
+                except Exception:
+                    continue
+
+                with open(os.path.join(corpus_dir, f"{sha1(link.encode()).hexdigest()[:12]}.html"), 'w',
+                          encoding='utf-8') as f:
+                    f.write(html)
+                saved += 1
+
+    print(f"💾 Сохранено статей: {saved}")
+
+
+def load_corpus(corpus_dir: str):
+    pages, snippets = [], []
+    for name in sorted(os.listdir(corpus_dir)):
+        path = os.path.join(corpus_dir, name)
+        with open(path, encoding='utf-8', errors='replace') as f:
+            data = f.read()
+        if name.endswith('.html'):
+            pages.append(data)
+        elif name.endswith(('.xml', '.rss')):
+            for entry in feedparser.parse(data).entries:
+                snippets.extend([entry.get('title', ''), entry.get('description', '')])
+    return pages, snippets
+
+
+def measure(name: str, func: Callable, items: List[str], repeat: int) -> tuple:
+    """(результаты, элементов в секунду, МБ в секунду)"""
+    results = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [func(item) for item in items]
+    elapsed = time.perf_counter() - start
+
+    total = len(items) * repeat
+    megabytes = sum(len(item.encode('utf-8')) for item in items) * repeat / 1024 / 1024
+    rate = total / elapsed if elapsed else float('inf')
+    print(f"  {name:<28} {rate:>10.0f} шт/сек  {megabytes / elapsed:>8.1f} МБ/сек")
+    return results, rate
+
+
+def report_parity(fast: List, reference: List):
+    exact = sum(1 for a, b in zip(fast, reference) if a == b)
+    ratios = [
+        difflib.SequenceMatcher(None, a or '', b or '', autojunk=False).ratio()
+        for a, b in zip(fast, reference) if a != b
+    ]
+    mean_ratio = (exact + sum(ratios)) / len(reference) if reference else 1.0
+    print(f"  Совпадение текста: {exact}/{len(reference)} точно, средняя близость {mean_ratio:.4f}")
+
+
+def main(corpus_dir: str, repeat: int):
+    pages, snippets = load_corpus(corpus_dir)
+    if not pages and not snippets:
+        print("❌ Корпус пуст: нужны *.html и/или *.xml файлы (см. --collect)")
+        return
+
+    if pages:
+        print(f"\n📄 Статьи ({len(pages)} страниц):")
+        reference, slow = measure("BeautifulSoup", extract_article_text_bs4, pages, repeat)
+        fast_results, fast = measure("lxml", extract_article_text, pages, repeat)
+        print(f"  Ускорение: x{fast / slow:.1f}")
+        report_parity(fast_results, reference)
+
+    if snippets:
+        print(f"\n🧹 Очистка заголовков и описаний ({len(snippets)} строк):")
+        reference, slow = measure("BeautifulSoup", clean_text_bs4, snippets, repeat)
+        fast_results, fast = measure("lxml", clean_text, snippets, repeat)
+        print(f"  Ускорение: x{fast / slow:.1f}")
+        report_parity(fast_results, reference)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк извлечения текста статей")
+    parser.add_argument('corpus', help="Каталог корпуса (*.html, *.xml)")
+    parser.add_argument('--collect', type=int, default=0, help="Сначала скачать до N статей из источников бота")
+    parser.add_argument('--db', default=DATABASE_PATH, help="Путь к базе данных (для --collect)")
+    parser.add_argument('--repeat', type=int, default=3, help="Количество прогонов корпуса")
+    args = parser.parse_args()
+
+    if args.collect:
+        asyncio.run(collect_corpus(args.corpus, args.db, args.collect))
+    main(args.corpus, args.repeat)
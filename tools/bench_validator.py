@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк проверки "переписанный текст слишком похож на оригинал"
+
+Сравнивает прежнюю проверку (Жаккар по словам) и косинус по символьным
+n-граммам (services/text_similarity.py): проверок в секунду, доля ложно
+принятых копий и ложно отклоненных честных пересказов при разных порогах.
+
+Размеченная выборка: JSONL со строками {"original": "...", "rewritten": "...",
+"label": "accept" | "reject"}. Без --labeled используются встроенные новости:
+честные пересказы (accept) и сделанные из оригинала почти-копии (reject) -
+начало статьи, смена окончаний слов, перестановка предложений.
+
+Порог по умолчанию (REWRITE_SIMILARITY_THRESHOLD = 0.67) выбран только по этой
+синтетической выборке: реального размеченного корпуса в репозитории нет,
+на своих данных порог нужно проверить через --labeled.
+
+Запуск: python tools/bench_validator.py [--labeled sample.jsonl] [--threshold 0.6 0.67 0.75]
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import REWRITE_SIMILARITY_THRESHOLD  # noqa: E402
+from services.text_similarity import TextSimilarity  # noqa: E402
+
+STORIES = [
+    {
+        'title': "Правительство утвердило программу развития региональных аэропортов до 2030 года",
+        'content': (
+            "Правительство утвердило программу развития региональных аэропортов на период до 2030 года. "
+            "Документ предусматривает реконструкцию сорока аэропортов в двадцати шести регионах страны. "
+            "Планируется обновить взлетно-посадочные полосы, построить новые терминалы и системы освещения. "
+            "На реализацию программы направят более двухсот миллиардов рублей из федерального бюджета "
+            "и внебюджетных источников.\n\n"
+            "По словам министра транспорта, первые объекты будут сданы уже в следующем году. "
+            "В приоритете аэропорты Сибири и Дальнего Востока, где авиация остается единственным "
+            "круглогодичным видом транспорта. Ожидается, что пассажиропоток региональных авиалиний "
+            "вырастет на треть."
+        ),
+        'rewrite': (
+            "✈️ Сорок региональных аэропортов ждет масштабное обновление\n\n"
+            "До 2030 года в 26 регионах появятся новые терминалы, полосы и светосигнальное оборудование. "
+            "Бюджет проекта превышает 200 млрд рублей - деньги дадут и государство, и частные инвесторы. "
+            "Первыми модернизацию пройдут Сибирь и Дальний Восток: там самолет зачастую единственный "
+            "способ добраться куда-либо в любое время года. Первые объекты откроют уже в следующем году.\n\n"
+            "#авиация #регионы #инфраструктура"
+        )
+    },
+    {
+        'title': "Центробанк сохранил ключевую ставку на прежнем уровне",
+        'content': (
+            "Совет директоров Центрального банка принял решение сохранить ключевую ставку на уровне "
+            "шестнадцати процентов годовых. Регулятор отметил, что инфляционное давление постепенно "
+            "снижается, однако остается выше целевого уровня. Рост потребительского кредитования "
+            "замедлился, а ожидания населения относительно цен стабилизировались.\n\n"
+            "В пресс-релизе говорится, что банк допускает снижение ставки на ближайших заседаниях, "
+            "если замедление инфляции продолжится. Следующее заседание по ключевой ставке "
+            "запланировано на конец октября. Аналитики в большинстве своем ожидали именно такого решения."
+        ),
+        'rewrite': (
+            "🏦 Ставка осталась 16%: ЦБ взял паузу\n\n"
+            "Регулятор не стал менять стоимость денег, хотя цены растут уже не так быстро. "
+            "Кредиты гражданам выдают медленнее, а люди перестали ждать резкого подорожания. "
+            "Но до цели по инфляции еще далеко, поэтому смягчение отложено - возможно, до конца октября. "
+            "Рынок такого исхода и ждал.\n\n"
+            "#экономика #ставка #цб"
+        )
+    },
+    {
+        'title': "Ученые создали биоразлагаемый пластик из отходов сельского хозяйства",
+        'content': (
+            "Исследователи из Новосибирска разработали технологию получения биоразлагаемого пластика "
+            "из соломы и шелухи подсолнечника. Материал полностью разлагается в почве за шесть месяцев "
+            "и по прочности не уступает обычному полиэтилену. Для производства не требуется "
+            "дорогостоящее оборудование.\n\n"
+            "Авторы работы рассчитывают, что новый пластик найдет применение в упаковке продуктов "
+            "и в сельском хозяйстве, например для мульчирующей пленки. Опытная установка "
+            "уже выпускает до ста килограммов материала в сутки. Результаты опубликованы в научном журнале."
+        ),
+        'rewrite': (
+            "🌾 Солома вместо нефти: в Новосибирске сделали пластик, который исчезает за полгода\n\n"
+            "Сырьем служат сельхозотходы - солома и подсолнечная шелуха. Прочность как у полиэтилена, "
+            "а в земле материал распадается без следа примерно за шесть месяцев. Сложное оборудование "
+            "не нужно, пилотная линия выдает около 100 кг в день. Первые кандидаты на внедрение - "
+            "пищевая упаковка и пленка для грядок.\n\n"
+            "#наука #экология #технологии"
+        )
+    },
+    {
+        'title': "Сборная по хоккею одержала победу в финале турнира",
+        'content': (
+            "Национальная сборная по хоккею обыграла команду Финляндии в финале международного турнира "
+            "со счетом четыре-два. Решающие шайбы были заброшены в третьем периоде, когда команда "
+            "уступала в один гол. Лучшим игроком матча признан нападающий, набравший три очка.\n\n"
+            "Главный тренер после игры отметил характер команды и работу вратаря, который отразил "
+            "тридцать два броска. Победа стала третьей подряд на этом турнире. Следующим соперником "
+            "сборной станет команда Швеции в рамках подготовки к чемпионату мира."
+        ),
+        'rewrite': (
+            "🏒 Камбэк в финале! Наши хоккеисты вырвали победу у финнов - 4:2\n\n"
+            "Проигрывая в третьем периоде, сборная собралась и забросила решающие шайбы. "
+            "Герой встречи - форвард с тремя результативными баллами, а голкипер отбил 32 броска. "
+            "Это уже третий титул подряд на турнире. Впереди спарринг со шведами перед мировым первенством.\n\n"
+            "#хоккей #спорт #победа"
+        )
+    },
+    {
+        'title': "В городе откроют двенадцать новых станций метро",
+        'content': (
+            "Мэрия объявила о планах открыть двенадцать новых станций метро в течение ближайших трех лет. "
+            "Строительство ведется на двух линиях, которые свяжут спальные районы с деловым центром. "
+            "По оценке властей, время в пути для жителей окраин сократится в среднем на двадцать минут.\n\n"
+            "Общая стоимость проекта оценивается в сто восемьдесят миллиардов рублей. На стройке "
+            "задействованы восемь тоннелепроходческих комплексов. Часть станций получит пересадки "
+            "на городскую электричку и автобусные маршруты."
+        ),
+        'rewrite': (
+            "🚇 Минус 20 минут дороги: до окраин дотянут метро\n\n"
+            "За три года в городе появится дюжина станций на двух строящихся линиях - они соединят "
+            "жилые кварталы с центром деловой жизни. Под землей сейчас работают восемь щитов, "
+            "а вложения оцениваются в 180 млрд рублей. На нескольких станциях сделают удобные "
+            "пересадки на электрички и автобусы.\n\n"
+            "#метро #город #транспорт"
+        )
+    },
+    {
+        'title': "Компания представила новый отечественный процессор для серверов",
+        'content': (
+            "Отечественная компания представила новый серверный процессор с тридцатью двумя ядрами. "
+            "Чип изготовлен по технологическому процессу шестнадцать нанометров и поддерживает до "
+            "двух терабайт оперативной памяти. Производитель заявляет, что производительность "
+            "выросла вдвое по сравнению с предыдущим поколением.\n\n"
+            "Первые серверы на базе нового процессора поступят заказчикам в начале следующего года. "
+            "Основными покупателями станут государственные компании и банки. Компания также "
+            "сообщила о планах выпустить версию чипа для рабочих станций."
+        ),
+        'rewrite': (
+            "💻 32 ядра и вдвое быстрее: вышел новый российский серверный чип\n\n"
+            "Процессор сделан по 16-нм техпроцессу и работает с памятью объемом до 2 ТБ. "
+            "Поставки серверов с ним стартуют в начале будущего года, в очереди госкорпорации "
+            "и банки. Разработчик уже готовит модификацию для рабочих станций.\n\n"
+            "#технологии #процессоры #it"
+        )
+    },
+    {
+        'title': "Синоптики предупредили о сильных морозах на следующей неделе",
+        'content': (
+            "Синоптики предупредили жителей центральных регионов о резком похолодании на следующей неделе. "
+            "Ночью температура опустится до минус тридцати градусов, днем ожидается до минус двадцати. "
+            "Морозы продлятся не менее пяти дней, после чего начнется постепенное потепление.\n\n"
+            "Медики рекомендуют ограничить время пребывания на улице и одеваться многослойно. "
+            "Коммунальные службы переведены в режим повышенной готовности. Водителям советуют "
+            "заранее проверить аккумуляторы и не оставлять автомобили надолго на открытых стоянках."
+        ),
+        'rewrite': (
+            "🥶 До -30 ночью: в центр страны идут сильные холода\n\n"
+            "Со следующей недели столбики термометров упадут до -20 днем, а ночами будет еще холоднее. "
+            "Аномалия задержится минимум на пять дней. Врачи советуют меньше гулять и надевать "
+            "несколько слоев одежды, автомобилистам - проверить батарею заранее. Коммунальщики "
+            "уже работают в усиленном режиме.\n\n"
+            "#погода #морозы #общество"
+        )
+    },
+    {
+        'title': "Музей впервые покажет коллекцию рисунков эпохи Возрождения",
+        'content': (
+            "Крупнейший художественный музей страны впервые выставит коллекцию рисунков мастеров "
+            "эпохи Возрождения. В экспозицию войдут более ста пятидесяти графических работ, "
+            "которые десятилетиями хранились в запасниках. Многие рисунки покажут публике впервые "
+            "после реставрации.\n\n"
+            "Выставка откроется в начале декабря и продлится три месяца. Для посетителей подготовлены "
+            "лекции, экскурсии и мультимедийный гид. Билеты можно будет купить на сайте музея "
+            "за две недели до открытия."
+        ),
+        'rewrite': (
+            "🎨 Полторы сотни рисунков Возрождения выйдут из запасников\n\n"
+            "Графику, которую десятки лет не видели зрители, покажут после реставрации. "
+            "Экспозиция откроется в декабре и будет работать три месяца. Гостей ждут лекции, "
+            "экскурсии и мультимедийный путеводитель, а билеты начнут продавать онлайн за две "
+            "недели до старта.\n\n"
+            "#культура #искусство #выставка"
+        )
+    }
+]
+
+# Смена окончаний: те же слова в другой форме (Жаккар по словам их не узнает)
+ENDINGS = [('ого', 'ому'), ('ый', 'ого'), ('ий', 'его'), ('ая', 'ой'), ('ие', 'их'), ('ов', 'ам'),
+           ('ах', 'ами'), ('ет', 'ют'), ('ил', 'ила'), ('ия', 'ии'), ('ы', 'ов'), ('а', 'у'), ('е', 'ы')]
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+')
+HASHTAGS = "\n\n#новости #главное"
+
+
+def inflect(text: str, rng: random.Random, share: float = 0.6) -> str:
+    def replace(match):
+        word = match.group(0)
+        if len(word) < 5 or rng.random() > share:
+            return word
+        for ending, other in ENDINGS:
+            if word.endswith(ending):
+                return word[:-len(ending)] + other
+        return word
+    return re.sub(r'\w+', replace, text)
+
+
+def near_copies(story: Dict, rng: random.Random) -> List[str]:
+    """Почти-копии оригинала, которые валидатор должен отклонить"""
+    sentences = SENTENCE_RE.split(story['content'].replace('\n\n', ' '))
+    lead = ' '.join(sentences[:3])
+    shuffled = sentences[:]
+    rng.shuffle(shuffled)
+    return [
+        "📰 " + lead + HASHTAGS,
+        inflect(lead, rng) + HASHTAGS,
+        ' '.join(shuffled[:4]) + HASHTAGS,
+        story['title'] + "\n\n" + inflect(' '.join(sentences[1:4]), rng, 0.3) + HASHTAGS
+    ]
+
+
+def builtin_sample(seed: int = 3) -> List[Dict]:
+    rng = random.Random(seed)
+    sample = []
+    for story in STORIES:
+        original = f"Заголовок: {story['title']}\n\nТекст: {story['content']}"
+        sample.append({'original': original, 'rewritten': story['rewrite'], 'label': 'accept'})
+        sample.extend({'original': original, 'rewritten': copy, 'label': 'reject'} for copy in near_copies(story, rng))
+    return sample
+
+
+def word_jaccard(first: str, second: str) -> float:
+    """Прежняя проверка AIProcessor: Жаккар по множествам слов"""
+    words1 = set(re.findall(r'\w+', first.lower()))
+    words2 = set(re.findall(r'\w+', second.lower()))
+    if not words1 or not words2:
+        return 0.0
+    return len(words1 & words2) / len(words1 | words2)
+
+
+def load_labeled(path: str) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def error_rates(scores: List[float], labels: List[str], threshold: float) -> tuple:
+    """Доля принятых копий и доля отклоненных пересказов (отклоняется сходство выше порога)"""
+    copies = [score for score, label in zip(scores, labels) if label == 'reject']
+    rewrites = [score for score, label in zip(scores, labels) if label == 'accept']
+    false_accept = sum(score <= threshold for score in copies) / len(copies) if copies else 0.0
+    false_reject = sum(score > threshold for score in rewrites) / len(rewrites) if rewrites else 0.0
+    return false_accept, false_reject
+
+
+def measure(name: str, score: Callable[[str, str], float], sample: List[Dict], thresholds: List[float],
+            repeat: int):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        scores = [score(item['original'], item['rewritten']) for item in sample]
+    elapsed = time.perf_counter() - started
+    labels = [item['label'] for item in sample]
+
+    print(f"\n  {name}: {len(sample) * repeat / elapsed:,.0f} проверок/с".replace(',', ' '))
+    for label in ('accept', 'reject'):
+        values = [s for s, item_label in zip(scores, labels) if item_label == label]
+        if values:
+            print(f"    сходство {'пересказов' if label == 'accept' else 'копий':<10} "
+                  f"{min(values):.2f}..{max(values):.2f}")
+    for threshold in thresholds:
+        false_accept, false_reject = error_rates(scores, labels, threshold)
+        print(f"    порог {threshold:.2f}: приняты копии {false_accept:6.1%}, отклонены пересказы {false_reject:6.1%}")
+
+
+def main(args):
+    sample = load_labeled(args.labeled) if args.labeled else builtin_sample()
+    accepted = sum(item['label'] == 'accept' for item in sample)
+    print(f"🎯 {'Размеченная' if args.labeled else 'Встроенная'} выборка: {len(sample)} пар "
+          f"({accepted} пересказов, {len(sample) - accepted} копий)")
+
+    similarity = TextSimilarity()
+    measure("Жаккар по словам (прежняя проверка)",
+            word_jaccard, sample, [0.7], args.repeat)
+    measure("Косинус по символьным n-граммам", similarity.similarity, sample, args.threshold, args.repeat)
+
+    # Пакетная проверка: кандидаты одного оригинала одним умножением матрицы
+    groups: Dict[str, List[str]] = {}
+    for item in sample:
+        groups.setdefault(item['original'], []).append(item['rewritten'])
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for original, candidates in groups.items():
+            similarity.similarities(original, candidates)
+    elapsed = time.perf_counter() - started
+    print(f"\n  Пакетом по оригиналу: {len(sample) * args.repeat / elapsed:,.0f} проверок/с".replace(',', ' '))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк проверки сходства переписанного текста")
+    parser.add_argument('--labeled', help="Размеченная выборка JSONL (original, rewritten, label)")
+    parser.add_argument('--threshold', type=float, nargs='*', default=[0.6, REWRITE_SIMILARITY_THRESHOLD, 0.75],
+                        help="Пороги сходства для косинуса")
+    parser.add_argument('--repeat', type=int, default=200, help="Повторов выборки для замера скорости")
+    main(parser.parse_args())
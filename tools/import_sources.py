@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Импорт RSS источников из OPML или CSV в базу бота
+
+CSV: колонки name,url[,category[,source_type]]; строка заголовка необязательна.
+OPML: берутся все <outline> с атрибутом xmlUrl, категория - из родительского outline.
+
+Запуск: python tools/import_sources.py sources.opml [--update] [--db data/bot.db]
+"""
+
+import argparse
+import asyncio
+import csv
+import os
+import sys
+import time
+import xml.etree.ElementTree as ET
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DATABASE_PATH  # noqa: E402
+from database.models import DatabaseModels  # noqa: E402
+
+CSV_FIELDS = ['name', 'url', 'category', 'source_type']
+
+
+def parse_opml(path: str) -> List[Dict]:
+    """Источники из OPML"""
+    sources = []
+
+    def walk(node, category):
+        for outline in node.findall('outline'):
+            url = outline.get('xmlUrl')
+            title = outline.get('title') or outline.get('text')
+            if url:
+                sources.append({
+                    'name': (title or url).strip(),
+                    'url': url.strip(),
+                    'category': category,
+                    'source_type': 'rss'
+                })
+            else:
+                # Папка OPML - используем ее название как категорию
+                walk(outline, (title or category).strip().lower())
+
+    body = ET.parse(path).getroot().find('body')
+    if body is not None:
+        walk(body, 'общее')
+    return sources
+
+
+def parse_csv(path: str) -> List[Dict]:
+    """Источники из CSV"""
+    sources = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.reader(f):
+            if len(row) < 2 or row[0].strip().lower() == 'name':
+                continue
+            values = dict(zip(CSV_FIELDS, (value.strip() for value in row)))
+            if not values['url'].startswith(('http://', 'https://')):
+                continue
+            sources.append({
+                'name': values['name'] or values['url'],
+                'url': values['url'],
+                'category': values.get('category') or 'общее',
+                'source_type': values.get('source_type') or 'rss'
+            })
+    return sources
+
+
+async def import_sources(path: str, db_path: str, update_existing: bool) -> int:
+    sources = parse_opml(path) if path.lower().endswith(('.opml', '.xml')) else parse_csv(path)
+    print(f"📄 Найдено источников в файле: {len(sources)}")
+
+    db = DatabaseModels(db_path)
+    await db.init_database()
+    try:
+        start = time.perf_counter()
+        changed = await db.add_news_sources_bulk(sources, update_existing=update_existing)
+        elapsed = time.perf_counter() - start
+    finally:
+        await db.close()
+
+    print(f"✅ Добавлено/обновлено: {changed} (пропущено существующих: {len(sources) - changed}) за {elapsed:.2f}с")
+    return changed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Импорт RSS источников из OPML/CSV")
+    parser.add_argument('path', help="Путь к .opml или .csv файлу")
+    parser.add_argument('--db', default=DATABASE_PATH, help="Путь к базе данных")
+    parser.add_argument('--update', action='store_true', help="Обновлять название и категорию существующих URL")
+    args = parser.parse_args()
+
+    os.makedirs(os.path.dirname(args.db) or '.', exist_ok=True)
+    asyncio.run(import_sources(args.path, args.db, args.update))
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка OpenAI Chat Completions для проверки бота без сети и расходов
+
+Отвечает на POST /v1/chat/completions в формате API: текстом в свободной
+форме, JSON по схеме (response_format=json_schema) или хештегами; отдает
+usage и заголовки x-ratelimit-*, умеет задержку, ответы 429/503, несколько
+вариантов (параметр n), долю "ленивых" ответов - копий исходной новости -
+и потоковые ответы (stream=True) частями через --chunk-delay мс.
+Batch API: POST /v1/files, POST /v1/batches, GET /v1/batches/{id} и
+GET /v1/files/{id}/content - пакет готов через --batch-delay секунд.
+Счетчики запросов и токенов: GET /stats.
+
+Запуск: python tools/stub_openai.py [--port 8081] [--latency 300] [--fail-rate 0.1]
+Бот: OPENAI_BASE_URL=http://127.0.0.1:8081/v1 OPENAI_API_KEY=stub python main.py
+Офлайн-режим: AI_BATCH_MODE=true AI_BATCH_BASE_URL=http://127.0.0.1:8081/v1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from typing import Dict, List
+
+from aiohttp import web
+
+TITLE = "Новый поворот в громкой истории"
+BODY = ("📰 Появились подробности события, которое обсуждают весь день. "
+        "Эксперты оценивают последствия, а участники обещают рассказать больше уже в ближайшее время. "
+        "Следим за развитием ситуации и собрали главное в одном месте.")
+HASHTAGS = ["#новости", "#главное", "#сегодня"]
+# Символов в одном чанке потокового ответа (у модели - примерно токен-два)
+STREAM_CHUNK_CHARS = 8
+
+
+def count_tokens(text: str) -> int:
+    """Та же оценка, что и у бота без tiktoken: около трех символов на токен"""
+    return len(text) // 3 + 1
+
+
+class StubOpenAI:
+    """Состояние заглушки: параметры ответов и счетчики"""
+
+    def __init__(self, latency: float = 0.3, fail_rate: float = 0.0, legacy_hashtags: int = 1,
+                 json_schema: bool = True, rpm: int = 3500, tpm: int = 90000, seed: int = None,
+                 copy_rate: float = 0.0, batch_delay: float = 5.0, chunk_delay: float = 0.03):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        # Сколько хештегов в ответе свободной формы (меньше двух - бот дозапрашивает хештеги)
+        self.legacy_hashtags = legacy_hashtags
+        self.json_schema = json_schema
+        # Доля вариантов, повторяющих текст новости (их отклонит проверка сходства)
+        self.copy_rate = copy_rate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.random = random.Random(seed)
+        # Пауза между чанками потокового ответа (latency - время до первого чанка)
+        self.chunk_delay = chunk_delay
+        # Через сколько секунд после создания пакет считается выполненным
+        self.batch_delay = batch_delay
+        self.stats = {'requests': 0, 'failed': 0, 'prompt_tokens': 0, 'completion_tokens': 0, 'batches': 0}
+        self._window: List[float] = []
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict] = {}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        app.router.add_post('/v1/files', self.upload_file)
+        app.router.add_get('/v1/files/{file_id}/content', self.file_content)
+        app.router.add_post('/v1/batches', self.create_batch)
+        app.router.add_get('/v1/batches/{batch_id}', self.retrieve_batch)
+        app.router.add_get('/stats', self.get_stats)
+        return app
+
+    def _rate_headers(self) -> Dict[str, str]:
+        now = time.monotonic()
+        self._window = [moment for moment in self._window if now - moment < 60]
+        return {
+            'x-ratelimit-limit-requests': str(self.rpm),
+            'x-ratelimit-limit-tokens': str(self.tpm),
+            'x-ratelimit-remaining-requests': str(max(0, self.rpm - len(self._window))),
+            'x-ratelimit-remaining-tokens': str(self.tpm),
+            'x-ratelimit-reset-requests': '60ms',
+            'x-ratelimit-reset-tokens': '1s'
+        }
+
+    def _reply(self, payload: Dict) -> str:
+        messages = payload.get('messages') or []
+        system = next((m.get('content') or '' for m in messages if m.get('role') == 'system'), '')
+        response_format = payload.get('response_format') or {}
+
+        if 'эксперт по созданию хештегов' in system:
+            return ' '.join(HASHTAGS)
+
+        body = BODY
+        if self.copy_rate and self.random.random() < self.copy_rate:
+            news = messages[-1].get('content') or ''
+            body = news[news.find('Текст:') + 6:][:400].strip()
+        if response_format.get('type') == 'json_schema':
+            return json.dumps({'title': TITLE, 'body': body, 'hashtags': HASHTAGS}, ensure_ascii=False)
+        return f"{TITLE}\n\n{body}\n\n{' '.join(HASHTAGS[:self.legacy_hashtags])}".strip()
+
+    async def chat_completions(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.stats['requests'] += 1
+        self._window.append(time.monotonic())
+        await asyncio.sleep(self.latency)
+
+        if self.fail_rate and self.random.random() < self.fail_rate:
+            self.stats['failed'] += 1
+            if self.random.random() < 0.5:
+                return web.json_response(
+                    {'error': {'message': 'Rate limit reached', 'type': 'requests', 'code': 'rate_limit_exceeded'}},
+                    status=429, headers={**self._rate_headers(), 'retry-after-ms': '200'}
+                )
+            return web.json_response({'error': {'message': 'Service unavailable', 'type': 'server_error'}}, status=503)
+
+        if payload.get('response_format') and not self.json_schema:
+            return web.json_response(
+                {'error': {'message': "Invalid parameter: 'response_format' of type 'json_schema' is not supported "
+                                      "with this model.", 'type': 'invalid_request_error',
+                           'param': 'response_format'}},
+                status=400
+            )
+
+        if payload.get('stream'):
+            return await self._stream(request, payload)
+        return web.json_response(self._completion(payload), headers=self._rate_headers())
+
+    async def _stream(self, request: web.Request, payload: Dict) -> web.StreamResponse:
+        """Ответ потоком SSE: текст частями по chunk_delay, usage - последним чанком"""
+        completion = self._completion(payload)
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', **self._rate_headers()})
+        await response.prepare(request)
+        base = {'id': completion['id'], 'object': 'chat.completion.chunk',
+                'created': completion['created'], 'model': completion['model']}
+
+        async def send(data: Dict):
+            await response.write(f"data: {json.dumps({**base, **data}, ensure_ascii=False)}\n\n".encode('utf-8'))
+
+        for choice in completion['choices']:
+            text = choice['message']['content']
+            for start in range(0, len(text), STREAM_CHUNK_CHARS):
+                await send({'choices': [{'index': choice['index'], 'finish_reason': None,
+                                         'delta': {'content': text[start:start + STREAM_CHUNK_CHARS]}}]})
+                await asyncio.sleep(self.chunk_delay)
+            await send({'choices': [{'index': choice['index'], 'delta': {}, 'finish_reason': 'stop'}]})
+        if (payload.get('stream_options') or {}).get('include_usage'):
+            await send({'choices': [], 'usage': completion['usage']})
+
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def _completion(self, payload: Dict) -> Dict:
+        """Тело ответа Chat Completions - общее для обычных запросов и пакетов"""
+        contents = [self._reply(payload) for _ in range(payload.get('n') or 1)]
+        prompt_tokens = sum(count_tokens(m.get('content') or '') for m in payload.get('messages') or [])
+        if payload.get('response_format'):
+            prompt_tokens += count_tokens(json.dumps(payload['response_format'], ensure_ascii=False))
+        completion_tokens = sum(count_tokens(content) for content in contents)
+        self.stats['prompt_tokens'] += prompt_tokens
+        self.stats['completion_tokens'] += completion_tokens
+
+        return {
+            'id': f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': payload.get('model', 'stub'),
+            'choices': [{
+                'index': index,
+                'finish_reason': 'stop',
+                'message': {'role': 'assistant', 'content': content}
+            } for index, content in enumerate(contents)],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        }
+
+    async def upload_file(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        upload = form['file']
+        file_id = f"file-stub-{uuid.uuid4().hex[:12]}"
+        self.files[file_id] = upload.file.read()
+        return web.json_response({
+            'id': file_id, 'object': 'file', 'bytes': len(self.files[file_id]), 'created_at': int(time.time()),
+            'filename': upload.filename, 'purpose': form.get('purpose', 'batch'), 'status': 'processed'
+        })
+
+    async def file_content(self, request: web.Request) -> web.Response:
+        content = self.files.get(request.match_info['file_id'])
+        if content is None:
+            return web.json_response({'error': {'message': 'No such file', 'type': 'invalid_request_error'}},
+                                     status=404)
+        return web.Response(body=content, content_type='application/jsonl')
+
+    async def create_batch(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        if payload.get('input_file_id') not in self.files:
+            return web.json_response({'error': {'message': 'No such file', 'type': 'invalid_request_error'}},
+                                     status=400)
+
+        self.stats['batches'] += 1
+        batch = {
+            'id': f"batch_stub_{uuid.uuid4().hex[:12]}",
+            'object': 'batch',
+            'endpoint': payload.get('endpoint', '/v1/chat/completions'),
+            'input_file_id': payload['input_file_id'],
+            'completion_window': payload.get('completion_window', '24h'),
+            'status': 'in_progress',
+            'created_at': int(time.time()),
+            'output_file_id': None,
+            'error_file_id': None,
+            'request_counts': {'total': 0, 'completed': 0, 'failed': 0},
+            'metadata': payload.get('metadata')
+        }
+        self.batches[batch['id']] = batch
+        return web.json_response(batch)
+
+    async def retrieve_batch(self, request: web.Request) -> web.Response:
+        batch = self.batches.get(request.match_info['batch_id'])
+        if batch is None:
+            return web.json_response({'error': {'message': 'No such batch', 'type': 'invalid_request_error'}},
+                                     status=404)
+        if batch['status'] == 'in_progress' and time.time() - batch['created_at'] >= self.batch_delay:
+            self._run_batch(batch)
+        return web.json_response(batch)
+
+    def _run_batch(self, batch: Dict):
+        """Выполнить все запросы пакета и сохранить JSONL с результатами как файл"""
+        lines = []
+        for line in self.files[batch['input_file_id']].decode('utf-8').splitlines():
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            lines.append(json.dumps({
+                'id': f"batch_req_{uuid.uuid4().hex[:12]}",
+                'custom_id': request.get('custom_id'),
+                'response': {'status_code': 200, 'request_id': uuid.uuid4().hex,
+                             'body': self._completion(request.get('body') or {})},
+                'error': None
+            }, ensure_ascii=False))
+
+        output_file_id = f"file-stub-{uuid.uuid4().hex[:12]}"
+        self.files[output_file_id] = "\n".join(lines).encode('utf-8')
+        batch.update({
+            'status': 'completed',
+            'output_file_id': output_file_id,
+            'completed_at': int(time.time()),
+            'request_counts': {'total': len(lines), 'completed': len(lines), 'failed': 0}
+        })
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+
+async def start_stub(stub: StubOpenAI, host: str = '127.0.0.1', port: int = 0) -> tuple:
+    """Запустить заглушку в текущем event loop: (runner, base_url для OPENAI_BASE_URL)"""
+    runner = web.AppRunner(stub.app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}/v1"
+
+
+async def serve(args):
+    stub = StubOpenAI(latency=args.latency / 1000, fail_rate=args.fail_rate, legacy_hashtags=args.legacy_hashtags,
+                      json_schema=not args.no_json_schema, rpm=args.rpm, tpm=args.tpm, copy_rate=args.copy_rate,
+                      batch_delay=args.batch_delay, chunk_delay=args.chunk_delay / 1000)
+    runner, base_url = await start_stub(stub, args.host, args.port)
+    print(f"🧪 Заглушка OpenAI: {base_url} (Ctrl+C - остановить)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Локальная заглушка OpenAI API")
+    parser.add_argument('--host', default='127.0.0.1', help="Адрес")
+    parser.add_argument('--port', type=int, default=8081, help="Порт")
+    parser.add_argument('--latency', type=float, default=300, help="Задержка ответа, мс")
+    parser.add_argument('--fail-rate', type=float, default=0.0, help="Доля ответов 429/503")
+    parser.add_argument('--legacy-hashtags', type=int, default=1, help="Хештегов в ответе свободной формы")
+    parser.add_argument('--no-json-schema', action='store_true', help="Отвечать 400 на response_format")
+    parser.add_argument('--copy-rate', type=float, default=0.0, help="Доля ответов-копий исходной новости")
+    parser.add_argument('--chunk-delay', type=float, default=30, help="Пауза между чанками потокового ответа, мс")
+    parser.add_argument('--batch-delay', type=float, default=5.0, help="Через сколько секунд готов пакет Batch API")
+    parser.add_argument('--rpm', type=int, default=3500, help="Лимит запросов в минуту в заголовках")
+    parser.add_argument('--tpm', type=int, default=90000, help="Лимит токенов в минуту в заголовках")
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
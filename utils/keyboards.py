@@ -198,6 +198,21 @@ def ai_generation_keyboard() -> InlineKeyboardMarkup:
     return keyboard
 
 
+def generated_post_keyboard() -> InlineKeyboardMarkup:
+    """Действия со сгенерированным постом"""
+    keyboard = InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="🔄 Сгенерировать заново", callback_data="generate_text_fresh")
+            ],
+            [
+                InlineKeyboardButton(text="🔙 Назад", callback_data="ai_generation")
+            ]
+        ]
+    )
+    return keyboard
+
+
 # ========================================
 # АВТОПИЛОТ И ПЛАНИРОВЩИК
 # ========================================
@@ -150,7 +150,7 @@ class SmartMonitor:
                 # Проверяем базу данных
                 if self.db:
                     try:
-                        await self.db.get_setting('health_check')
+                        await self.db.ping()
                     except Exception as e:
                         await self._create_alert(
                             'database_error',
@@ -291,7 +291,7 @@ class SmartMonitor:
         """Исцеление базы данных"""
         try:
             if self.db:
-                # Переинициализация БД
+                # Переинициализация БД (миграции пропускаются, если схема актуальна)
                 await self.db.init_database()
                 logger.info("🔧 База данных переинициализирована")
                 return True
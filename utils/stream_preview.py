@@ -0,0 +1,105 @@
+import asyncio
+import html
+import logging
+import time
+from typing import Optional
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.types import Message
+
+from config import STREAM_EDIT_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+# Предел длины текста сообщения Telegram
+TELEGRAM_TEXT_LIMIT = 4096
+CURSOR = " ▌"
+
+
+class StreamPreview:
+    """Показ генерируемого текста правками одного сообщения Telegram
+
+    Правки идут не чаще раза в interval секунд: частота editMessageText
+    ограничена, а за это время модель успевает дописать заметный кусок.
+    Правка отправляется фоновой задачей, не больше одной за раз, так что
+    чтение ответа модели ее не ждет; на TelegramRetryAfter следующая
+    правка откладывается.
+    """
+
+    def __init__(self, message: Message, header: str = "", interval: float = STREAM_EDIT_INTERVAL):
+        self.message = message
+        # Заголовок в HTML над текстом; сам текст экранируется
+        self.header = header
+        self.interval = interval
+        self.text = ""
+        self.edits = 0
+        self.started = time.monotonic()
+        self.first_delta_after: Optional[float] = None
+        self._shown: Optional[str] = None
+        self._next_edit = 0.0
+        self._editing: Optional[asyncio.Task] = None
+
+    async def start(self, placeholder: str = "⏳ <i>Генерирую...</i>"):
+        self.started = time.monotonic()
+        await self._edit(self.header + placeholder)
+
+    async def add(self, delta: str):
+        """Дописать часть текста; сообщение обновится, если с прошлой правки прошло interval"""
+        if not delta:
+            return
+        if self.first_delta_after is None:
+            self.first_delta_after = time.monotonic() - self.started
+        self.text += delta
+        editing = self._editing is not None and not self._editing.done()
+        if not editing and time.monotonic() >= self._next_edit:
+            self._editing = asyncio.create_task(self._edit(self._render(CURSOR)))
+
+    async def finish(self, text: str, **kwargs):
+        """Итоговое сообщение (с клавиатурой); дожидается текущей правки и окна для новой"""
+        if self._editing is not None:
+            await self._editing
+            self._editing = None
+        delay = self._next_edit - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            await self.message.edit_text(text, parse_mode="HTML", **kwargs)
+        except TelegramRetryAfter as e:
+            await asyncio.sleep(e.retry_after)
+            await self.message.edit_text(text, parse_mode="HTML", **kwargs)
+        self.edits += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def _render(self, suffix: str = "") -> str:
+        body = html.escape(self.text)
+        limit = TELEGRAM_TEXT_LIMIT - len(self.header) - len(suffix)
+        if len(body) > limit:
+            # Длинный текст - показываем конец, где сейчас идет генерация. Обрезается
+            # исходный текст, а не экранированный, чтобы не разрезать сущность вроде &amp;
+            start, size = len(self.text), 0
+            while start and size + len(html.escape(self.text[start - 1])) <= limit - 1:
+                start -= 1
+                size += len(html.escape(self.text[start]))
+            body = "…" + html.escape(self.text[start:])
+        return f"{self.header}{body}{suffix}"
+
+    async def _edit(self, text: str):
+        if text == self._shown:
+            return
+        try:
+            await self.message.edit_text(text, parse_mode="HTML")
+            self._shown = text
+            self.edits += 1
+        except TelegramRetryAfter as e:
+            self._next_edit = time.monotonic() + e.retry_after
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" not in str(e):
+                logger.warning(f"⚠️ Предпросмотр не обновлен: {e}")
+        except Exception as e:
+            # Правка идет фоном: сбой сети не должен прерывать генерацию
+            logger.warning(f"⚠️ Предпросмотр не обновлен: {e}")
+        self._next_edit = time.monotonic() + self.interval